@@ -0,0 +1,179 @@
+"""Per-client admission control for the API.
+
+Every request is attributed to a client by its peer address. Headers are
+set by the caller, so they only count when they can be trusted: the
+X-Forwarded-For address when the peer is one of the configured trusted
+proxies, and the X-Client-ID header only together with that client's token
+in X-Client-Token. Otherwise rotating the header values would hand a
+client a fresh bucket and a fresh lane with every request.
+
+Requests that create work (POST and PUT) take a token from their client's
+bucket and are answered with 429 and a Retry-After when it is empty, so no
+single client can flood the queue. The middleware also sets scheduler.current_client,
+putting small uploads to the interactive endpoints on the priority lane.
+"""
+import hmac
+import math
+import threading
+import time
+
+from fastapi.responses import JSONResponse
+
+from metrics import RATE_LIMITED_TOTAL
+from scheduler import current_client
+
+# Buckets kept before idle (full) ones are dropped
+MAX_BUCKETS = 10000
+
+# Endpoints whose small requests are interactive; batch uploads (/jobs, /uploads) never are
+INTERACTIVE_PATHS = (
+    "/extract", "/extract-stream", "/extract-batch", "/extract-with-rename", "/extract-rename-zip",
+    "/extract-export",
+)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class RateLimiter:
+    """Token bucket per client: ``per_minute`` requests on average, up to ``burst`` at once."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """0 when the request may go ahead, otherwise the seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._drop_idle(now)
+                bucket = self._buckets[client] = TokenBucket(self.burst)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0
+            return (1 - bucket.tokens) / self.rate
+
+    def _drop_idle(self, now):
+        # A bucket that has refilled completely is the same as a new one
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated) * self.rate < self.burst
+        }
+
+
+def parse_trusted_proxies(value):
+    """"10.0.0.1, 10.0.0.2" -> {"10.0.0.1", "10.0.0.2"}.
+
+    "*" trusts every peer as a single proxy hop: only the last
+    X-Forwarded-For address, the one that proxy appended, is used.
+    """
+    return {item.strip() for item in (value or "").split(",") if item.strip()}
+
+
+def parse_client_tokens(value):
+    """"alice:s3cret,bob:t0ken" -> {"alice": "s3cret", "bob": "t0ken"}"""
+    tokens = {}
+    for item in (value or "").split(","):
+        client, sep, token = item.strip().partition(":")
+        if sep and client and token:
+            tokens[client] = token
+    return tokens
+
+
+def _remote_address(scope, headers, trusted_proxies):
+    peer = scope.get("client")
+    peer_address = peer[0] if peer else "unknown"
+    if peer_address not in trusted_proxies and "*" not in trusted_proxies:
+        return peer_address
+    forwarded = [
+        item.strip() for item in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",") if item.strip()
+    ]
+    if not forwarded:
+        return peer_address
+    if "*" in trusted_proxies:
+        # Only the proxy in front of us is known: the address it appended, never what the client wrote
+        return forwarded[-1]
+    # Walk the proxy chain back to the first address not added by a trusted proxy
+    for address in reversed(forwarded):
+        if address not in trusted_proxies:
+            return address
+    return peer_address
+
+
+def client_id(scope, trusted_proxies=frozenset(), client_tokens=None):
+    """Client a request is attributed to; see the module docstring."""
+    headers = dict(scope.get("headers", []))
+    explicit = headers.get(b"x-client-id", b"").decode("latin-1").strip()
+    if explicit and client_tokens:
+        expected = client_tokens.get(explicit)
+        token = headers.get(b"x-client-token", b"").decode("latin-1").strip()
+        if expected is not None and hmac.compare_digest(token.encode(), expected.encode()):
+            return explicit
+    return _remote_address(scope, headers, trusted_proxies)
+
+
+def _content_length(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"content-length" and value.isdigit():
+            return int(value)
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: rate limit per client and tag the request's work with its client and lane.
+
+    ``priority_max_bytes`` is the largest request body to an interactive
+    endpoint that still counts as small; 0 turns the priority lane off, and
+    ``limiter=None`` turns rate limiting off. ``trusted_proxies`` and
+    ``client_tokens`` are passed to client_id.
+    """
+
+    def __init__(self, app, limiter=None, priority_max_bytes=0, trusted_proxies=frozenset(), client_tokens=None):
+        self.app = app
+        self.limiter = limiter
+        self.priority_max_bytes = priority_max_bytes
+        self.trusted_proxies = frozenset(trusted_proxies)
+        self.client_tokens = dict(client_tokens or {})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = client_id(scope, self.trusted_proxies, self.client_tokens)
+        if self.limiter is not None and scope["method"] in ("POST", "PUT"):
+            retry_after = self.limiter.take(client)
+            if retry_after:
+                RATE_LIMITED_TOTAL.inc()
+                response = JSONResponse(
+                    status_code=429,
+                    content={"detail": "Too many requests, please retry later"},
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+                await response(scope, receive, send)
+                return
+
+        length = _content_length(scope)
+        priority = (
+            bool(self.priority_max_bytes)
+            and scope["path"] in INTERACTIVE_PATHS
+            and length is not None
+            and length <= self.priority_max_bytes
+        )
+        token = current_client.set((client, priority))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
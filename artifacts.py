@@ -0,0 +1,213 @@
+"""Expiring store for generated download artifacts (Excel, ZIP).
+
+Every batch gets its own directory under the store root. Artifacts are
+registered under a key unique to their batch ("<batch>/<filename>", see
+artifact_key), never by the filename alone, so two batches finished in the
+same second can't hand out each other's files. They expire after a TTL;
+when the total size exceeds the disk quota the least recently used
+artifacts are evicted; bytes kept in the store's directories by others
+(export sessions' PDFs, see reserve) count against the quota too.
+A background task sweeps expired artifacts and removes batch directories
+once they are empty, so a long-running server no longer fills its disk.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactExistsError(ValueError):
+    """Raised when an artifact key is already registered for another file."""
+
+
+def artifact_key(batch, filename):
+    """Key of a batch's artifact; ``batch`` is its directory or another unique id."""
+    return f"{os.path.basename(os.path.normpath(batch))}/{filename}"
+
+
+class Artifact:
+    """A registered file; ``filename`` is the name it is downloaded as."""
+
+    __slots__ = ("name", "path", "size", "created_at", "expires_at", "last_access")
+
+    def __init__(self, name, path, size, ttl):
+        now = time.time()
+        self.name = name
+        self.path = path
+        self.size = size
+        self.created_at = now
+        self.expires_at = now + ttl
+        self.last_access = now
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+
+class ArtifactStore:
+    """Name -> file mapping with TTL expiry and an LRU disk quota."""
+
+    def __init__(self, root_dir, ttl_seconds=3600, max_bytes=1024 * 1024 * 1024, sweep_interval=60):
+        self.root_dir = root_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._artifacts = OrderedDict()
+        self._size = 0
+        # owner -> bytes held under root_dir outside of registered artifacts
+        self._reserved = {}
+        self._reserved_size = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.expired = 0
+        self.evicted = 0
+
+    def new_dir(self):
+        """Create a directory for one batch's artifacts."""
+        os.makedirs(self.root_dir, exist_ok=True)
+        return tempfile.mkdtemp(dir=self.root_dir)
+
+    def discard_dir(self, path):
+        """Remove a batch directory whose artifacts were never registered."""
+        shutil.rmtree(path, ignore_errors=True)
+
+    def add(self, name, path, ttl=None):
+        """Register the file at path under the key ``name``.
+
+        Registering the same file again refreshes it; another file under a
+        name that is taken raises ArtifactExistsError.
+        """
+        size = os.path.getsize(path)
+        artifact = Artifact(name, path, size, self.ttl_seconds if ttl is None else ttl)
+        with self._lock:
+            if name in self._artifacts:
+                if self._artifacts[name].path != path:
+                    raise ArtifactExistsError(f"Artifact {name} is already registered")
+                self._drop(self._artifacts[name], delete_file=False)
+            self._artifacts[name] = artifact
+            self._size += size
+            # Never the artifact just added
+            self._evict(keep=1)
+        return artifact
+
+    def reserve(self, owner, size):
+        """Count ``size`` bytes kept under root_dir by ``owner`` against the quota, until released."""
+        with self._lock:
+            self._reserved_size += size - self._reserved.get(owner, 0)
+            self._reserved[owner] = size
+            self._evict(keep=0)
+
+    def release(self, owner):
+        with self._lock:
+            self._reserved_size -= self._reserved.pop(owner, 0)
+
+    def _evict(self, keep):
+        # Over quota: evict least recently used artifacts
+        while self._size + self._reserved_size > self.max_bytes and len(self._artifacts) > keep:
+            oldest = next(iter(self._artifacts.values()))
+            self._drop(oldest)
+            self.evicted += 1
+
+    def get(self, name):
+        """Artifact registered under name, or None when unknown, expired or gone."""
+        with self._lock:
+            artifact = self._artifacts.get(name)
+            if artifact is None:
+                return None
+            if artifact.expires_at <= time.time() or not os.path.exists(artifact.path):
+                self._drop(artifact)
+                self.expired += 1
+                return None
+            artifact.last_access = time.time()
+            self._artifacts.move_to_end(name)
+            return artifact
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._artifacts
+
+    def _drop(self, artifact, delete_file=True):
+        self._artifacts.pop(artifact.name, None)
+        self._size -= artifact.size
+        if not delete_file:
+            return
+        try:
+            os.remove(artifact.path)
+        except FileNotFoundError:
+            pass
+        # Remove the batch directory once its last artifact is gone
+        parent = os.path.dirname(artifact.path)
+        if os.path.dirname(parent) == os.path.normpath(self.root_dir):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                pass
+
+    def sweep(self):
+        """Drop expired artifacts; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [artifact for artifact in self._artifacts.values() if artifact.expires_at <= now]
+            for artifact in expired:
+                self._drop(artifact)
+            self.expired += len(expired)
+        return len(expired)
+
+    def clear_orphans(self):
+        """Remove batch directories left behind by a previous process."""
+        if not os.path.isdir(self.root_dir):
+            return
+        with self._lock:
+            known = set(os.path.dirname(artifact.path) for artifact in self._artifacts.values())
+        for entry in os.listdir(self.root_dir):
+            path = os.path.join(self.root_dir, entry)
+            if path not in known:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("artifact sweep failed")
+
+    def start(self):
+        self.clear_orphans()
+        self._sweeper = asyncio.ensure_future(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "bytes": self._size,
+                "reserved_bytes": self._reserved_size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "root_dir": self.root_dir,
+            }
+
+
+artifact_store = ArtifactStore(
+    root_dir=os.environ.get("ARTIFACT_DIR") or os.path.join(tempfile.gettempdir(), "pdf_extractor_artifacts"),
+    ttl_seconds=int(os.environ.get("ARTIFACT_TTL_SECONDS", 3600)),
+    max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 1024 * 1024 * 1024)),
+    sweep_interval=int(os.environ.get("ARTIFACT_SWEEP_INTERVAL", 60)),
+)
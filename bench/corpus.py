@@ -0,0 +1,227 @@
+"""Synthetic permit PDFs for benchmarking, generated fully offline.
+
+Each document type gets a first page laid out like the real permit (title,
+labels and values in the order the extractors expect) filled with random
+but plausible values; further pages carry boilerplate paragraphs, like the
+attachments that come with scanned bundles. The PDFs are written by hand
+with a standard Type1 font, so no PDF library is needed to build them.
+
+    python -m bench.corpus --out /tmp/permits --count 50 --pages 3
+"""
+import argparse
+import os
+import random
+
+DOCUMENT_TYPES = ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"]
+
+FIRST_NAMES = ["JOHN", "MARIA", "WEI", "AHMED", "OLGA", "KENJI", "SARAH", "LUCAS", "PRIYA", "MIGUEL"]
+LAST_NAMES = ["SMITH", "GARCIA", "CHEN", "HASSAN", "IVANOVA", "TANAKA", "MULLER", "ROSSI", "SHARMA", "SILVA"]
+CITIES = ["LONDON", "SYDNEY", "BEIJING", "CAIRO", "MOSCOW", "TOKYO", "BERLIN", "ROME", "MUMBAI", "LISBON"]
+NATIONALITIES = ["BRITISH", "AUSTRALIAN", "CHINESE", "EGYPTIAN", "RUSSIAN", "JAPANESE", "GERMAN", "ITALIAN"]
+OCCUPATIONS = ["MANAGER", "ENGINEER", "CONSULTANT", "TEACHER", "DIRECTOR", "CHEF", "TECHNICIAN"]
+STREETS = ["JL SUNSET ROAD", "JL RAYA KUTA", "JL SUDIRMAN", "JL GATOT SUBROTO", "JL BYPASS NGURAH RAI"]
+OFFICES = ["DENPASAR", "JAKARTA", "SURABAYA", "MEDAN", "BATAM"]
+COMPANIES = ["PT MAJU JAYA", "PT SENTOSA ABADI", "PT BALI INDAH", "PT NUSANTARA KARYA"]
+ENGLISH_MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+                  "October", "November", "December"]
+INDONESIAN_MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September",
+                     "Oktober", "November", "Desember"]
+FILLER_WORDS = ("pemegang izin wajib melaporkan setiap perubahan data kepada kantor imigrasi setempat "
+                "the holder of this permit must comply with the applicable laws and regulations "
+                "dokumen ini diterbitkan secara elektronik dan sah tanpa tanda tangan basah").split()
+
+
+class _Person:
+    def __init__(self, rng):
+        self.name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        self.city = rng.choice(CITIES)
+        self.nationality = rng.choice(NATIONALITIES)
+        self.occupation = rng.choice(OCCUPATIONS)
+        self.address = f"{rng.choice(STREETS)} NO {rng.randint(1, 200)}"
+        self.passport = f"{rng.choice('ABCEKMP')}{rng.randint(1000000, 9999999)}"
+        self.gender = rng.choice(["MALE", "FEMALE"])
+        self.birth = (rng.randint(1, 28), rng.randint(1, 12), rng.randint(1960, 2000))
+        self.issued = (rng.randint(1, 28), rng.randint(1, 12), rng.randint(2022, 2025))
+        self.expiry = (rng.randint(1, 28), rng.randint(1, 12), rng.randint(2026, 2032))
+
+
+def _dmy(date, sep="-"):
+    return f"{date[0]:02d}{sep}{date[1]:02d}{sep}{date[2]}"
+
+
+def _sktt(p, rng):
+    return [
+        "SURAT KETERANGAN TINGGAL SEMENTARA",
+        f"NIK/Number of Population Identity : {rng.randint(10 ** 15, 10 ** 16 - 1)}",
+        f"Nama/Name : {p.name}",
+        f"Jenis Kelamin/Sex : {p.gender}",
+        f"Tempat/Tgl Lahir : {p.city}, {_dmy(p.birth)}",
+        f"Kewarganegaraan/Nationality : {p.nationality}",
+        f"Pekerjaan/Occupation : {p.occupation}",
+        f"Alamat/Address : {p.address}, KUTA",
+        f"Nomor KITAP/KITAS Number : 2C{rng.randint(10, 99)}AB{rng.randint(1000, 9999)}",
+        f"Berlaku Hingga s.d/Expired date : {_dmy(p.expiry)}",
+        f"{rng.choice(OFFICES)}, {_dmy(p.issued)}",
+        "KEPALA DINAS KEPENDUDUKAN DAN PENCATATAN SIPIL",
+    ]
+
+
+def _evln(p, rng):
+    return [
+        "ELECTRONIC VISA (E-VISA)",
+        f"Visa Number : {rng.randint(10 ** 9, 10 ** 10 - 1)}",
+        "Dear Mr./Ms.",
+        p.name,
+        "Your visa application has been approved with the following details:",
+        f"Name : {p.name}",
+        f"Place of Birth : {p.city} Visa Type : C312",
+        f"Date of Birth : {_dmy(p.birth, '/')}",
+        f"Passport No : {p.passport}",
+        f"Passport Expiry : {_dmy(p.expiry)}",
+        f"Date of Issue : {_dmy(p.issued, '/')}",
+    ]
+
+
+def _stay_permit(title):
+    def lines(p, rng):
+        day, month, year = p.issued
+        return [
+            title,
+            p.name,
+            f"PERMIT NUMBER : 2C{rng.randint(10, 99)}JE{rng.randint(1000, 9999)}-A",
+            f"STAY PERMIT EXPIRY : {_dmy(p.expiry, '/')}",
+            f"Place / Date of Birth : {p.city} / {_dmy(p.birth)}",
+            f"Passport Number : {p.passport}",
+            f"Passport Expiry : {_dmy(p.expiry)}",
+            f"Nationality : {p.nationality}",
+            f"Gender : {p.gender}",
+            f"Address : {p.address}",
+            f"Occupation : {p.occupation}",
+            f"Guarantor : {rng.choice(COMPANIES)}",
+            f"{rng.choice(OFFICES).title()}, {day} {ENGLISH_MONTHS[month - 1]} {year}",
+        ]
+    return lines
+
+
+def _notifikasi(p, rng):
+    day, month, year = p.issued
+    return [
+        "NOTIFIKASI PENGGUNAAN TENAGA KERJA ASING",
+        f"NOMOR B.3/{rng.randint(10000, 99999)}/PK.04/{year}",
+        f"Nama TKA : {p.name}",
+        f"Tempat/Tanggal Lahir : {p.city}, {_dmy(p.birth)}",
+        f"Kewarganegaraan : {p.nationality}",
+        f"Alamat Tempat Tinggal : {p.address}",
+        f"Nomor Paspor : {p.passport}",
+        f"Jabatan : {p.occupation}",
+        f"Lokasi Kerja : {rng.choice(OFFICES)}",
+        f"Berlaku : {_dmy(p.issued)} s.d. {_dmy(p.expiry)}",
+        f"Pada tanggal : {day} {INDONESIAN_MONTHS[month - 1]} {year}",
+    ]
+
+
+def _dkptka(p, rng):
+    return [
+        "BUKTI PEMBAYARAN DANA KOMPENSASI PENGGUNAAN TKA (DKPTKA)",
+        f"1. Nama Pemberi Kerja : {rng.choice(COMPANIES)}",
+        f"Alamat : {p.address}",
+        "  KUTA BALI",
+        f"2. Nomor Telepon : 0361-{rng.randint(100000, 999999)}",
+        f"3. Email : info{rng.randint(1, 99)}@example.co.id",
+        f"Nama TKA : {p.name}",
+        f"Tempat/Tanggal Lahir : {p.city}, {_dmy(p.birth)}",
+        f"Nomor Paspor : {p.passport}",
+        f"Kewarganegaraan : {p.nationality}",
+        f"Jabatan : {p.occupation}",
+        f"Kanim {rng.choice(OFFICES).title()} : KANIM {rng.choice(OFFICES)}",
+        f"Lokasi Kerja : {rng.choice(OFFICES)}",
+        "Kode Billing Pembayaran",
+        str(rng.randint(10 ** 14, 10 ** 15 - 1)),
+        f"DKPTKA yang dibayar : US$ {rng.choice([100, 600, 1200])}",
+    ]
+
+
+FIRST_PAGES = {
+    "SKTT": _sktt,
+    "EVLN": _evln,
+    "ITAS": _stay_permit("LIMITED STAY PERMIT (ITAS)"),
+    "ITK": _stay_permit("VISIT STAY PERMIT (ITK)"),
+    "Notifikasi": _notifikasi,
+    "DKPTKA": _dkptka,
+}
+
+
+def _filler_page(rng, lines=40, words=12):
+    return [" ".join(rng.choice(FILLER_WORDS) for _ in range(words)) for _ in range(lines)]
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages):
+    """Minimal PDF with one Helvetica text line per entry of every page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = ["BT /F1 10 Tf 14 TL 40 800 Td"] + [f"({_escape(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {len(objects)} 0 R >>".encode()
+        )
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def generate(document_type, pages=1, rng=None):
+    """One synthetic PDF (bytes) of document_type with the given page count."""
+    rng = rng or random.Random()
+    first = FIRST_PAGES[document_type](_Person(rng), rng)
+    return make_pdf([first] + [_filler_page(rng) for _ in range(pages - 1)])
+
+
+def generate_corpus(document_types=DOCUMENT_TYPES, count=10, pages=1, seed=0):
+    """``count`` PDFs per document type as (document_type, filename, bytes)."""
+    rng = random.Random(seed)
+    corpus = []
+    for document_type in document_types:
+        for index in range(count):
+            corpus.append((document_type, f"{document_type}_{index:05d}.pdf", generate(document_type, pages, rng)))
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic permit PDF corpus to a directory")
+    parser.add_argument("--out", required=True, help="output directory (one subdirectory per document type)")
+    parser.add_argument("--types", default=",".join(DOCUMENT_TYPES), help="comma-separated document types")
+    parser.add_argument("--count", type=int, default=10, help="PDFs per document type")
+    parser.add_argument("--pages", type=int, default=1, help="pages per PDF")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.types.split(","), args.count, args.pages, args.seed)
+    for document_type, filename, content in corpus:
+        directory = os.path.join(args.out, document_type)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(content)
+    print(f"Wrote {len(corpus)} PDFs to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
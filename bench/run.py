@@ -0,0 +1,315 @@
+"""Benchmark harness for the extractors and the API endpoints.
+
+Generates a synthetic corpus (bench.corpus), then measures:
+
+* per-stage throughput in process: PDF open + text extraction (per text
+  backend), field extractors, classification, extract_document, Excel and
+  ZIP building (docs/sec and, where pages matter, pages/sec);
+* endpoint latency (p50/p99) and throughput through an in-process ASGI
+  client, with the result cache disabled so every request really extracts;
+* peak RSS of this process and of the extraction worker processes.
+
+Everything runs offline and the report is JSON, so two runs can be
+compared directly (``--baseline`` adds the new/old ratio of every number):
+
+    python -m bench.run --count 20 --pages 1,5 --output bench.json
+"""
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+from bench.corpus import DOCUMENT_TYPES, generate_corpus
+
+ENDPOINTS = ["/extract", "/extract-batch", "/extract-with-rename", "/extract-rename-zip"]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _throughput(seconds, docs, pages=None):
+    result = {
+        "seconds": round(seconds, 6),
+        "docs": docs,
+        "docs_per_sec": round(docs / seconds, 2) if seconds else None,
+    }
+    if pages is not None:
+        result["pages"] = pages
+        result["pages_per_sec"] = round(pages / seconds, 2) if seconds else None
+    return result
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+# ========================= IN-PROCESS STAGES =========================
+
+def bench_text(corpus, pages):
+    """PDF open + full text extraction with every text backend; texts come from pdfplumber."""
+    from pdf_text import TEXT_BACKENDS, load_pdf_text
+
+    def run(backend):
+        texts = []
+        for _, _, content in corpus:
+            with load_pdf_text(io.BytesIO(content), backend) as doc:
+                texts.append(doc.text())
+        return texts
+
+    results = {}
+    texts = None
+    for backend in TEXT_BACKENDS:
+        backend_texts, seconds = _timed(run, backend)
+        results[backend] = _throughput(seconds, len(corpus), len(corpus) * pages)
+        if backend == "pdfplumber":
+            texts = backend_texts
+    return texts, results
+
+
+def bench_fields(corpus, texts, repeat):
+    from extractors import EXTRACTORS
+
+    by_type = {}
+    for (document_type, _, _), text in zip(corpus, texts):
+        by_type.setdefault(document_type, []).append(text)
+
+    results = {}
+    for document_type, type_texts in by_type.items():
+        extractor = EXTRACTORS[document_type]
+
+        def run():
+            for _ in range(repeat):
+                for text in type_texts:
+                    extractor(text)
+
+        _, seconds = _timed(run)
+        results[document_type] = _throughput(seconds, len(type_texts) * repeat)
+    return results
+
+
+def bench_classify(corpus, texts, repeat):
+    from classifier import classify
+
+    correct = sum(1 for (document_type, _, _), text in zip(corpus, texts) if classify(text)[0] == document_type)
+
+    def run():
+        for _ in range(repeat):
+            for text in texts:
+                classify(text)
+
+    _, seconds = _timed(run)
+    result = _throughput(seconds, len(texts) * repeat)
+    result["accuracy"] = round(correct / len(texts), 4) if texts else None
+    return result
+
+
+def bench_extract_document(corpus, pages):
+    from extractors import extract_document
+
+    def run():
+        return [extract_document(content, document_type) for document_type, _, content in corpus]
+
+    _, seconds = _timed(run)
+    return _throughput(seconds, len(corpus), len(corpus) * pages)
+
+
+def bench_excel(corpus, workdir):
+    from excel_export import write_excel
+    from extractors import extract_document
+
+    rows = [dict(extract_document(content, document_type), Source_File=filename)
+            for document_type, filename, content in corpus]
+    _, seconds = _timed(write_excel, os.path.join(workdir, "bench.xlsx"), rows, "Data")
+    return _throughput(seconds, len(rows))
+
+
+def bench_zip(corpus, workdir):
+    from zip_export import write_zip
+
+    members = [(filename, content) for _, filename, content in corpus]
+    _, seconds = _timed(write_zip, os.path.join(workdir, "bench.zip"), members)
+    result = _throughput(seconds, len(members))
+    result["bytes"] = sum(len(content) for _, content in members)
+    return result
+
+
+# ========================= ENDPOINTS =========================
+
+def bench_endpoints(corpus, batch_size, repeat, document_type):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    batches = [corpus[start:start + batch_size] for start in range(0, len(corpus), batch_size)]
+    results = {}
+    with TestClient(main.app) as client:
+        for endpoint in ENDPOINTS:
+            latencies = []
+            docs = 0
+            for _ in range(repeat):
+                for batch in batches:
+                    files = [("files", (filename, content, "application/pdf")) for _, filename, content in batch]
+                    data = {"document_type": document_type}
+                    started = time.perf_counter()
+                    response = client.post(endpoint, files=files, data=data)
+                    if endpoint == "/extract-rename-zip":
+                        zipfile.ZipFile(io.BytesIO(response.content)).testzip()
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+                    docs += len(batch)
+
+            total = sum(latencies)
+            results[endpoint] = {
+                "requests": len(latencies),
+                "batch_size": batch_size,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "mean_ms": round(total / len(latencies) * 1000, 3),
+                "docs_per_sec": round(docs / total, 2) if total else None,
+            }
+    return results
+
+
+# ========================= REPORT =========================
+
+def _peak_rss_kb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, path=""):
+    """new/old ratio of every number present in both reports."""
+    ratios = {}
+    for key, value in report.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(old, dict):
+            ratios.update(compare(value, old, name))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old and not isinstance(value, bool):
+            ratios[name] = round(value / old, 3)
+    return ratios
+
+
+def run(args):
+    types = args.types.split(",")
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {
+            "types": types,
+            "count": args.count,
+            "pages": args.pages,
+            "batch_size": args.batch_size,
+            "repeat": args.repeat,
+            "workers": args.workers,
+            "seed": args.seed,
+        },
+        "stages": {},
+        "endpoints": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in args.pages:
+            corpus, seconds = _timed(generate_corpus, types, args.count, pages, args.seed)
+            key = f"pages_{pages}"
+            stages = report["stages"][key] = {"generate": _throughput(seconds, len(corpus), len(corpus) * pages)}
+
+            texts, stages["text"] = bench_text(corpus, pages)
+            stages["fields"] = bench_fields(corpus, texts, args.repeat)
+            stages["classify"] = bench_classify(corpus, texts, args.repeat)
+            stages["extract_document"] = bench_extract_document(corpus, pages)
+            stages["excel_build"] = bench_excel(corpus, workdir)
+            stages["zip_build"] = bench_zip(corpus, workdir)
+
+            if not args.skip_endpoints:
+                report["endpoints"][key] = bench_endpoints(corpus, args.batch_size, args.repeat, args.document_type)
+
+    report["peak_rss_kb"] = _peak_rss_kb()
+    return report
+
+
+def _configure_app_env(args, root):
+    """Settings read by the app modules at import, so set them before importing main."""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.cache:
+        os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+        os.environ.pop("RESULT_CACHE_PATH", None)
+    if args.workers is not None:
+        os.environ["EXTRACTION_WORKERS"] = str(args.workers)
+    for name in ("ARTIFACT_DIR", "UPLOAD_DIR", "JOBS_DIR"):
+        os.environ[name] = os.path.join(root, name.lower())
+    os.environ["RECORD_STORE_PATH"] = os.path.join(root, "records.sqlite3")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF extractors and API endpoints")
+    parser.add_argument("--types", default=",".join(DOCUMENT_TYPES), help="comma-separated document types")
+    parser.add_argument("--count", type=int, default=10, help="PDFs per document type")
+    parser.add_argument("--pages", default="1", help="comma-separated page counts, one corpus per value")
+    parser.add_argument("--batch-size", type=int, default=10, help="files per endpoint request")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the fast stages and endpoint runs")
+    parser.add_argument("--workers", type=int, default=None, help="EXTRACTION_WORKERS for the endpoint runs")
+    parser.add_argument("--document-type", default="AUTO", help="document_type sent to the endpoints")
+    parser.add_argument("--cache", action="store_true", help="keep the result cache enabled for endpoint runs")
+    parser.add_argument("--skip-endpoints", action="store_true", help="only run the in-process stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+    args.pages = [int(pages) for pages in args.pages.split(",")]
+
+    with tempfile.TemporaryDirectory() as root:
+        _configure_app_env(args, root)
+        report = run(args)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report["vs_baseline"] = compare(
+            {key: report[key] for key in ("stages", "endpoints", "peak_rss_kb")},
+            {key: baseline.get(key, {}) for key in ("stages", "endpoints", "peak_rss_kb")},
+        )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Offline bulk extraction of a directory tree of PDFs.
+
+Runs the same extractors as the API on N worker processes and appends the
+results to a JSONL, CSV or Parquet output as it goes. Progress is kept in
+a SQLite checkpoint next to the output, committed together with the
+output's length, so an interrupted run picks up where it stopped (output
+written after the last checkpoint is discarded and redone) and files that
+did not change since they were processed are skipped.
+
+    python bulk_extract.py /archive/permits --output permits.jsonl --workers 8
+    python bulk_extract.py /archive/permits --output permits.csv --document-type SKTT
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from extractors import ACCEPTED_DOCUMENT_TYPES, AUTO_DETECT, detect_and_extract, extract_document, output_fields
+from logs import configure_logging
+from parquet_export import ParquetUnavailableError, require_pyarrow, write_parquet
+
+logger = logging.getLogger("bulk_extract")
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+
+def find_pdfs(root):
+    """(relative path, size, mtime_ns) of every PDF under root, in a stable order."""
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                yield os.path.relpath(path, root), stat.st_size, stat.st_mtime_ns
+
+
+def extract_file(root, relpath, document_type):
+    """Worker task: (relpath, detected type, confidence, data, error)."""
+    path = os.path.join(root, relpath)
+    try:
+        if document_type == AUTO_DETECT:
+            result = detect_and_extract(path)
+            if result["document_type"] is None:
+                return relpath, None, result["confidence"], {}, "Could not detect the document type"
+            return relpath, result["document_type"], result["confidence"], result["data"], None
+        return relpath, document_type, None, extract_document(path, document_type), None
+    except Exception as e:
+        return relpath, None, None, {}, f"{type(e).__name__}: {e}"
+
+
+# ========================= CHECKPOINT =========================
+
+class Checkpoint:
+    """Processed files and the committed output state, in SQLite."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                finished_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        self._db.commit()
+
+    def get(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def processed(self):
+        """path -> (size, mtime_ns) of every file already written to the output."""
+        return {path: (size, mtime_ns) for path, size, mtime_ns in self._db.execute(
+            "SELECT path, size, mtime_ns FROM files"
+        )}
+
+    def commit(self, files, meta):
+        """Record processed files and meta values (e.g. the output state) in one transaction."""
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, status, error, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime_ns, "failed" if error else "done", error, now)
+                 for path, size, mtime_ns, error in files],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in meta.items()],
+            )
+
+    def close(self):
+        self._db.close()
+
+
+# ========================= OUTPUT WRITERS =========================
+
+class _AppendFileWriter:
+    """Appends to one text file; the state is its length at the last flush."""
+
+    def __init__(self, path, columns, state):
+        self.path = path
+        self.columns = columns
+        offset = state or 0
+        self._file = open(path, "a+", encoding="utf-8", newline="")
+        # Drop whatever was written after the last checkpoint
+        self._file.truncate(offset)
+        self._file.seek(offset)
+        if offset == 0:
+            self.start()
+
+    def start(self):
+        pass
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter(_AppendFileWriter):
+    def write(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class CsvWriter(_AppendFileWriter):
+    def start(self):
+        csv.writer(self._file).writerow(self.columns)
+
+    def write(self, rows):
+        writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+        writer.writerows(rows)
+
+
+class ParquetWriter:
+    """Directory of typed Parquet part files, one per flush; the state is the part count."""
+
+    def __init__(self, path, document_type, state):
+        self.path = path
+        self.document_type = document_type
+        self.parts = state or 0
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+        # Parts written after the last checkpoint are redone
+        for filename in os.listdir(path):
+            if filename.startswith("part-") and self._part_index(filename) >= self.parts:
+                os.remove(os.path.join(path, filename))
+
+    @staticmethod
+    def _part_index(filename):
+        try:
+            return int(filename.split("-", 1)[1].split(".", 1)[0])
+        except ValueError:
+            return -1
+
+    def write(self, rows):
+        self._rows.extend(rows)
+
+    def flush(self):
+        if self._rows:
+            target = os.path.join(self.path, f"part-{self.parts:05d}.parquet")
+            write_parquet(target + ".tmp", self._rows, self.document_type, extra_columns(self.document_type))
+            os.replace(target + ".tmp", target)
+            self.parts += 1
+            self._rows = []
+        return self.parts
+
+    def close(self):
+        pass
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+
+def extra_columns(document_type):
+    """Columns added to the extracted fields, with their kind."""
+    columns = {"Source_File": "string"}
+    if document_type == AUTO_DETECT:
+        columns["Confidence"] = "float"
+    columns["Error"] = "string"
+    return columns
+
+
+def output_columns(document_type):
+    return output_fields(document_type) + list(extra_columns(document_type))
+
+
+def to_row(relpath, confidence, data, error, document_type):
+    row = dict(data)
+    row["Source_File"] = relpath
+    if document_type == AUTO_DETECT:
+        row["Confidence"] = confidence
+    row["Error"] = error
+    return row
+
+
+# ========================= RUN =========================
+
+def run(args):
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.sqlite3"
+    checkpoint = Checkpoint(checkpoint_path)
+
+    settings = {"document_type": args.document_type, "format": args.format, "root": os.path.abspath(args.root)}
+    previous = checkpoint.get("settings")
+    if previous is not None and previous != settings:
+        raise SystemExit(
+            f"Checkpoint {checkpoint_path} belongs to a run with different settings {previous}; "
+            "use another --output or --checkpoint"
+        )
+
+    if args.format == "parquet":
+        writer = ParquetWriter(args.output, args.document_type, checkpoint.get("output_state"))
+    else:
+        writer = WRITERS[args.format](args.output, output_columns(args.document_type), checkpoint.get("output_state"))
+
+    processed = checkpoint.processed()
+    pending = [entry for entry in find_pdfs(args.root) if processed.get(entry[0]) != (entry[1], entry[2])]
+    logger.info("starting", extra={"pending": len(pending), "already_processed": len(processed)})
+
+    stats = {"done": 0, "failed": 0, "interrupted": False}
+    buffered_rows = []
+    buffered_files = []
+    last_commit = time.monotonic()
+    started = time.monotonic()
+
+    def commit():
+        nonlocal last_commit
+        writer.write(buffered_rows)
+        state = writer.flush()
+        checkpoint.commit(buffered_files, {"settings": settings, "output_state": state})
+        buffered_rows.clear()
+        buffered_files.clear()
+        last_commit = time.monotonic()
+        elapsed = last_commit - started
+        finished = stats["done"] + stats["failed"]
+        logger.info("progress", extra={
+            "finished": finished,
+            "pending": len(pending) - finished,
+            "failed": stats["failed"],
+            "files_per_sec": round(finished / elapsed, 2) if elapsed else None,
+        })
+
+    entries = iter(pending)
+    stat_of = {}
+    pool = ProcessPoolExecutor(max_workers=args.workers)
+    in_flight = set()
+    try:
+        def submit_next():
+            entry = next(entries, None)
+            if entry is not None:
+                stat_of[entry[0]] = entry
+                in_flight.add(pool.submit(extract_file, args.root, entry[0], args.document_type))
+
+        for _ in range(args.workers * 4):
+            submit_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+                relpath, _, confidence, data, error = future.result()
+                _, size, mtime_ns = stat_of.pop(relpath)
+                stats["failed" if error else "done"] += 1
+                if error:
+                    logger.warning("extraction failed", extra={"file": relpath, "error": error})
+                buffered_rows.append(to_row(relpath, confidence, data, error, args.document_type))
+                buffered_files.append((relpath, size, mtime_ns, error))
+                submit_next()
+
+            if len(buffered_files) >= args.flush_every or time.monotonic() - last_commit >= args.flush_seconds:
+                commit()
+    except KeyboardInterrupt:
+        logger.warning("interrupted, saving progress")
+        stats["interrupted"] = True
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if buffered_files:
+            commit()
+        writer.close()
+        checkpoint.close()
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract every PDF under a directory tree")
+    parser.add_argument("root", help="directory to walk for *.pdf files")
+    parser.add_argument("--output", required=True, help="output file (a directory of part files for parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="output format (default: from the --output extension)")
+    parser.add_argument("--document-type", default=AUTO_DETECT, choices=ACCEPTED_DOCUMENT_TYPES,
+                        help="document type of every file, or AUTO to detect it per file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint.sqlite3)")
+    parser.add_argument("--flush-every", type=int, default=200, help="commit output and checkpoint every N files")
+    parser.add_argument("--flush-seconds", type=float, default=10.0, help="... or at least this often")
+    args = parser.parse_args(argv)
+
+    if args.format is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".").lower()
+        if extension not in FORMATS:
+            parser.error("cannot tell the format from --output, pass --format")
+        args.format = extension
+    if not os.path.isdir(args.root):
+        parser.error(f"{args.root} is not a directory")
+    if args.format == "parquet":
+        try:
+            require_pyarrow()
+        except ParquetUnavailableError as e:
+            parser.error(str(e))
+
+    configure_logging()
+    stats = run(args)
+    logger.info("finished", extra=stats)
+    if stats["interrupted"]:
+        return 130
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
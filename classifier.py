@@ -0,0 +1,94 @@
+"""Document type detection from the first page's text.
+
+Each document type has a few weighted anchor phrases (titles and field
+labels printed on its first page). A page is scored by the phrases it
+contains, matched case-insensitively as plain substrings, so classifying a
+page costs a few dozen ``str.find`` scans of text that was extracted for
+the extractors anyway.
+"""
+
+# Bump whenever the keywords or weights change, so cached auto-detected
+# results are re-classified.
+CLASSIFIER_VERSION = 1
+
+# Minimum score for a type to be reported at all
+MIN_SCORE = 3
+
+KEYWORDS = {
+    "SKTT": [
+        ("surat keterangan tinggal", 4),
+        ("number of population identity", 4),
+        ("nomor kitap/kitas", 2),
+        ("tempat/tgl lahir", 2),
+        ("jenis kelamin/sex", 1),
+        ("nama/name", 1),
+    ],
+    "EVLN": [
+        ("electronic visa", 4),
+        ("e-visa", 3),
+        ("visa type", 2),
+        ("visa number", 2),
+        ("passport no", 2),
+        ("dear", 1),
+    ],
+    "ITAS": [
+        ("limited stay permit", 4),
+        ("izin tinggal terbatas", 4),
+        ("permit number", 2),
+        ("stay permit expiry", 2),
+        ("place / date of birth", 1),
+        ("guarantor", 1),
+    ],
+    "ITK": [
+        ("visit stay permit", 4),
+        ("izin tinggal kunjungan", 4),
+        ("permit number", 2),
+        ("stay permit expiry", 2),
+        ("place / date of birth", 1),
+        ("guarantor", 1),
+    ],
+    "Notifikasi": [
+        ("notifikasi", 4),
+        ("nama tka", 2),
+        ("tempat/tanggal lahir", 1),
+        ("alamat tempat tinggal", 1),
+        ("lokasi kerja", 1),
+        ("berlaku", 1),
+        ("pada tanggal", 1),
+    ],
+    "DKPTKA": [
+        ("dkptka", 4),
+        ("dana kompensasi", 4),
+        ("kode billing", 2),
+        ("nama pemberi kerja", 2),
+        ("kanim", 1),
+        ("us$", 1),
+        ("nama tka", 1),
+        ("nomor telepon", 1),
+    ],
+}
+
+
+def score(text):
+    """Keyword score of every document type for the given text."""
+    lowered = text.lower()
+    return {
+        document_type: sum(weight for keyword, weight in keywords if keyword in lowered)
+        for document_type, keywords in KEYWORDS.items()
+    }
+
+
+def classify(text):
+    """Best matching document type and its confidence.
+
+    Confidence is the winner's share of the two best scores, so 1.0 means
+    no other type matched at all and 0.5 a tie (broken in KEYWORDS order,
+    e.g. an ITAS/ITK page naming neither permit wins as ITAS). Returns
+    (None, 0.0) when no type reaches MIN_SCORE.
+    """
+    scores = score(text)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    best, runner_up = scores[ranked[0]], scores[ranked[1]]
+    if best < MIN_SCORE:
+        return None, 0.0
+    return ranked[0], round(best / (best + runner_up), 3)
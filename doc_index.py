@@ -0,0 +1,105 @@
+"""Per-document line and keyword index shared by the extractors.
+
+One index is built per document text. It holds the line array and, for each
+anchor keyword asked for, the offsets and line numbers where it occurs.
+Extractors ask the index which lines hold a label instead of splitting and
+rescanning the text themselves, and skip regex lookups whose label does not
+occur at all. Everything is computed on first use and memoized, so fields
+sharing an anchor or the line array pay for it once.
+
+Anchors are plain literals found with ``str.find``; with CPython's ``re`` a
+combined alternation scan over the whole text was measured to be ~40x slower
+than these C-level substring scans.
+"""
+import re
+
+
+class DocumentIndex:
+    """Lines and anchor offsets of one document's text.
+
+    Anchors are only a necessary condition: callers that need exact
+    semantics re-check the candidate lines with their own patterns.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._lines = None
+        self._lowered = None
+        self._first = {}
+        self._offsets = {}
+        self._line_numbers = {}
+        self._memo = {}
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = self.text.split("\n")
+        return self._lines
+
+    def _haystack(self, needle, ignore_case):
+        if not ignore_case:
+            return self.text, needle
+        if self._lowered is None:
+            self._lowered = self.text.lower()
+        if len(self._lowered) != len(self.text):
+            # Case folding changed offsets (rare non-ASCII text)
+            return None, needle
+        return self._lowered, needle.lower()
+
+    def offsets(self, needle, ignore_case=False):
+        """All offsets at which the anchor starts."""
+        key = (needle, ignore_case)
+        if key not in self._offsets:
+            haystack, literal = self._haystack(needle, ignore_case)
+            if haystack is None:
+                positions = [m.start() for m in re.finditer(re.escape(needle), self.text, re.IGNORECASE)]
+            else:
+                positions = []
+                position = haystack.find(literal)
+                while position != -1:
+                    positions.append(position)
+                    position = haystack.find(literal, position + 1)
+            self._offsets[key] = positions
+        return self._offsets[key]
+
+    def first(self, needle, ignore_case=False):
+        """Offset of the first occurrence of the anchor, None when absent."""
+        key = (needle, ignore_case)
+        if key in self._offsets:
+            positions = self._offsets[key]
+            return positions[0] if positions else None
+        if key not in self._first:
+            haystack, literal = self._haystack(needle, ignore_case)
+            if haystack is None:
+                positions = self.offsets(needle, ignore_case)
+                return positions[0] if positions else None
+            position = haystack.find(literal)
+            self._first[key] = position if position != -1 else None
+        return self._first[key]
+
+    def has(self, needle, ignore_case=False):
+        return self.first(needle, ignore_case) is not None
+
+    def line_of(self, offset):
+        return self.text.count("\n", 0, offset)
+
+    def line_numbers(self, needle, ignore_case=False):
+        """Sorted numbers of the lines containing the anchor."""
+        key = (needle, ignore_case)
+        if key not in self._line_numbers:
+            numbers = []
+            line = 0
+            previous = 0
+            for offset in self.offsets(needle, ignore_case):
+                line += self.text.count("\n", previous, offset)
+                previous = offset
+                if not numbers or numbers[-1] != line:
+                    numbers.append(line)
+            self._line_numbers[key] = numbers
+        return self._line_numbers[key]
+
+    def memo(self, key, compute):
+        """Compute a value derived from the index once (e.g. a multi-field line parse)."""
+        if key not in self._memo:
+            self._memo[key] = compute(self)
+        return self._memo[key]
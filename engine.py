@@ -0,0 +1,245 @@
+"""Process-pool extraction engine.
+
+pdfplumber parsing and the regex extractors are CPU bound, so running them
+inside the async endpoints blocks the uvicorn event loop. The engine hands
+each file to a pool of worker processes and lets the endpoints await the
+result, keeping the loop free for other requests (including /health).
+
+Scanned PDFs without a text layer are handed on to a second, smaller pool
+(the OCR lane) with its own concurrency limit, so a batch of slow OCR work
+never takes the slots that digital documents are extracted in. Within each
+pool the slots are shared fairly between clients, see scheduler.py.
+"""
+import asyncio
+import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from extractors import AUTO_DETECT, NoTextLayerError, detect_and_extract, extract_document
+from metrics import DOCUMENTS_TOTAL, STAGE_SECONDS, collect_samples, observe_samples
+from ocr import ocr_enabled
+from scheduler import FairScheduler, current_client, parse_weights
+from result_cache import cache_key, digest_key, file_cache_key, result_cache
+
+
+class EngineBusyError(Exception):
+    """Raised when the extraction queue is full and a file cannot be queued."""
+
+
+class ExtractionEngine:
+    """Bounded process pool shared by all extraction endpoints.
+
+    At most ``max_in_flight`` files are handed to the pool at once; further
+    submissions wait for a free slot (backpressure), which goes to the
+    waiting clients in turn (``weights`` per client id). Once ``max_queue``
+    files are already waiting, new submissions are rejected with
+    EngineBusyError instead of piling up in memory.
+
+    ``workers=0`` runs extraction on the default thread executor instead of
+    a process pool, which is handy for debugging. When a ``cache`` is given,
+    results are looked up by content hash before anything is queued, and a
+    file whose content is already being extracted (the same PDF twice in a
+    batch, or in two concurrent requests) waits for that extraction instead
+    of running its own.
+
+    ``ocr`` is the engine PDFs without any text are re-run on with the OCR
+    text backend; without one they come back with empty fields.
+    """
+
+    def __init__(self, workers=None, max_in_flight=None, max_queue=None, cache=None, ocr=None,
+                 queue_stage="queue_wait", weights=None):
+        self.cache = cache
+        self.weights = weights
+        self.ocr = ocr
+        self.queue_stage = queue_stage
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.max_in_flight = max_in_flight or max(self.workers, 1) * 2
+        self.max_queue = max_queue if max_queue is not None else 1000
+        self._executor = None
+        self._slots = None
+        self._waiting = 0
+        self._running = 0
+        self._in_progress = {}
+        # Set once the first extraction has finished, see main's startup report
+        self.first_result = None
+
+    def start(self):
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = FairScheduler(self.max_in_flight, self.weights)
+        self.first_result = asyncio.Event()
+        if self.ocr is not None:
+            self.ocr.start()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.ocr is not None:
+            self.ocr.shutdown()
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on the pool, waiting for a free slot first."""
+        if self._slots is None:
+            self.start()
+        if self._waiting >= self.max_queue:
+            raise EngineBusyError("Extraction queue is full, please retry later")
+
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await self._slots.acquire(*current_client.get())
+        finally:
+            self._waiting -= 1
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=self.queue_stage)
+
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # Stage timings taken in the worker come back with the result
+            result, samples = await loop.run_in_executor(self._executor, collect_samples, func, *args)
+        finally:
+            self._running -= 1
+            self._slots.release()
+        observe_samples(samples)
+        self.first_result.set()
+        return result
+
+    async def warm_up(self, func):
+        """Start every worker process (of the OCR lane too) and run ``func()`` once per worker.
+
+        Runs next to real work without taking its slots; the metric samples
+        taken during the warm-up are dropped.
+        """
+        if self._slots is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._executor, collect_samples, func) for _ in range(max(self.workers, 1))
+        ])
+        if self.ocr is not None:
+            await self.ocr.warm_up(func)
+
+    async def extract(self, source, document_type, digest=None):
+        """Extract the fields of one PDF given as bytes or a file path.
+
+        Passing a path keeps the PDF out of this process's memory and out of
+        the pickled task; ``digest`` (its sha256, when already known) saves
+        hashing it again for the cache lookup.
+        """
+        return await self._cached(document_type, source, digest, extract_document, source, document_type)
+
+    async def detect_and_extract(self, source, digest=None):
+        """Detect the document type of one PDF and extract it as that type.
+
+        Returns {"document_type", "confidence", "data"}, see
+        extractors.detect_and_extract.
+        """
+        return await self._cached(AUTO_DETECT, source, digest, detect_and_extract, source)
+
+    async def _cached(self, document_type, source, digest, func, *args):
+        try:
+            data, outcome = await self._lookup_or_run(document_type, source, digest, func, *args)
+        except EngineBusyError:
+            raise
+        except Exception:
+            DOCUMENTS_TOTAL.inc(document_type=document_type, outcome="failed")
+            raise
+        if document_type == AUTO_DETECT:
+            document_type = data["document_type"] or "unknown"
+        DOCUMENTS_TOTAL.inc(document_type=document_type, outcome=outcome)
+        return data
+
+    async def _lookup_or_run(self, document_type, source, digest, func, *args):
+        if self.cache is None:
+            return await self._extract(func, *args)
+
+        if digest is not None:
+            key = digest_key(digest, document_type)
+        elif isinstance(source, str):
+            key = await asyncio.to_thread(file_cache_key, source, document_type)
+        else:
+            key = await asyncio.to_thread(cache_key, source, document_type)
+        data = await self.cache.get_async(key)
+        if data is not None:
+            return data, "cached"
+
+        while key in self._in_progress:
+            shared = self._in_progress[key]
+            try:
+                # Callers may mutate their result, so each one gets its own copy
+                return copy.deepcopy(await asyncio.shield(shared)), "shared"
+            except asyncio.CancelledError:
+                if not shared.cancelled():
+                    raise
+                # The request running it went away; run it here instead
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_progress[key] = future
+        try:
+            data, outcome = await self._extract(func, *args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._in_progress[key]
+        future.set_result(copy.deepcopy(data))
+        await self.cache.put_async(key, data)
+        return data, outcome
+
+    async def _extract(self, func, *args):
+        """(data, outcome) of ``func(*args, backends, scanned_error)``, on the OCR lane for scans."""
+        if self.ocr is None:
+            return await self.run(func, *args, None, False), "extracted"
+        try:
+            return await self.run(func, *args, None, True), "extracted"
+        except NoTextLayerError:
+            return await self.ocr.run(func, *args, ["ocr"], False), "ocr"
+
+    def queue_depths(self):
+        """client id -> files waiting for a slot, on this engine and its OCR lane."""
+        depths = dict(self._slots.queue_depths()) if self._slots is not None else {}
+        if self.ocr is not None:
+            for client, depth in self.ocr.queue_depths().items():
+                depths[client] = depths.get(client, 0) + depth
+        return depths
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": self._waiting,
+            "scheduler": self._slots.stats() if self._slots is not None else None,
+            "ocr": self.ocr.stats() if self.ocr is not None else None,
+        }
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+ocr_engine = ExtractionEngine(
+    workers=_env_int("OCR_WORKERS", 1),
+    max_in_flight=_env_int("OCR_MAX_IN_FLIGHT"),
+    max_queue=_env_int("OCR_MAX_QUEUE"),
+    queue_stage="ocr_queue_wait",
+    weights=parse_weights(os.environ.get("CLIENT_WEIGHTS")),
+) if ocr_enabled() else None
+
+engine = ExtractionEngine(
+    workers=_env_int("EXTRACTION_WORKERS"),
+    max_in_flight=_env_int("EXTRACTION_MAX_IN_FLIGHT"),
+    max_queue=_env_int("EXTRACTION_MAX_QUEUE"),
+    cache=result_cache,
+    ocr=ocr_engine,
+    weights=parse_weights(os.environ.get("CLIENT_WEIGHTS")),
+)
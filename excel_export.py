@@ -0,0 +1,74 @@
+"""Excel export of extraction results.
+
+Rows are written with openpyxl's write-only (streaming) workbook, so memory
+stays flat no matter how many records are exported, and column widths are
+computed from the extracted dicts instead of re-reading every cell after
+the fact. The layout matches the previous pandas export: one column per
+field in first-seen order, a bold header row, missing values left empty.
+
+openpyxl takes a noticeable share of the API's import time, so it is only
+imported by the first export.
+"""
+from metrics import STAGE_SECONDS
+
+MAX_COLUMN_WIDTH = 50
+
+
+def collect_columns(rows):
+    """Column names in first-seen order and their display widths.
+
+    Widths follow the old autosizing rule: the longest value in the column
+    (header included, empty cells counting as 0) plus 2, capped at
+    MAX_COLUMN_WIDTH.
+    """
+    widths = {}
+    for row in rows:
+        for key, value in row.items():
+            if key not in widths:
+                widths[key] = len(str(key))
+            length = len(str(value)) if value is not None else 0
+            if length > widths[key]:
+                widths[key] = length
+
+    return list(widths), [min(width + 2, MAX_COLUMN_WIDTH) for width in widths.values()]
+
+
+def write_excel(path, rows, sheet_name):
+    """Write a list of dicts to an .xlsx file with one row per dict."""
+    with STAGE_SECONDS.time(stage="excel_build"):
+        return _write_excel(path, rows, sheet_name)
+
+
+def _write_excel(path, rows, sheet_name):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+    from openpyxl.utils import get_column_letter
+
+    columns, widths = collect_columns(rows)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    # Write-only sheets need their column widths before the first row
+    for index, width in enumerate(widths, start=1):
+        worksheet.column_dimensions[get_column_letter(index)].width = width
+
+    thin = Side(style="thin")
+    header_font = Font(bold=True)
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_alignment = Alignment(horizontal="center", vertical="top")
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = header_font
+        cell.border = header_border
+        cell.alignment = header_alignment
+        header.append(cell)
+    worksheet.append(header)
+
+    for row in rows:
+        worksheet.append([row.get(column) for column in columns])
+
+    workbook.save(path)
+    return path
@@ -0,0 +1,133 @@
+"""Extracted batches kept around for export in several formats.
+
+/extract-export parses every uploaded file once and keeps the results and
+the distinct PDFs as an export session. The Excel, Parquet and renamed-PDF
+ZIP artifacts are only built when first downloaded, from the stored
+results, so another format or other rename options never parse the files
+again. A session expires once it has not been used for its TTL; its
+directory (PDFs and built artifacts) is removed with it by a background
+sweep. The PDFs live in an artifact store directory and are counted against
+that store's disk quota for as long as the session exists.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from artifacts import artifact_store
+
+logger = logging.getLogger(__name__)
+
+class ExportNotFoundError(Exception):
+    """Raised for an unknown or expired export id."""
+
+
+class ExportFile:
+    """One uploaded file of a session and its extraction result."""
+
+    __slots__ = ("filename", "path", "digest", "document_type", "confidence", "data")
+
+    def __init__(self, filename, path, digest, document_type, confidence, data):
+        self.filename = filename
+        self.path = path
+        self.digest = digest
+        self.document_type = document_type
+        self.confidence = confidence
+        self.data = data
+
+
+class ExportSession:
+    def __init__(self, export_id, directory, document_type, files, duplicates, ttl):
+        self.id = export_id
+        self.directory = directory
+        self.document_type = document_type
+        self.files = files
+        self.duplicates = duplicates
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        # Artifact kind (e.g. "excel", "zip:name+passport") -> artifact store name
+        self.artifacts = {}
+        self._locks = {}
+
+    def lock(self, kind):
+        """Lock held while an artifact kind is built, so concurrent first downloads build it once."""
+        return self._locks.setdefault(kind, asyncio.Lock())
+
+    def rows(self):
+        """Extracted data of every file with its Source_File, in upload order."""
+        return [{**file.data, "Source_File": file.filename} for file in self.files]
+
+
+class ExportStore:
+    """In-memory export sessions with a sliding TTL, swept every ``sweep_interval`` seconds.
+
+    The sessions' PDFs are reserved in ``artifacts`` (an ArtifactStore).
+    """
+
+    def __init__(self, artifacts, ttl_seconds=3600, sweep_interval=60):
+        self.artifacts = artifacts
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.expired = 0
+
+    def create(self, directory, document_type, files, duplicates):
+        session = ExportSession(uuid.uuid4().hex, directory, document_type, files, duplicates, self.ttl_seconds)
+        self.artifacts.reserve(session.id, sum(os.path.getsize(path) for path in {file.path for file in files}))
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, export_id):
+        with self._lock:
+            session = self._sessions.get(export_id)
+            if session is None or session.expires_at <= time.time():
+                raise ExportNotFoundError(export_id)
+            session.expires_at = time.time() + self.ttl_seconds
+            return session
+
+    def sweep(self):
+        """Drop expired sessions and their directories; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [session for session in self._sessions.values() if session.expires_at <= now]
+            for session in expired:
+                del self._sessions[session.id]
+            self.expired += len(expired)
+        for session in expired:
+            shutil.rmtree(session.directory, ignore_errors=True)
+            self.artifacts.release(session.id)
+        return len(expired)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("export sweep failed")
+
+    def start(self):
+        self._sweeper = asyncio.ensure_future(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self):
+        with self._lock:
+            return {"sessions": len(self._sessions), "ttl_seconds": self.ttl_seconds, "expired": self.expired}
+
+
+export_store = ExportStore(
+    artifact_store,
+    ttl_seconds=int(os.environ.get("EXPORT_TTL_SECONDS", 3600)),
+    sweep_interval=artifact_store.sweep_interval,
+)
@@ -0,0 +1,589 @@
+"""Document extractors shared by the API and the extraction worker processes.
+
+This module deliberately avoids importing FastAPI so that pool workers stay
+light to spawn.
+
+Each document type is described by a DocumentSpec: an ordered table of
+FieldSpecs mapping an output field to one or more regex rules (compiled once
+at import) and a post-processor. Adding a document type means adding a table,
+not another hand-written function.
+"""
+import io
+import re
+
+from classifier import CLASSIFIER_VERSION, classify
+from doc_index import DocumentIndex
+from metrics import FIELDS_SECONDS, STAGE_SECONDS, TEXT_BACKEND_FALLBACKS_TOTAL, record
+from pdf_text import PagePlan, extract_planned, load_pdf_text, text_backends
+
+SUPPORTED_DOCUMENT_TYPES = ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"]
+
+# document_type value asking for the type to be detected per file
+AUTO_DETECT = "AUTO"
+ACCEPTED_DOCUMENT_TYPES = SUPPORTED_DOCUMENT_TYPES + [AUTO_DETECT]
+
+# ========================= HELPER FUNCTIONS =========================
+_CLEAN_LABELS_RE = re.compile(r"Reference No|Payment Receipt No|Jenis Kelamin|Kewarganegaraan|Pekerjaan|Alamat")
+_CLEAN_CHARS_RE = re.compile(r"[^A-Za-z0-9\s,./-]")
+_DATE_RE = re.compile(r"(\d{2})[-/](\d{2})[-/](\d{4})")
+_WHITESPACE_RE = re.compile(r"\s+")
+_QUOTES_RE = re.compile(r'["\'\n\r\t]+')
+_NEWLINE_INDENT_RE = re.compile(r"\n\s*")
+
+def clean_text(text, is_name_or_pob=False):
+    if text is None:
+        return ""
+    text = _CLEAN_LABELS_RE.sub("", text)
+    if is_name_or_pob:
+        text = text.replace(".", "")
+    text = _CLEAN_CHARS_RE.sub("", text).strip()
+    return " ".join(text.split())
+
+def format_date(date_str):
+    if not date_str:
+        return ""
+    match = _DATE_RE.search(date_str)
+    if match:
+        day, month, year = match.groups()
+        return f"{day}/{month}/{year}"
+    return date_str
+
+def split_birth_place_date(text):
+    if text:
+        parts = text.split(", ")
+        if len(parts) == 2:
+            return parts[0].strip(), format_date(parts[1])
+    return text, None
+
+def clean_extracted_text(text):
+    if not text:
+        return None
+    cleaned = _WHITESPACE_RE.sub(' ', text.strip())
+    cleaned = _QUOTES_RE.sub(' ', cleaned).strip()
+    return cleaned if cleaned else None
+
+# ========================= FIELD SPEC ENGINE =========================
+
+def group1(match):
+    return match.group(1)
+
+def group1_stripped(match):
+    return match.group(1).strip()
+
+def collapsed(match):
+    """group(1) stripped with inner whitespace collapsed, None when empty"""
+    result = _WHITESPACE_RE.sub(' ', match.group(1).strip())
+    return result if result else None
+
+def collapsed_clean(match):
+    return clean_extracted_text(collapsed(match))
+
+def constant(value):
+    return lambda index: value
+
+class FieldSpec:
+    """One output field: regex rules tried in order, or a computed value.
+
+    ``rules`` is a pattern, or a list of patterns or (pattern, post) pairs;
+    patterns without their own post-processor use ``post``. The first rule
+    that matches wins; with ``skip_empty`` a rule whose post-processed value
+    is empty falls through to the next one. ``compute(index)`` replaces the
+    rules for fields that are not a plain regex lookup.
+
+    ``anchor`` is a literal that every match of every rule must contain
+    (matched case-insensitively when ``flags`` has re.IGNORECASE); when the
+    document index has no occurrence of it the rules are not run at all.
+
+    ``kind`` is the column type in typed exports: "string", or "date" for
+    values produced by format_date (dd/mm/yyyy).
+    """
+
+    def __init__(self, name, rules=(), post=group1, flags=0, default=None, skip_empty=False, compute=None,
+                 anchor=None, kind="string"):
+        if isinstance(rules, str):
+            rules = [rules]
+        self.name = name
+        self.kind = kind
+        self.anchor = (anchor, bool(flags & re.IGNORECASE)) if anchor else None
+        self.rules = [
+            (re.compile(rule, flags), post) if isinstance(rule, str) else (re.compile(rule[0], flags), rule[1])
+            for rule in rules
+        ]
+        self.default = default
+        self.skip_empty = skip_empty
+        self.compute = compute
+
+class DocumentSpec:
+    """Ordered field table for one document type.
+
+    Fields and computed values share one DocumentIndex of the text. Every
+    distinct compiled pattern is searched at most once per document, even
+    when several fields (e.g. place and date of birth) read from it.
+    """
+
+    def __init__(self, document_type, fields, finalize=None):
+        self.document_type = document_type
+        self.fields = fields
+        self.finalize = finalize
+
+    def extract(self, text):
+        with FIELDS_SECONDS.time(document_type=self.document_type):
+            return self.extract_index(DocumentIndex(text))
+
+    def extract_index(self, index):
+        text = index.text
+        searched = {}
+        data = {}
+        for field in self.fields:
+            if field.compute is not None:
+                data[field.name] = field.compute(index)
+                continue
+
+            value = field.default
+            if field.anchor is not None and not index.has(*field.anchor):
+                data[field.name] = value
+                continue
+
+            for pattern, post in field.rules:
+                if pattern not in searched:
+                    searched[pattern] = pattern.search(text)
+                match = searched[pattern]
+                if match:
+                    candidate = post(match)
+                    if field.skip_empty and not candidate:
+                        continue
+                    value = candidate
+                    break
+            data[field.name] = value
+
+        return self.finalize(data) if self.finalize else data
+
+    def with_type(self, document_type):
+        """Same fields, different "Jenis Dokumen" (ITK reuses the ITAS layout)."""
+        fields = [
+            FieldSpec("Jenis Dokumen", compute=constant(document_type), kind=field.kind) if field.name == "Jenis Dokumen" else field
+            for field in self.fields
+        ]
+        return DocumentSpec(document_type, fields, self.finalize)
+
+# ========================= DOCUMENT SPECS =========================
+
+def _birth_place(match):
+    place, _ = split_birth_place_date(match.group(1))
+    return clean_text(place, is_name_or_pob=True) if place else None
+
+def _birth_date(match):
+    _, date = split_birth_place_date(match.group(1))
+    return date
+
+_SKTT_ISSUE_RE = re.compile(r'([A-Z\s]+),\s*(\d{2}-\d{2}-\d{4})')
+
+def _sktt_date_issue(index):
+    # The issue date sits on the line right above "KEPALA DINAS"
+    offset = index.first("KEPALA DINAS", True)
+    if offset is None:
+        return None
+    i = index.line_of(offset)
+    match = _SKTT_ISSUE_RE.search(index.lines[i-1]) if i > 0 else None
+    return format_date(match.group(2)) if match else None
+
+_SKTT_BIRTH = r'Tempat/Tgl Lahir\s*:\s*([\w\s,0-9-]+)'
+
+SKTT_SPEC = DocumentSpec("SKTT", [
+    FieldSpec("NIK", r'NIK/Number of Population Identity\s*:\s*(\d+)',
+              anchor="NIK/Number of Population Identity"),
+    FieldSpec("Name", r'Nama/Name\s*:\s*([\w\s]+)', lambda m: clean_text(m.group(1), is_name_or_pob=True),
+              anchor="Nama/Name"),
+    FieldSpec("Jenis Kelamin", r'Jenis Kelamin/Sex\s*:\s*(MALE|FEMALE)', anchor="Jenis Kelamin/Sex"),
+    FieldSpec("Place of Birth", _SKTT_BIRTH, _birth_place, anchor="Tempat/Tgl Lahir"),
+    FieldSpec("Date of Birth", _SKTT_BIRTH, _birth_date, anchor="Tempat/Tgl Lahir", kind="date"),
+    FieldSpec("Nationality", r'Kewarganegaraan/Nationality\s*:\s*([\w\s]+)', lambda m: clean_text(m.group(1)),
+              anchor="Kewarganegaraan/Nationality"),
+    FieldSpec("Occupation", r'Pekerjaan/Occupation\s*:\s*([\w\s]+)', lambda m: clean_text(m.group(1)),
+              anchor="Pekerjaan/Occupation"),
+    FieldSpec("Address", r'Alamat/Address\s*:\s*([\w\s,./-]+)', lambda m: clean_text(m.group(1)),
+              anchor="Alamat/Address"),
+    FieldSpec("KITAS/KITAP", r'Nomor KITAP/KITAS Number\s*:\s*([\w-]+)', lambda m: clean_text(m.group(1)),
+              anchor="Nomor KITAP/KITAS Number"),
+    FieldSpec("Passport Expiry", r'Berlaku Hingga s.d/Expired date\s*:\s*([\d-]+)', lambda m: format_date(m.group(1)),
+              anchor="/Expired date", kind="date"),
+    FieldSpec("Date Issue", compute=_sktt_date_issue, kind="date"),
+    FieldSpec("Jenis Dokumen", compute=constant("SKTT")),
+])
+
+ENGLISH_MONTHS = {
+    'January': '01', 'February': '02', 'March': '03', 'April': '04',
+    'May': '05', 'June': '06', 'July': '07', 'August': '08',
+    'September': '09', 'October': '10', 'November': '11', 'December': '12'
+}
+
+INDONESIAN_MONTHS = {
+    'januari': '01', 'februari': '02', 'maret': '03', 'april': '04',
+    'mei': '05', 'juni': '06', 'juli': '07', 'agustus': '08',
+    'september': '09', 'oktober': '10', 'november': '11', 'desember': '12'
+}
+
+def _itas_place_date_of_birth(match):
+    place = match.group(1).strip()
+    date = match.group(2).strip()
+    return f"{place}, {format_date(date)}"
+
+def _itas_written_date(match):
+    # "Jakarta, 5 March 2025" -> 05/03/2025
+    day, month, year = match.group(2), match.group(3), match.group(4)
+    month_num = ENGLISH_MONTHS.get(month, month)
+    return format_date(f"{day.zfill(2)}/{month_num}/{year}")
+
+ITAS_SPEC = DocumentSpec("ITAS", [
+    FieldSpec("Name", r"([A-Z\s]+)\nPERMIT NUMBER", group1_stripped, anchor="PERMIT NUMBER"),
+    FieldSpec("Permit Number", r"PERMIT NUMBER\s*:\s*([A-Z0-9-]+)", anchor="PERMIT NUMBER"),
+    FieldSpec("Stay Permit Expiry", r"STAY PERMIT EXPIRY\s*:\s*([\d/]+)", lambda m: format_date(m.group(1)),
+              anchor="STAY PERMIT EXPIRY", kind="date"),
+    FieldSpec("Place & Date of Birth", r"Place / Date of Birth\s*.*:\s*([A-Za-z\s]+)\s*/\s*([\d-]+)",
+              _itas_place_date_of_birth, anchor="Place / Date of Birth"),
+    FieldSpec("Passport Number", r"Passport Number\s*: ([A-Z0-9]+)", anchor="Passport Number"),
+    FieldSpec("Passport Expiry", r"Passport Expiry\s*: ([\d-]+)", lambda m: format_date(m.group(1)),
+              anchor="Passport Expiry", kind="date"),
+    FieldSpec("Nationality", r"Nationality\s*: ([A-Z]+)", anchor="Nationality"),
+    FieldSpec("Gender", r"Gender\s*: ([A-Z]+)", anchor="Gender"),
+    FieldSpec("Address", r"Address\s*:\s*(.+)", group1_stripped, anchor="Address"),
+    FieldSpec("Occupation", r"Occupation\s*:\s*(.+)", group1_stripped, anchor="Occupation"),
+    FieldSpec("Guarantor", r"Guarantor\s*:\s*(.+)", group1_stripped, anchor="Guarantor"),
+    FieldSpec("Date Issue", [
+        (r"([A-Za-z]+),\s*(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})", _itas_written_date),
+        (r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})", lambda m: format_date(m.group(0))),
+    ], kind="date"),
+    FieldSpec("Jenis Dokumen", compute=constant("ITAS")),
+])
+
+ITK_SPEC = ITAS_SPEC.with_type("ITK")
+
+def _validity_period(match):
+    start_date = format_date(match.group(1))
+    end_date = format_date(match.group(2))
+    return f"{start_date} - {end_date}"
+
+def _notifikasi_written_date(match):
+    # "Pada tanggal : 5 Maret 2025" -> 05/03/2025
+    day = match.group(1).zfill(2)
+    month = INDONESIAN_MONTHS.get(match.group(2).lower(), '01')
+    return f"{day}/{month}/{match.group(3)}"
+
+NOTIFIKASI_SPEC = DocumentSpec("Notifikasi", [
+    FieldSpec("Nomor Keputusan", r"NOMOR\s+([A-Z0-9./-]+)", group1_stripped, re.IGNORECASE, "", anchor="NOMOR"),
+    FieldSpec("Nama TKA", r"Nama TKA\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "", anchor="Nama TKA"),
+    FieldSpec("Tempat/Tanggal Lahir", r"Tempat/Tanggal Lahir\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "",
+              anchor="Tempat/Tanggal Lahir"),
+    FieldSpec("Kewarganegaraan", r"Kewarganegaraan\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "",
+              anchor="Kewarganegaraan"),
+    FieldSpec("Alamat Tempat Tinggal", r"Alamat Tempat Tinggal\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "",
+              anchor="Alamat Tempat Tinggal"),
+    FieldSpec("Nomor Paspor", r"Nomor Paspor\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "", anchor="Nomor Paspor"),
+    FieldSpec("Jabatan", r"Jabatan\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "", anchor="Jabatan"),
+    FieldSpec("Lokasi Kerja", r"Lokasi Kerja\s*:\s*(.*)", group1_stripped, re.IGNORECASE, "", anchor="Lokasi Kerja"),
+    FieldSpec("Berlaku", [
+        r"Berlaku\s*:?\s*(\d{2}[-/]\d{2}[-/]\d{4})\s*(?:s\.?d\.?|sampai dengan)?\s*(\d{2}[-/]\d{2}[-/]\d{4})",
+        r"Tanggal Berlaku\s*:?\s*(\d{2}[-/]\d{2}[-/]\d{4})\s*s\.?d\.?\s*(\d{2}[-/]\d{2}[-/]\d{4})",
+    ], _validity_period, re.IGNORECASE, "", anchor="Berlaku"),
+    FieldSpec("Date Issue", [
+        (r"Pada tanggal\s*:\s*(\d{1,2})\s+(Januari|Februari|Maret|April|Mei|Juni|Juli|Agustus|September|Oktober|November|Desember)\s+(\d{4})",
+         _notifikasi_written_date),
+        (r"Pada tanggal\s*:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{4})", lambda m: format_date(m.group(1))),
+    ], flags=re.IGNORECASE, default="", anchor="Pada tanggal", kind="date"),
+    FieldSpec("Jenis Dokumen", compute=constant("Notifikasi")),
+])
+
+_BILLING_CODE_RE = re.compile(r'(\d{12,})')
+
+def _dkptka_billing_code(index):
+    # The code is printed on one of the three lines below its label
+    for i in index.line_numbers('Kode Billing Pembayaran'):
+        joined = " ".join(index.lines[i+1:i+4])
+        match = _BILLING_CODE_RE.search(joined)
+        if match:
+            return match.group(1).strip()
+    return None
+
+def _dkptka_address(match):
+    address = _NEWLINE_INDENT_RE.sub(' ', match.group(1).strip())
+    return clean_extracted_text(_WHITESPACE_RE.sub(' ', address))
+
+def _none_if_blank(data):
+    return {key: value if value and str(value).strip() else None for key, value in data.items()}
+
+DKPTKA_SPEC = DocumentSpec("DKPTKA", [
+    FieldSpec("Nama Pemberi Kerja", [
+        r'Nama\s+Pemberi\s+Kerja\s*:\s*([^\n]+)',
+        r'([A-Z][A-Z\s]*PT\.?[A-Z\s]*)\s*(?=\n.*Alamat)',
+    ], collapsed_clean, re.IGNORECASE, skip_empty=True),
+    FieldSpec("Alamat", [
+        r'Alamat\s*:\s*(.*?)(?=\n\s*\d+\.\s*Nomor\s+Telepon|\n\s*3\.|$)',
+        r'Alamat\s*:\s*(.*?)(?=Nomor\s+Telepon|Email|$)',
+    ], _dkptka_address, re.DOTALL | re.IGNORECASE, anchor="Alamat"),
+    FieldSpec("No Telepon", r'Nomor\s+Telepon\s*:\s*([0-9\-\+$$$$\s]+)', collapsed, re.IGNORECASE, anchor="Telepon"),
+    FieldSpec("Email", r'Email\s*:\s*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', collapsed, re.IGNORECASE,
+              anchor="Email"),
+    FieldSpec("Nama TKA", r'Nama\s+TKA\s*:\s*([^\n]+)', collapsed_clean, re.IGNORECASE, anchor="TKA"),
+    FieldSpec("Tempat/Tanggal Lahir", r'Tempat.*?Lahir\s*:\s*([^\n]+)', collapsed_clean, re.IGNORECASE,
+              anchor="Tempat"),
+    FieldSpec("Nomor Paspor", r'Nomor\s+Paspor\s*:\s*([A-Z0-9]+)', collapsed, re.IGNORECASE, anchor="Paspor"),
+    FieldSpec("Kewarganegaraan", r'Kewarganegaraan\s*:\s*([^\n]+)', collapsed_clean, re.IGNORECASE,
+              anchor="Kewarganegaraan"),
+    FieldSpec("Jabatan", r'Jabatan\s*:\s*([^\n]+)', collapsed_clean, re.IGNORECASE, anchor="Jabatan"),
+    FieldSpec("Kanim", r'Kanim.*?:\s*([^\n]+)', collapsed_clean, re.IGNORECASE, anchor="Kanim"),
+    FieldSpec("Lokasi Kerja", r'Lokasi\s+Kerja\s*:\s*([^\n]+)', collapsed_clean, re.IGNORECASE, anchor="Lokasi"),
+    FieldSpec("Kode Billing Pembayaran", compute=_dkptka_billing_code),
+    FieldSpec("DKPTKA", r'DKPTKA.*?:\s*(US\$[^\n]+)', collapsed_clean, re.IGNORECASE, anchor="DKPTKA"),
+    FieldSpec("Jenis Dokumen", compute=constant("DKPTKA")),
+], finalize=_none_if_blank)
+
+# ========================= IMPROVED EXTRACTORS =========================
+
+def extract_sktt(text):
+    return SKTT_SPEC.extract(text)
+
+_EVLN_DEAR_RE = re.compile(r"Dear\s+(Mr\.|Ms\.|Sir|Madam)?", re.IGNORECASE)
+_EVLN_NAME_RE = re.compile(r"(?i)\bName\b|\bNama\b")
+_EVLN_POB_RE = re.compile(r"(?i)\bPlace of Birth\b|\bTempat Lahir\b")
+_EVLN_VISA_TYPE_RE = re.compile(r'\s*Visa\s*Type\s*.*')
+_EVLN_DOB_RE = re.compile(r"(?i)\bDate of Birth\b|\bTanggal Lahir\b")
+_EVLN_PASSPORT_NO_RE = re.compile(r"(?i)\bPassport No\b")
+_EVLN_PASSPORT_EXPIRY_RE = re.compile(r"(?i)\bPassport Expiry\b")
+_EVLN_DATE_RE = re.compile(r"(\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4})")
+_EVLN_TOKEN_RE = re.compile(r"\b([A-Z0-9]+)\b")
+
+# Literals that any line carrying one of the EVLN labels must contain
+_EVLN_LABEL_ANCHORS = [
+    ("name", True), ("nama", True), ("place of birth", True), ("tempat lahir", True),
+    ("date of birth", True), ("tanggal lahir", True), ("passport no", True), ("passport expiry", True),
+]
+
+def _evln_lines(index):
+    # EVLN letters are parsed line by line: labels and values share a line,
+    # and the name follows the "Dear ..." salutation. Only the lines the
+    # index found a label on are examined.
+    lines = index.lines
+    data = {
+        "Name": "",
+        "Place of Birth": "",
+        "Date of Birth": "",
+        "Passport No": "",
+        "Passport Expiry": "",
+    }
+
+    for i in index.line_numbers("dear", True):
+        if _EVLN_DEAR_RE.search(lines[i]):
+            if i + 1 < len(lines):
+                name_candidate = lines[i + 1].strip()
+                if 3 < len(name_candidate) < 50:
+                    data["Name"] = clean_text(name_candidate, is_name_or_pob=True)
+            break
+
+    labelled = sorted(set(
+        number for anchor in _EVLN_LABEL_ANCHORS for number in index.line_numbers(*anchor)
+    ))
+    for line in (lines[i] for i in labelled):
+        if not data["Name"] and _EVLN_NAME_RE.search(line):
+            parts = line.split(":")
+            if len(parts) > 1:
+                data["Name"] = clean_text(parts[1], is_name_or_pob=True)
+
+        elif _EVLN_POB_RE.search(line):
+            parts = line.split(":")
+            if len(parts) > 1:
+                pob_cleaned = _EVLN_VISA_TYPE_RE.sub('', parts[1].strip())
+                data["Place of Birth"] = clean_text(pob_cleaned, is_name_or_pob=True)
+
+        elif _EVLN_DOB_RE.search(line):
+            match = _EVLN_DATE_RE.search(line)
+            if match:
+                data["Date of Birth"] = format_date(match.group(1))
+
+        elif _EVLN_PASSPORT_NO_RE.search(line):
+            match = _EVLN_TOKEN_RE.search(line)
+            if match:
+                data["Passport No"] = match.group(1)
+
+        elif _EVLN_PASSPORT_EXPIRY_RE.search(line):
+            match = _EVLN_DATE_RE.search(line)
+            if match:
+                data["Passport Expiry"] = format_date(match.group(1))
+
+    return data
+
+def _evln_field(name):
+    return lambda index: index.memo("evln_lines", _evln_lines)[name]
+
+EVLN_SPEC = DocumentSpec("EVLN", [
+    FieldSpec("Name", compute=_evln_field("Name")),
+    FieldSpec("Place of Birth", compute=_evln_field("Place of Birth")),
+    FieldSpec("Date of Birth", compute=_evln_field("Date of Birth"), kind="date"),
+    FieldSpec("Passport No", compute=_evln_field("Passport No")),
+    FieldSpec("Passport Expiry", compute=_evln_field("Passport Expiry"), kind="date"),
+    FieldSpec("Date Issue", [
+        r"(?i)(?:Date\s+of\s+Issue|Issue\s+Date|Issued\s+on|Tanggal\s+Penerbitan)\s*:?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})",
+        r"(?i)(?:Issued|Diterbitkan)\s*:?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})",
+    ], lambda m: format_date(m.group(1)), default="", kind="date"),
+    FieldSpec("Jenis Dokumen", compute=constant("EVLN")),
+])
+
+def extract_evln(text):
+    return EVLN_SPEC.extract(text)
+
+def extract_itas(text):
+    return ITAS_SPEC.extract(text)
+
+def extract_itk(text):
+    return ITK_SPEC.extract(text)
+
+def extract_notifikasi(text):
+    return NOTIFIKASI_SPEC.extract(text)
+
+def extract_dkptka(text):
+    """Extract DKPTKA document data"""
+    return DKPTKA_SPEC.extract(text)
+
+EXTRACTORS = {
+    "SKTT": extract_sktt,
+    "EVLN": extract_evln,
+    "ITAS": extract_itas,
+    "ITK": extract_itk,
+    "Notifikasi": extract_notifikasi,
+    "DKPTKA": extract_dkptka,
+}
+
+DOCUMENT_SPECS = {
+    "SKTT": SKTT_SPEC,
+    "EVLN": EVLN_SPEC,
+    "ITAS": ITAS_SPEC,
+    "ITK": ITK_SPEC,
+    "Notifikasi": NOTIFIKASI_SPEC,
+    "DKPTKA": DKPTKA_SPEC,
+}
+
+def output_schema(document_type):
+    """(field name, kind) extracted for document_type in output order (every type's, for AUTO_DETECT).
+
+    A field that different document types extract with different kinds is a string.
+    """
+    types = SUPPORTED_DOCUMENT_TYPES if document_type == AUTO_DETECT else [document_type]
+    kinds = {}
+    for name in types:
+        for field in DOCUMENT_SPECS[name].fields:
+            if kinds.setdefault(field.name, field.kind) != field.kind:
+                kinds[field.name] = "string"
+    return list(kinds.items())
+
+def output_fields(document_type):
+    """Field names extracted for document_type in output order (every type's, for AUTO_DETECT)."""
+    return [name for name, _ in output_schema(document_type)]
+
+# Where each type's data normally sits: the permits and the e-visa carry
+# everything on the first page, Notifikasi letters can run onto a second.
+# The required fields identify the holder; when one of them is missing the
+# whole PDF is scanned, otherwise optional fields that are not on the
+# planned pages stay empty instead of costing a read of every page.
+PAGE_PLANS = {
+    "SKTT": PagePlan([0], ["NIK", "Name", "KITAS/KITAP"]),
+    "EVLN": PagePlan([0], ["Name", "Passport No"]),
+    "ITAS": PagePlan([0], ["Name", "Permit Number", "Passport Number"]),
+    "ITK": PagePlan([0], ["Name", "Permit Number", "Passport Number"]),
+    "Notifikasi": PagePlan([0, 1], ["Nama TKA", "Nomor Paspor"]),
+    "DKPTKA": PagePlan([0], ["Nama TKA", "Nomor Paspor", "Kode Billing Pembayaran"]),
+}
+
+# Bump a document type's version whenever its extractor output changes, so
+# cached results produced by the old logic are no longer served.
+EXTRACTOR_VERSIONS = {
+    "SKTT": 2,
+    "EVLN": 2,
+    "ITAS": 2,
+    "ITK": 2,
+    "Notifikasi": 2,
+    "DKPTKA": 2,
+}
+
+def extractor_version(document_type):
+    """Cache version of document_type's output; AUTO_DETECT depends on every extractor."""
+    if document_type == AUTO_DETECT:
+        return ".".join(str(v) for v in [CLASSIFIER_VERSION] + list(EXTRACTOR_VERSIONS.values()))
+    return EXTRACTOR_VERSIONS.get(document_type, 0)
+
+def _open_pdf(source, backend="pdfplumber"):
+    return load_pdf_text(source if isinstance(source, str) else io.BytesIO(source), backend)
+
+def _validated(document_type, data):
+    """Whether data has every required field of document_type's page plan"""
+    plan = PAGE_PLANS.get(document_type)
+    return plan is not None and all(data.get(field) for field in plan.required)
+
+class NoTextLayerError(Exception):
+    """None of the pages read had any text, the PDF is most likely a scan.
+
+    ``result`` is what the extraction returned without text (empty fields),
+    for callers that cannot OCR it.
+    """
+
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+def _with_fallback(source, run, backends=None, scanned_error=False):
+    """Call ``run(doc)`` with each text backend in turn until its result validates.
+
+    ``run`` returns (document_type, data, result); the last backend's
+    result is returned whatever it is. With ``scanned_error`` a PDF without
+    any text raises NoTextLayerError instead of trying the other backends,
+    which would not find any text either.
+    """
+    backends = backends or text_backends()
+    for backend in backends:
+        with _open_pdf(source, backend) as doc:
+            document_type, data, result = run(doc)
+            has_text = doc.has_text
+        if scanned_error and not has_text:
+            raise NoTextLayerError(result)
+        if backend == backends[-1] or _validated(document_type, data):
+            return result
+        record(TEXT_BACKEND_FALLBACKS_TOTAL, 1, {"document_type": document_type or "unknown", "backend": backend})
+
+def extract_document(source, document_type, backends=None, scanned_error=False):
+    """Parse a PDF (bytes or file path) and run the extractor for document_type.
+
+    ``backends`` overrides the text backends from TEXT_BACKEND (e.g. ["ocr"]);
+    see _with_fallback for ``scanned_error``. Runs inside the extraction
+    worker processes, so it only takes and returns picklable values.
+    """
+    extractor = EXTRACTORS.get(document_type)
+    if not extractor:
+        return {}
+
+    def run(doc):
+        data = extract_planned(doc, extractor, PAGE_PLANS.get(document_type))
+        return document_type, data, data
+
+    return _with_fallback(source, run, backends, scanned_error)
+
+# Pages looked at for a text layer when the first page has none (e.g. a scanned cover)
+CLASSIFY_MAX_PAGES = 3
+
+def detect_and_extract(source, backends=None, scanned_error=False):
+    """Classify a PDF from its first page with text, then extract it as that type.
+
+    The classified page stays cached in the PdfText, so detection only adds
+    the keyword scan on top of the extraction. Returns a dict with
+    "document_type" (None when undetected), "confidence" and "data";
+    ``backends`` and ``scanned_error`` are as for extract_document.
+    """
+    def run(doc):
+        text = ""
+        for index in range(min(CLASSIFY_MAX_PAGES, len(doc))):
+            text = doc.page(index)
+            if text:
+                break
+        with STAGE_SECONDS.time(stage="classify"):
+            document_type, confidence = classify(text)
+        data = extract_planned(doc, EXTRACTORS[document_type], PAGE_PLANS[document_type]) if document_type else {}
+        return document_type, data, {"document_type": document_type, "confidence": confidence, "data": data}
+
+    return _with_fallback(source, run, backends, scanned_error)
@@ -0,0 +1,342 @@
+"""Background extraction jobs for large batches.
+
+A job is submitted with its files and answered immediately with a job id;
+worker tasks drain a local queue and clients poll the job for progress.
+Uploaded files are kept in the job directory and job state lives in SQLite,
+so unfinished jobs are picked up again after a restart.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobNotFoundError(Exception):
+    """Raised when a job id is unknown."""
+
+
+class JobStore:
+    """SQLite persistence for jobs and their files."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    document_type TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    total_files INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    error TEXT,
+                    result TEXT
+                );
+                CREATE TABLE IF NOT EXISTS job_files (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    data TEXT,
+                    error TEXT,
+                    PRIMARY KEY (job_id, idx)
+                );
+                """
+            )
+            self._db.commit()
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor
+
+    def executemany(self, sql, rows):
+        with self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+
+class JobManager:
+    """Queue of extraction jobs drained by ``concurrency`` worker tasks.
+
+    ``process_file(path, document_type, filename)`` is awaited for every file of a job
+    and returns the extracted data; ``finalize(job, entries)`` receives the
+    job row and a list of (filename, path, data) for the successful files
+    once all of them are done, runs in a thread, and returns the job result.
+
+    At most ``file_concurrency`` files of a job are processed at once. A file
+    whose processing raises one of ``retry_exceptions`` (the engine's queue
+    being full) stays pending and is retried after a backoff of up to
+    ``max_retry_delay`` seconds instead of being recorded as failed.
+
+    Finished jobs (their rows and directory) are removed ``ttl_seconds``
+    after they finished, checked every ``sweep_interval`` seconds. Job state
+    is read and written in threads, never on the event loop.
+    """
+
+    def __init__(self, root_dir, process_file, finalize, concurrency=1, file_concurrency=1,
+                 retry_exceptions=(), retry_delay=0.5, max_retry_delay=30, ttl_seconds=86400, sweep_interval=60):
+        self.root_dir = root_dir
+        self.process_file = process_file
+        self.finalize = finalize
+        self.concurrency = concurrency
+        self.file_concurrency = file_concurrency
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retries = 0
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.expired = 0
+        self._store = None
+        self._queue = None
+        self._loop = None
+        self._workers = []
+
+    @property
+    def store(self):
+        if self._store is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self._store = JobStore(os.path.join(self.root_dir, "jobs.sqlite3"))
+        return self._store
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # Jobs that were queued or interrupted mid-run resume where they stopped
+        for row in self.store.query(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ):
+            self._queue.put_nowait(row["id"])
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.ensure_future(self._sweep_forever()))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, document_type, options, files):
+        """Store (filename, spooled path) pairs as a new job and queue it.
+
+        The spooled files are moved into the job directory, so call it from
+        a thread in async code.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.root_dir, job_id)
+        os.makedirs(job_dir)
+
+        rows = []
+        for idx, (filename, source) in enumerate(files):
+            path = os.path.join(job_dir, f"{idx}.pdf")
+            shutil.move(source, path)
+            rows.append((job_id, idx, filename, path))
+        self.store.executemany(
+            "INSERT INTO job_files (job_id, idx, filename, path, status) VALUES (?, ?, ?, ?, 'pending')",
+            rows,
+        )
+
+        self.store.execute(
+            "INSERT INTO jobs (id, status, document_type, options, total_files, created_at) "
+            "VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, document_type, json.dumps(options), len(files), time.time()),
+        )
+        if self._queue is not None:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+        return job_id
+
+    def _job_row(self, job_id):
+        rows = self.store.query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            raise JobNotFoundError(job_id)
+        return rows[0]
+
+    def status(self, job_id):
+        job = self._job_row(job_id)
+        counts = dict(
+            (row["status"], row["n"])
+            for row in self.store.query(
+                "SELECT status, COUNT(*) AS n FROM job_files WHERE job_id = ? GROUP BY status", (job_id,)
+            )
+        )
+        done = counts.get("done", 0)
+        failed = counts.get("failed", 0)
+        completed = done + failed
+        total = job["total_files"]
+
+        eta_seconds = None
+        if job["status"] == "running" and job["started_at"] and completed:
+            elapsed = time.time() - job["started_at"]
+            eta_seconds = round(elapsed / completed * (total - completed), 1)
+
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "document_type": job["document_type"],
+            "total_files": total,
+            "files_done": done,
+            "files_failed": failed,
+            "files_pending": total - completed,
+            "progress": round(completed / total, 3) if total else 1.0,
+            "eta_seconds": eta_seconds,
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "error": job["error"],
+        }
+
+    def result(self, job_id):
+        """Job result payload, or None while the job is not finished."""
+        job = self._job_row(job_id)
+        if job["status"] != "completed":
+            return None
+        return json.loads(job["result"])
+
+    def stats(self):
+        counts = dict(
+            (row["status"], row["n"])
+            for row in self.store.query("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        )
+        return {
+            "concurrency": self.concurrency,
+            "file_concurrency": self.file_concurrency,
+            "retries": self.retries,
+            "expired": self.expired,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+        }
+
+    async def _execute(self, sql, params=()):
+        # SQLite commits stay off the event loop
+        await asyncio.to_thread(self.store.execute, sql, params)
+
+    async def _query(self, sql, params=()):
+        return await asyncio.to_thread(self.store.query, sql, params)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.exception("job failed", extra={"job_id": job_id})
+                await self._execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (str(e), time.time(), job_id),
+                )
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id):
+        job = await asyncio.to_thread(self._job_row, job_id)
+        await self._execute(
+            "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ?",
+            (time.time(), job_id),
+        )
+        pending = await self._query(
+            "SELECT idx, filename, path FROM job_files WHERE job_id = ? AND status = 'pending' ORDER BY idx",
+            (job_id,),
+        )
+
+        slots = asyncio.Semaphore(self.file_concurrency)
+
+        async def run_file(row):
+            delay = self.retry_delay
+            async with slots:
+                while True:
+                    try:
+                        data = await self.process_file(row["path"], job["document_type"], row["filename"])
+                        break
+                    except self.retry_exceptions:
+                        # Not the file's fault: it stays pending and is tried again once the engine has room
+                        self.retries += 1
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, self.max_retry_delay)
+                    except Exception as e:
+                        await self._execute(
+                            "UPDATE job_files SET status = 'failed', error = ? WHERE job_id = ? AND idx = ?",
+                            (str(e), job_id, row["idx"]),
+                        )
+                        return
+            await self._execute(
+                "UPDATE job_files SET status = 'done', data = ? WHERE job_id = ? AND idx = ?",
+                (json.dumps(data), job_id, row["idx"]),
+            )
+
+        await asyncio.gather(*[run_file(row) for row in pending])
+        await asyncio.to_thread(self._complete, job)
+
+    def _complete(self, job):
+        """Finalize a job whose files are all processed; runs in a thread."""
+        job_id = job["id"]
+        entries = [
+            (row["filename"], row["path"], json.loads(row["data"]))
+            for row in self.store.query(
+                "SELECT filename, path, data FROM job_files WHERE job_id = ? AND status = 'done' ORDER BY idx",
+                (job_id,),
+            )
+        ]
+        result = self.finalize(job, entries)
+        result["failed_files"] = [
+            {"filename": row["filename"], "error": row["error"]}
+            for row in self.store.query(
+                "SELECT filename, error FROM job_files WHERE job_id = ? AND status = 'failed' ORDER BY idx",
+                (job_id,),
+            )
+        ]
+
+        self.store.execute(
+            "UPDATE jobs SET status = 'completed', result = ?, finished_at = ? WHERE id = ?",
+            (json.dumps(result), time.time(), job_id),
+        )
+
+        # The outputs hold their own copies, the uploaded PDFs are no longer needed
+        for row in self.store.query("SELECT path FROM job_files WHERE job_id = ?", (job_id,)):
+            if os.path.exists(row["path"]):
+                os.remove(row["path"])
+
+    def sweep(self):
+        """Remove jobs finished more than ``ttl_seconds`` ago, rows and directory; returns how many."""
+        expired = [
+            row["id"] for row in self.store.query(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND finished_at <= ?",
+                (time.time() - self.ttl_seconds,),
+            )
+        ]
+        for job_id in expired:
+            self.store.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+            self.store.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        self.expired += len(expired)
+        return len(expired)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("job sweep failed")
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root_dir, job_id)
@@ -0,0 +1,63 @@
+"""Leveled, structured logging setup.
+
+Modules log through ``logging.getLogger(__name__)`` and pass context as
+``extra`` fields instead of formatting it into the message, e.g.
+``logger.info("zip built", extra={"zip_filename": name, "bytes": size})``.
+LOG_FORMAT selects ``text`` (message followed by key=value pairs) or
+``json`` (one object per line); LOG_LEVEL sets the level (default INFO).
+"""
+import json
+import logging
+import os
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            pairs = " ".join(f"{key}={value}" for key, value in fields.items())
+            head, sep, tail = line.partition("\n")
+            line = f"{head} {pairs}{sep}{tail}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, log_format=None):
+    """Install a single stderr handler on the root logger."""
+    level = (level or os.environ.get("LOG_LEVEL") or "INFO").upper()
+    log_format = log_format or os.environ.get("LOG_FORMAT") or "text"
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if getattr(existing, "_pdf_extractor", False):
+            root.removeHandler(existing)
+    handler._pdf_extractor = True
+    root.addHandler(handler)
+    root.setLevel(level)
@@ -1,18 +1,49 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import time
+
+# Taken before anything else is imported; the startup report counts from here
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
 from typing import List, Optional
-import pdfplumber
-import pandas as pd
+import asyncio
+import copy
 import re
 import tempfile
 import os
-import shutil
-import zipfile
 from datetime import datetime
-import io
+import hashlib
 import json
-import traceback
+import logging
+import shutil
+
+from admission import AdmissionMiddleware, RateLimiter, parse_client_tokens, parse_trusted_proxies
+from artifacts import artifact_key, artifact_store
+from engine import engine, EngineBusyError
+from excel_export import write_excel
+from exports import ExportFile, ExportNotFoundError, export_store
+from jobs import JobManager, JobNotFoundError
+from logs import configure_logging
+from parquet_export import ParquetUnavailableError, write_parquet
+from metrics import (
+    DOWNLOAD_BYTES_TOTAL, DOWNLOADS_TOTAL, EXPORT_ARTIFACTS_TOTAL, STAGE_SECONDS, STARTUP_SECONDS,
+    CallbackCounter, Gauge, collect_samples, registry
+)
+from records import record_store
+from result_cache import file_sha256, result_cache
+from upload_sessions import (
+    ChecksumMismatchError, OffsetMismatchError, UploadSessionNotFoundError, UploadSessionStore
+)
+from uploads import RequestSizeLimitMiddleware, SpooledPdf, SpoolingRoute, UploadTooLargeError, upload_spool
+from warmup import warm_up
+from zip_export import write_zip, stream_zip
+from extractors import ACCEPTED_DOCUMENT_TYPES, AUTO_DETECT, SUPPORTED_DOCUMENT_TYPES
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="PDF Document Extractor API",
@@ -20,6 +51,24 @@ app = FastAPI(
     version="3.0.0"
 )
 
+# Multipart uploads are streamed straight into the spool, checked against the limits as they arrive
+app.router.route_class = SpoolingRoute
+
+# Reject oversized request bodies before they are spooled (inside CORS, so 413s keep their headers)
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=upload_spool.max_request_bytes)
+
+# Per-client rate limit and fair-share scheduling of the client's files (also inside CORS)
+RATE_LIMIT_PER_MINUTE = int(os.environ.get("RATE_LIMIT_PER_MINUTE", 600))
+app.add_middleware(
+    AdmissionMiddleware,
+    limiter=RateLimiter(
+        RATE_LIMIT_PER_MINUTE, int(os.environ.get("RATE_LIMIT_BURST", 120))
+    ) if RATE_LIMIT_PER_MINUTE > 0 else None,
+    priority_max_bytes=int(os.environ.get("PRIORITY_MAX_BYTES", 4 * 1024 * 1024)),
+    trusted_proxies=parse_trusted_proxies(os.environ.get("TRUSTED_PROXIES")),
+    client_tokens=parse_client_tokens(os.environ.get("CLIENT_TOKENS"))
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,31 +80,6 @@ app.add_middleware(
 )
 
 # ========================= HELPER FUNCTIONS =========================
-def clean_text(text, is_name_or_pob=False):
-    if text is None:
-        return ""
-    text = re.sub(r"Reference No|Payment Receipt No|Jenis Kelamin|Kewarganegaraan|Pekerjaan|Alamat", "", text)
-    if is_name_or_pob:
-        text = re.sub(r"\.", "", text)
-    text = re.sub(r"[^A-Za-z0-9\s,./-]", "", text).strip()
-    return " ".join(text.split())
-
-def format_date(date_str):
-    if not date_str:
-        return ""
-    match = re.search(r"(\d{2})[-/](\d{2})[-/](\d{4})", date_str)
-    if match:
-        day, month, year = match.groups()
-        return f"{day}/{month}/{year}"
-    return date_str
-
-def split_birth_place_date(text):
-    if text:
-        parts = text.split(", ")
-        if len(parts) == 2:
-            return parts[0].strip(), format_date(parts[1])
-    return text, None
-
 def sanitize_filename_part(text):
     if not text:
         return ""
@@ -87,6 +111,36 @@ def generate_new_filename(extracted_data, use_name=True, use_passport=True):
 
     return f"{base_name}.pdf"
 
+def assign_zip_names(entries):
+    """ZIP member names for (digest, wanted name, source) entries.
+
+    Each distinct PDF goes into the archive once: later copies of the same
+    content reuse the first copy's name. Different PDFs that want the same
+    name get " (2)", " (3)", ... appended, compared case-insensitively so the
+    archive also extracts cleanly on Windows. Returns the (name, source)
+    members and the name every entry ended up under, in entry order.
+    """
+    members = []
+    names = []
+    by_digest = {}
+    used = set()
+    for digest, wanted, source in entries:
+        if digest is not None and digest in by_digest:
+            names.append(by_digest[digest])
+            continue
+        stem, extension = os.path.splitext(wanted)
+        name = wanted
+        counter = 2
+        while name.lower() in used:
+            name = f"{stem} ({counter}){extension}"
+            counter += 1
+        used.add(name.lower())
+        if digest is not None:
+            by_digest[digest] = name
+        members.append((name, source))
+        names.append(name)
+    return members, names
+
 def get_greeting():
     hour = datetime.now().hour
     if 5 <= hour < 12:
@@ -96,357 +150,175 @@ def get_greeting():
     else:
         return "Good evening"
 
-# ========================= IMPROVED EXTRACTORS =========================
-
-def extract_sktt(text):
-    nik = re.search(r'NIK/Number of Population Identity\s*:\s*(\d+)', text)
-    name = re.search(r'Nama/Name\s*:\s*([\w\s]+)', text)
-    gender = re.search(r'Jenis Kelamin/Sex\s*:\s*(MALE|FEMALE)', text)
-    birth_place_date = re.search(r'Tempat/Tgl Lahir\s*:\s*([\w\s,0-9-]+)', text)
-    nationality = re.search(r'Kewarganegaraan/Nationality\s*:\s*([\w\s]+)', text)
-    occupation = re.search(r'Pekerjaan/Occupation\s*:\s*([\w\s]+)', text)
-    address = re.search(r'Alamat/Address\s*:\s*([\w\s,./-]+)', text)
-    kitab_kitas = re.search(r'Nomor KITAP/KITAS Number\s*:\s*([\w-]+)', text)
-    expiry_date = re.search(r'Berlaku Hingga s.d/Expired date\s*:\s*([\d-]+)', text)
-
-    # Extract Date Issue - improved pattern
-    lines = text.strip().splitlines()
-    date_issue = None
-    for i, line in enumerate(lines):
-        if "KEPALA DINAS" in line.upper():
-            if i > 0:
-                match = re.search(r'([A-Z\s]+),\s*(\d{2}-\d{2}-\d{4})', lines[i-1])
-                if match:
-                    date_issue = match.group(2)
-            break
-
-    birth_place, birth_date = split_birth_place_date(birth_place_date.group(1)) if birth_place_date else (None, None)
-
-    return {
-        "NIK": nik.group(1) if nik else None,
-        "Name": clean_text(name.group(1), is_name_or_pob=True) if name else None,
-        "Jenis Kelamin": gender.group(1) if gender else None,
-        "Place of Birth": clean_text(birth_place, is_name_or_pob=True) if birth_place else None,
-        "Date of Birth": birth_date,
-        "Nationality": clean_text(nationality.group(1)) if nationality else None,
-        "Occupation": clean_text(occupation.group(1)) if occupation else None,
-        "Address": clean_text(address.group(1)) if address else None,
-        "KITAS/KITAP": clean_text(kitab_kitas.group(1)) if kitab_kitas else None,
-        "Passport Expiry": format_date(expiry_date.group(1)) if expiry_date else None,
-        "Date Issue": format_date(date_issue) if date_issue else None,
-        "Jenis Dokumen": "SKTT"
-    }
-
-def extract_evln(text):
-    data = {
-        "Name": "",
-        "Place of Birth": "",
-        "Date of Birth": "",
-        "Passport No": "",
-        "Passport Expiry": "",
-        "Date Issue": "",
-        "Jenis Dokumen": "EVLN"
-    }
-
-    lines = text.split("\n")
-
-    # Improved name extraction - look for "Dear Mr./Ms." pattern
-    for i, line in enumerate(lines):
-        if re.search(r"Dear\s+(Mr\.|Ms\.|Sir|Madam)?", line, re.IGNORECASE):
-            if i + 1 < len(lines):
-                name_candidate = lines[i + 1].strip()
-                if 3 < len(name_candidate) < 50:
-                    data["Name"] = clean_text(name_candidate, is_name_or_pob=True)
-            break
-
-    # Parse other fields
-    for line in lines:
-        if not data["Name"] and re.search(r"(?i)\bName\b|\bNama\b", line):
-            parts = line.split(":")
-            if len(parts) > 1:
-                data["Name"] = clean_text(parts[1], is_name_or_pob=True)
-
-        elif re.search(r"(?i)\bPlace of Birth\b|\bTempat Lahir\b", line):
-            parts = line.split(":")
-            if len(parts) > 1:
-                pob_text = parts[1].strip()
-                pob_cleaned = re.sub(r'\s*Visa\s*Type\s*.*', '', pob_text)
-                data["Place of Birth"] = clean_text(pob_cleaned, is_name_or_pob=True)
-
-        elif re.search(r"(?i)\bDate of Birth\b|\bTanggal Lahir\b", line):
-            match = re.search(r"(\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4})", line)
-            if match:
-                data["Date of Birth"] = format_date(match.group(1))
-
-        elif re.search(r"(?i)\bPassport No\b", line):
-            match = re.search(r"\b([A-Z0-9]+)\b", line)
-            if match:
-                data["Passport No"] = match.group(1)
-
-        elif re.search(r"(?i)\bPassport Expiry\b", line):
-            match = re.search(r"(\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4})", line)
-            if match:
-                data["Passport Expiry"] = format_date(match.group(1))
-
-    # Extract Date Issue with improved patterns
-    if not data["Date Issue"]:
-        issue_patterns = [
-            r"(?i)(?:Date\s+of\s+Issue|Issue\s+Date|Issued\s+on|Tanggal\s+Penerbitan)\s*:?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})",
-            r"(?i)(?:Issued|Diterbitkan)\s*:?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})"
-        ]
-
-        for pattern in issue_patterns:
-            match = re.search(pattern, text)
-            if match:
-                data["Date Issue"] = format_date(match.group(1))
-                break
-
-    return data
-
-def extract_itas(text):
-    data = {}
-
-    name_match = re.search(r"([A-Z\s]+)\nPERMIT NUMBER", text)
-    data["Name"] = name_match.group(1).strip() if name_match else None
-
-    permit_match = re.search(r"PERMIT NUMBER\s*:\s*([A-Z0-9-]+)", text)
-    data["Permit Number"] = permit_match.group(1) if permit_match else None
-
-    expiry_match = re.search(r"STAY PERMIT EXPIRY\s*:\s*([\d/]+)", text)
-    data["Stay Permit Expiry"] = format_date(expiry_match.group(1)) if expiry_match else None
-
-    place_date_birth_match = re.search(r"Place / Date of Birth\s*.*:\s*([A-Za-z\s]+)\s*/\s*([\d-]+)", text)
-    if place_date_birth_match:
-        place = place_date_birth_match.group(1).strip()
-        date = place_date_birth_match.group(2).strip()
-        data["Place & Date of Birth"] = f"{place}, {format_date(date)}"
-    else:
-        data["Place & Date of Birth"] = None
-
-    passport_match = re.search(r"Passport Number\s*: ([A-Z0-9]+)", text)
-    data["Passport Number"] = passport_match.group(1) if passport_match else None
-
-    passport_expiry_match = re.search(r"Passport Expiry\s*: ([\d-]+)", text)
-    data["Passport Expiry"] = format_date(passport_expiry_match.group(1)) if passport_expiry_match else None
-
-    nationality_match = re.search(r"Nationality\s*: ([A-Z]+)", text)
-    data["Nationality"] = nationality_match.group(1) if nationality_match else None
-
-    gender_match = re.search(r"Gender\s*: ([A-Z]+)", text)
-    data["Gender"] = gender_match.group(1) if gender_match else None
-
-    address_match = re.search(r"Address\s*:\s*(.+)", text)
-    data["Address"] = address_match.group(1).strip() if address_match else None
-
-    occupation_match = re.search(r"Occupation\s*:\s*(.+)", text)
-    data["Occupation"] = occupation_match.group(1).strip() if occupation_match else None
-
-    guarantor_match = re.search(r"Guarantor\s*:\s*(.+)", text)
-    data["Guarantor"] = guarantor_match.group(1).strip() if guarantor_match else None
-
-    # Improved Date Issue extraction with month name conversion
-    date_issue_match = re.search(r"([A-Za-z]+),\s*(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})", text)
-    if date_issue_match:
-        day = date_issue_match.group(2)
-        month = date_issue_match.group(3)
-        year = date_issue_match.group(4)
-
-        month_dict = {
-            'January': '01', 'February': '02', 'March': '03', 'April': '04',
-            'May': '05', 'June': '06', 'July': '07', 'August': '08',
-            'September': '09', 'October': '10', 'November': '11', 'December': '12'
-        }
-        month_num = month_dict.get(month, month)
-        date_str = f"{day.zfill(2)}/{month_num}/{year}"
-        data["Date Issue"] = format_date(date_str)
-    else:
-        fallback_date_match = re.search(r"(\d{1,2})[/-](\d{1,2})[/-](\d{4})", text)
-        if fallback_date_match:
-            data["Date Issue"] = format_date(fallback_date_match.group(0))
-        else:
-            data["Date Issue"] = None
-
-    data["Jenis Dokumen"] = "ITAS"
-    return data
-
-def extract_itk(text):
-    # Similar to ITAS but with ITK document type
-    data = extract_itas(text)  # Reuse ITAS logic
-    data["Jenis Dokumen"] = "ITK"
-    return data
-
-def extract_notifikasi(text):
-    data = {
-        "Nomor Keputusan": "",
-        "Nama TKA": "",
-        "Tempat/Tanggal Lahir": "",
-        "Kewarganegaraan": "",
-        "Alamat Tempat Tinggal": "",
-        "Nomor Paspor": "",
-        "Jabatan": "",
-        "Lokasi Kerja": "",
-        "Berlaku": "",
-        "Date Issue": ""
-    }
-
-    def find(pattern):
-        match = re.search(pattern, text, re.IGNORECASE)
-        return match.group(1).strip() if match else ""
-
-    nomor_keputusan_match = re.search(r"NOMOR\s+([A-Z0-9./-]+)", text, re.IGNORECASE)
-    data["Nomor Keputusan"] = nomor_keputusan_match.group(1).strip() if nomor_keputusan_match else ""
-
-    data["Nama TKA"] = find(r"Nama TKA\s*:\s*(.*)")
-    data["Tempat/Tanggal Lahir"] = find(r"Tempat/Tanggal Lahir\s*:\s*(.*)")
-    data["Kewarganegaraan"] = find(r"Kewarganegaraan\s*:\s*(.*)")
-    data["Alamat Tempat Tinggal"] = find(r"Alamat Tempat Tinggal\s*:\s*(.*)")
-    data["Nomor Paspor"] = find(r"Nomor Paspor\s*:\s*(.*)")
-    data["Jabatan"] = find(r"Jabatan\s*:\s*(.*)")
-    data["Lokasi Kerja"] = find(r"Lokasi Kerja\s*:\s*(.*)")
-
-    # Extract validity period
-    valid_match = re.search(
-        r"Berlaku\s*:?\s*(\d{2}[-/]\d{2}[-/]\d{4})\s*(?:s\.?d\.?|sampai dengan)?\s*(\d{2}[-/]\d{2}[-/]\d{4})",
-        text, re.IGNORECASE)
-    if not valid_match:
-        valid_match = re.search(
-            r"Tanggal Berlaku\s*:?\s*(\d{2}[-/]\d{2}[-/]\d{4})\s*s\.?d\.?\s*(\d{2}[-/]\d{2}[-/]\d{4})",
-            text, re.IGNORECASE)
-    if valid_match:
-        start_date = format_date(valid_match.group(1))
-        end_date = format_date(valid_match.group(2))
-        data["Berlaku"] = f"{start_date} - {end_date}"
-
-    # Extract Date Issue with Indonesian month names
-    date_issue_match = re.search(
-        r"Pada tanggal\s*:\s*(\d{1,2})\s+(Januari|Februari|Maret|April|Mei|Juni|Juli|Agustus|September|Oktober|November|Desember)\s+(\d{4})",
-        text, re.IGNORECASE)
-
-    if date_issue_match:
-        day = date_issue_match.group(1).zfill(2)
-        month_name = date_issue_match.group(2)
-        year = date_issue_match.group(3)
-
-        month_map = {
-            'januari': '01', 'februari': '02', 'maret': '03', 'april': '04',
-            'mei': '05', 'juni': '06', 'juli': '07', 'agustus': '08',
-            'september': '09', 'oktober': '10', 'november': '11', 'desember': '12'
-        }
-        month = month_map.get(month_name.lower(), '01')
-        data["Date Issue"] = f"{day}/{month}/{year}"
-    else:
-        date_issue_match = re.search(
-            r"Pada tanggal\s*:\s*(\d{1,2}[-/]\d{1,2}[-/]\d{4})",
-            text, re.IGNORECASE)
-        if date_issue_match:
-            data["Date Issue"] = format_date(date_issue_match.group(1))
-
-    data["Jenis Dokumen"] = "Notifikasi"
-    return data
+# ========================= API ENDPOINTS =========================
 
-def extract_dkptka(text):
-    """Extract DKPTKA document data"""
-    def safe_extract(pattern, text, group=1, flags=re.IGNORECASE):
+EXTRACTION_WARMUP = (os.environ.get("EXTRACTION_WARMUP") or "1").lower() in ("1", "true", "yes", "on")
+
+@app.on_event("startup")
+async def start_extraction_engine():
+    import_seconds = time.perf_counter() - IMPORT_STARTED
+    STARTUP_SECONDS.set(import_seconds, phase="import")
+    logger.info("starting", extra={"import_seconds": round(import_seconds, 3), "warmup": EXTRACTION_WARMUP})
+    warmup_started = time.perf_counter()
+    if EXTRACTION_WARMUP:
+        # Here first and blocking, so the worker processes inherit the loaded libraries and are
+        # never forked while a thread of this process holds one of their locks
         try:
-            match = re.search(pattern, text, flags)
-            if match:
-                result = match.group(group).strip()
-                result = re.sub(r'\s+', ' ', result)
-                return result if result else None
-            return None
+            collect_samples(warm_up)
         except Exception:
-            return None
-
-    def clean_extracted_text(text):
-        if not text:
-            return None
-        cleaned = re.sub(r'\s+', ' ', text.strip())
-        cleaned = re.sub(r'["\'\n\r\t]+', ' ', cleaned).strip()
-        return cleaned if cleaned else None
-
-    result = {}
+            logger.exception("warm-up failed")
+    engine.start()
+    artifact_store.start()
+    export_store.start()
+    upload_spool.clear()
+    upload_sessions.start()
+    await job_manager.start()
+    app.state.startup_tasks = [asyncio.ensure_future(report_first_extraction())]
+    if EXTRACTION_WARMUP:
+        app.state.startup_tasks.append(asyncio.ensure_future(warm_up_workers(warmup_started)))
+
+async def warm_up_workers(started):
+    """Start the worker processes before the first request needs them"""
+    try:
+        await engine.warm_up(warm_up)
+    except Exception:
+        logger.exception("warm-up failed")
+        return
+    STARTUP_SECONDS.set(time.perf_counter() - IMPORT_STARTED, phase="warmup")
+    logger.info("warm-up finished", extra={
+        "warmup_seconds": round(time.perf_counter() - started, 3),
+        "workers": engine.workers
+    })
+
+async def report_first_extraction():
+    await engine.first_result.wait()
+    seconds = time.perf_counter() - IMPORT_STARTED
+    STARTUP_SECONDS.set(seconds, phase="first_extraction")
+    logger.info("first extraction finished", extra={"seconds_since_import": round(seconds, 3)})
+
+@app.on_event("shutdown")
+async def stop_extraction_engine():
+    for task in app.state.startup_tasks:
+        task.cancel()
+    await asyncio.gather(*app.state.startup_tasks, return_exceptions=True)
+    await job_manager.stop()
+    await upload_sessions.stop()
+    await export_store.stop()
+    await artifact_store.stop()
+    engine.shutdown()
+
+async def extract_spooled(pdf, document_type):
+    """Extract a spooled PDF as document_type, detecting the type first for AUTO_DETECT.
+
+    Returns (document_type, confidence, data); confidence is None for a
+    requested type, and the detected type is None when nothing matched.
+    """
+    if document_type != AUTO_DETECT:
+        data = await engine.extract(pdf.path, document_type, pdf.digest)
+        await record_extraction(pdf.digest, document_type, data, pdf.filename)
+        return document_type, None, data
+    detected = await engine.detect_and_extract(pdf.path, pdf.digest)
+    if detected["document_type"] is not None:
+        await record_extraction(pdf.digest, detected["document_type"], detected["data"], pdf.filename)
+    return detected["document_type"], detected["confidence"], detected["data"]
+
+async def record_extraction(digest, document_type, data, filename):
+    """Keep a searchable copy of a successful extraction; never fails the request"""
+    try:
+        await asyncio.to_thread(record_store.add, digest, document_type, data, filename)
+    except Exception:
+        logger.exception("recording extraction failed", extra={"upload_filename": filename})
+
+async def extract_spooled_unique(spooled, document_type):
+    """extract_spooled for every file of a batch, extracting each distinct content once.
+
+    Copies of a PDF get their own copy of the first one's result. Returns
+    the results in upload order and the list of duplicates found.
+    """
+    first = {}
+    for pdf in spooled:
+        first.setdefault(pdf.digest, pdf)
+    unique = list(first.values())
+    unique_results = await asyncio.gather(*[extract_spooled(pdf, document_type) for pdf in unique])
+    by_digest = {pdf.digest: result for pdf, result in zip(unique, unique_results)}
 
-    # Extract company name
-    company_patterns = [
-        r'Nama\s+Pemberi\s+Kerja\s*:\s*([^\n]+)',
-        r'([A-Z][A-Z\s]*PT\.?[A-Z\s]*)\s*(?=\n.*Alamat)',
+    results = []
+    duplicates = []
+    for pdf in spooled:
+        detected_type, confidence, data = by_digest[pdf.digest]
+        if first[pdf.digest] is not pdf:
+            data = copy.deepcopy(data)
+            duplicates.append({"filename": pdf.filename, "duplicate_of": first[pdf.digest].filename})
+        results.append((detected_type, confidence, data))
+    return results, duplicates
+
+def detection_summary(spooled, results):
+    """Per-file detected types of an AUTO_DETECT batch"""
+    return [
+        {"filename": pdf.filename, "document_type": detected_type, "confidence": confidence}
+        for pdf, (detected_type, confidence, _) in zip(spooled, results)
     ]
 
-    company_name = None
-    for pattern in company_patterns:
-        company_name = safe_extract(pattern, text)
-        if company_name:
-            company_name = clean_extracted_text(company_name)
-            break
+async def extract_upload(file, document_type, batch):
+    """Spool one uploaded file into batch and extract it into an /extract style result entry"""
+    if not file.filename.lower().endswith('.pdf'):
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "error": "File is not a PDF",
+            "data": None
+        }
+
+    try:
+        spooled = await batch.add(file)
 
-    result["Nama Pemberi Kerja"] = company_name
+        # Parsing runs on the extraction engine's worker processes, which open the spooled file
+        detected_type, confidence, extracted_data = await extract_spooled(spooled, document_type)
 
-    # Extract address
-    address_patterns = [
-        r'Alamat\s*:\s*(.*?)(?=\n\s*\d+\.\s*Nomor\s+Telepon|\n\s*3\.|$)',
-        r'Alamat\s*:\s*(.*?)(?=Nomor\s+Telepon|Email|$)',
-    ]
+        if detected_type is None:
+            return {
+                "filename": file.filename,
+                "status": "error",
+                "error": "Could not detect the document type",
+                "data": None,
+                "confidence": confidence
+            }
 
-    address = None
-    for pattern in address_patterns:
-        address_match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-        if address_match:
-            address_text = address_match.group(1)
-            address = re.sub(r'\n\s*', ' ', address_text.strip())
-            address = re.sub(r'\s+', ' ', address)
-            break
-
-    result["Alamat"] = clean_extracted_text(address)
-
-    # Extract other fields
-    result["No Telepon"] = safe_extract(r'Nomor\s+Telepon\s*:\s*([0-9\-\+$$$$\s]+)', text)
-    result["Email"] = safe_extract(r'Email\s*:\s*([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', text)
-    result["Nama TKA"] = clean_extracted_text(safe_extract(r'Nama\s+TKA\s*:\s*([^\n]+)', text))
-    result["Tempat/Tanggal Lahir"] = clean_extracted_text(safe_extract(r'Tempat.*?Lahir\s*:\s*([^\n]+)', text))
-    result["Nomor Paspor"] = safe_extract(r'Nomor\s+Paspor\s*:\s*([A-Z0-9]+)', text)
-    result["Kewarganegaraan"] = clean_extracted_text(safe_extract(r'Kewarganegaraan\s*:\s*([^\n]+)', text))
-    result["Jabatan"] = clean_extracted_text(safe_extract(r'Jabatan\s*:\s*([^\n]+)', text))
-    result["Kanim"] = clean_extracted_text(safe_extract(r'Kanim.*?:\s*([^\n]+)', text))
-    result["Lokasi Kerja"] = clean_extracted_text(safe_extract(r'Lokasi\s+Kerja\s*:\s*([^\n]+)', text))
-
-    # Extract billing code
-    billing_code = None
-    lines = text.splitlines()
-    for i, line in enumerate(lines):
-        if 'Kode Billing Pembayaran' in line:
-            next_lines = lines[i+1:i+4]
-            joined = " ".join(next_lines)
-            match = re.search(r'(\d{12,})', joined)
-            if match:
-                billing_code = match.group(1).strip()
-                break
-
-    result["Kode Billing Pembayaran"] = billing_code
-    result["DKPTKA"] = clean_extracted_text(safe_extract(r'DKPTKA.*?:\s*(US\$[^\n]+)', text))
-    result["Jenis Dokumen"] = "DKPTKA"
-
-    # Filter out None values
-    filtered_result = {}
-    for key, value in result.items():
-        if value and str(value).strip():
-            filtered_result[key] = value
-        else:
-            filtered_result[key] = None
-
-    return filtered_result
+        result = {
+            "filename": file.filename,
+            "status": "success",
+            "data": extracted_data,
+            "document_type": detected_type
+        }
+        if confidence is not None:
+            result["confidence"] = confidence
+        return result
 
-# ========================= API ENDPOINTS =========================
+    except (EngineBusyError, UploadTooLargeError):
+        raise
+    except Exception as e:
+        logger.exception("extraction failed", extra={"upload_filename": file.filename})
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "error": str(e),
+            "data": None
+        }
 
 @app.get("/")
 async def root():
     return {
         "message": f"{get_greeting()}, PDF Document Extractor API is running",
         "timestamp": datetime.now().isoformat(),
-        "supported_documents": ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"],
+        "supported_documents": SUPPORTED_DOCUMENT_TYPES,
         "endpoints": {
             "extract": "/extract - POST multiple PDF files with document type",
-            "extract_batch": "/extract-batch - POST for batch processing with Excel export",
+            "extract_batch": "/extract-batch - POST for batch processing with Excel (and optional Parquet) export",
             "extract_with_rename": "/extract-with-rename - POST with file renaming feature",
+            "extract_stream": "/extract-stream - POST, streams one NDJSON line (or SSE event) per file",
+            "extract_rename_zip": "/extract-rename-zip - POST, responds with the ZIP of renamed PDFs directly",
+            "jobs": "/jobs - POST a large rename batch as a background job, poll /jobs/{id}",
+            "records": "/records/search - GET earlier extractions by passport, nik, kitas or name",
             "docs": "/docs - API documentation"
         }
     }
@@ -464,63 +336,16 @@ async def extract_documents(
         raise HTTPException(status_code=400, detail="No files provided")
 
     if not document_type:
-        document_type = "SKTT"
+        document_type = AUTO_DETECT
 
-    if document_type not in ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"]:
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
         raise HTTPException(status_code=400, detail="Invalid document type")
 
-    results = []
-
-    for file in files:
-        if not file.filename.lower().endswith('.pdf'):
-            results.append({
-                "filename": file.filename,
-                "status": "error",
-                "error": "File is not a PDF",
-                "data": None
-            })
-            continue
-
-        try:
-            await file.seek(0)
-            content = await file.read()
-
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                texts = [page.extract_text() for page in pdf.pages if page.extract_text()]
-                full_text = "\n".join(texts)
-
-            # Use improved extractors
-            if document_type == "SKTT":
-                extracted_data = extract_sktt(full_text)
-            elif document_type == "EVLN":
-                extracted_data = extract_evln(full_text)
-            elif document_type == "ITAS":
-                extracted_data = extract_itas(full_text)
-            elif document_type == "ITK":
-                extracted_data = extract_itk(full_text)
-            elif document_type == "Notifikasi":
-                extracted_data = extract_notifikasi(full_text)
-            elif document_type == "DKPTKA":
-                extracted_data = extract_dkptka(full_text)
-            else:
-                extracted_data = {}
-
-            results.append({
-                "filename": file.filename,
-                "status": "success",
-                "data": extracted_data,
-                "document_type": document_type
-            })
-
-        except Exception as e:
-            error_details = traceback.format_exc()
-            print(f"Error processing {file.filename}: {str(e)}\n{error_details}")
-            results.append({
-                "filename": file.filename,
-                "status": "error",
-                "error": str(e),
-                "data": None
-            })
+    try:
+        async with upload_spool.batch() as batch:
+            results = await asyncio.gather(*[extract_upload(file, document_type, batch) for file in files])
+    except EngineBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
     response_data = {
         "success": True,
@@ -541,300 +366,836 @@ async def extract_documents(
         }
     )
 
+@app.post("/extract-stream")
+async def extract_stream(
+    files: List[UploadFile] = File(...),
+    document_type: Optional[str] = Form(None),
+    stream_format: str = Form("ndjson")
+):
+    """Stream one result per file in completion order, followed by a summary.
+
+    stream_format is "ndjson" (one JSON object per line) or "sse"
+    (Server-Sent Events). Files are spooled to disk only when a slot frees
+    up and never held in memory, so large batches keep server memory flat.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if not document_type:
+        document_type = AUTO_DETECT
+
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+
+    if stream_format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="stream_format must be 'ndjson' or 'sse'")
+
+    def encode(event, payload):
+        if stream_format == "sse":
+            return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({"event": event, **payload}) + "\n"
+
+    batch = upload_spool.batch()
+
+    async def event_stream():
+        slots = asyncio.Semaphore(engine.max_in_flight)
+
+        async def run(index, file):
+            async with slots:
+                try:
+                    result = await extract_upload(file, document_type, batch)
+                except (EngineBusyError, UploadTooLargeError) as e:
+                    result = {"filename": file.filename, "status": "error", "error": str(e), "data": None}
+            return index, result
+
+        tasks = [asyncio.ensure_future(run(index, file)) for index, file in enumerate(files)]
+        processed = failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, result = await next_done
+                if result["status"] == "success":
+                    processed += 1
+                else:
+                    failed += 1
+                yield encode("result", {"index": index, **result})
+
+            yield encode("summary", {
+                "success": True,
+                "timestamp": datetime.now().isoformat(),
+                "document_type": document_type,
+                "total_files": len(files),
+                "processed_files": processed,
+                "failed_files": failed
+            })
+        finally:
+            # Client went away: stop the remaining extractions
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(batch.close)
+
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/extract-batch")
 async def extract_batch_excel(
     files: List[UploadFile] = File(...),
-    document_type: str = Form(...)
+    document_type: str = Form(AUTO_DETECT),
+    include_parquet: bool = Form(False)
 ):
-    """Extract data from multiple PDFs and export to Excel format"""
+    """Extract data from multiple PDFs and export to Excel format (and optionally typed Parquet)"""
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    if document_type not in ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"]:
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
         raise HTTPException(status_code=400, detail="Invalid document type")
 
     all_data = []
-    temp_dir = tempfile.mkdtemp()
+    temp_dir = artifact_store.new_dir()
+    batch = upload_spool.batch()
 
     try:
-        for file in files:
-            if not file.filename.lower().endswith('.pdf'):
-                continue
-
-            content = await file.read()
-
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                texts = [page.extract_text() for page in pdf.pages if page.extract_text()]
-                full_text = "\n".join(texts)
-
-            # Extract data based on document type
-            if document_type == "SKTT":
-                extracted_data = extract_sktt(full_text)
-            elif document_type == "EVLN":
-                extracted_data = extract_evln(full_text)
-            elif document_type == "ITAS":
-                extracted_data = extract_itas(full_text)
-            elif document_type == "ITK":
-                extracted_data = extract_itk(full_text)
-            elif document_type == "Notifikasi":
-                extracted_data = extract_notifikasi(full_text)
-            elif document_type == "DKPTKA":
-                extracted_data = extract_dkptka(full_text)
-            else:
-                extracted_data = {}
+        pdf_files = [file for file in files if file.filename.lower().endswith('.pdf')]
+        spooled = await batch.add_all(pdf_files)
+
+        # Extract data based on document type, in parallel on the engine, once per distinct file
+        results, duplicates = await extract_spooled_unique(spooled, document_type)
+        extracted = [data for _, _, data in results]
 
+        for file, extracted_data in zip(pdf_files, extracted):
             # Add source filename to the data
             extracted_data["Source_File"] = file.filename
             all_data.append(extracted_data)
 
-        # Create Excel file
-        df = pd.DataFrame(all_data)
-        
         # Generate filename with timestamp
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         excel_filename = f"Hasil_Ekstraksi_{document_type}_{timestamp}.xlsx"
         excel_path = os.path.join(temp_dir, excel_filename)
-        
-        # Save to Excel with formatting
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name=f'Data_{document_type}', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets[f'Data_{document_type}']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        # Store file in global temp storage
-        temp_files_storage[excel_filename] = excel_path
 
-        return {
+        # Create Excel file (streaming writer, widths computed from the data)
+        await asyncio.to_thread(write_excel, excel_path, all_data, f'Data_{document_type}')
+
+        # Register the file in the expiring artifact store, keyed by its batch directory
+        excel_key = artifact_key(temp_dir, excel_filename)
+        artifact_store.add(excel_key, excel_path)
+
+        # Columnar copy with typed (date) columns, written in row groups
+        parquet_filename = None
+        if include_parquet:
+            parquet_filename = f"Hasil_Ekstraksi_{document_type}_{timestamp}.parquet"
+            parquet_path = os.path.join(temp_dir, parquet_filename)
+            await asyncio.to_thread(write_parquet, parquet_path, all_data, document_type)
+            artifact_store.add(artifact_key(temp_dir, parquet_filename), parquet_path)
+
+        response_data = {
             "success": True,
             "timestamp": datetime.now().isoformat(),
             "document_type": document_type,
             "total_files": len(files),
             "processed_files": len(all_data),
             "extraction_data": all_data,
-            "download_link": f"/download-excel/{excel_filename}",
+            "download_link": f"/download-excel/{excel_key}",
             "excel_filename": excel_filename,
-            "total_records": len(all_data)
+            "total_records": len(all_data),
+            "duplicates": duplicates
         }
+        if parquet_filename:
+            response_data["parquet_download_link"] = f"/download-parquet/{artifact_key(temp_dir, parquet_filename)}"
+            response_data["parquet_filename"] = parquet_filename
+        if document_type == AUTO_DETECT:
+            response_data["detected_types"] = detection_summary(spooled, results)
+        return response_data
 
+    except EngineBusyError as e:
+        artifact_store.discard_dir(temp_dir)
+        raise HTTPException(status_code=503, detail=str(e))
+    except ParquetUnavailableError as e:
+        artifact_store.discard_dir(temp_dir)
+        raise HTTPException(status_code=501, detail=str(e))
+    except UploadTooLargeError:
+        artifact_store.discard_dir(temp_dir)
+        raise
     except Exception as e:
-        print(f"Error in extract_batch_excel: {str(e)}")
+        artifact_store.discard_dir(temp_dir)
+        logger.exception("extract-batch failed")
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+    finally:
+        await asyncio.to_thread(batch.close)
+
+def build_rename_outputs(entries, document_type, use_name_for_rename, use_passport_for_rename,
+                         total_files, temp_dir, verify_zip=False, batch=None):
+    """Write the Excel summary and ZIP of renamed PDFs for extracted files.
+
+    entries is a list of (original filename, PDF bytes or path, extracted
+    data, sha256 of the PDF or None to hash it here). The outputs are
+    registered under keys of ``batch``, by default temp_dir's name.
+    Returns the /extract-with-rename response payload.
+    """
+    all_data = []
+    wanted = []
+
+    for filename, source, extracted_data, digest in entries:
+        # Add source filename to the data
+        extracted_data["Source_File"] = filename
+        all_data.append(extracted_data)
+
+        if digest is None:
+            digest = file_sha256(source) if isinstance(source, str) else hashlib.sha256(source).hexdigest()
+
+        # Generate new filename
+        new_filename = generate_new_filename(
+            extracted_data, 
+            use_name_for_rename, 
+            use_passport_for_rename
+        )
+        wanted.append((digest, new_filename, source))
+
+    # Each distinct PDF once, clashing names numbered instead of overwritten
+    zip_members, new_names = assign_zip_names(wanted)
+    renamed_files = {filename: new_name for (filename, _, _, _), new_name in zip(entries, new_names)}
+
+    # Create Excel file (streaming writer, widths computed from the data)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    excel_filename = f"Hasil_Ekstraksi_{document_type}_{timestamp}.xlsx"
+    excel_path = os.path.join(temp_dir, excel_filename)
+    write_excel(excel_path, all_data, f'Data_{document_type}')
+
+    # Create ZIP file with renamed PDFs
+    zip_filename = f"Renamed_Files_{document_type}_{timestamp}.zip"
+    zip_path = os.path.join(temp_dir, zip_filename)
+
+    # PDFs are copied straight into a STORED archive, no temp copies
+    try:
+        zip_file_size = write_zip(zip_path, zip_members, verify=verify_zip)
+    except Exception as zip_error:
+        logger.exception("zip build failed", extra={"zip_path": zip_path})
+        raise Exception(f"Failed to create ZIP file: {str(zip_error)}")
+
+    if zip_file_size == 0:
+        raise Exception("ZIP file is empty")
+
+    # Register files in the expiring artifact store
+    zip_key = artifact_key(batch or temp_dir, zip_filename)
+    excel_key = artifact_key(batch or temp_dir, excel_filename)
+    artifact_store.add(zip_key, zip_path)
+    artifact_store.add(excel_key, excel_path)
+
+    logger.info("rename outputs built", extra={
+        "zip_filename": zip_filename,
+        "zip_bytes": zip_file_size,
+        "zip_members": len(zip_members),
+        "excel_filename": excel_filename,
+        "records": len(all_data)
+    })
+
+    # Create response data
+    response_data = {
+        "success": True,
+        "timestamp": datetime.now().isoformat(),
+        "document_type": document_type,
+        "total_files": total_files,
+        "processed_files": len(all_data),
+        "extraction_data": all_data,
+        "renamed_files": renamed_files,
+        "download_links": {
+            "excel": f"/download-excel/{excel_key}",
+            "zip": f"/download-zip/{zip_key}"
+        },
+        "file_info": {
+            "zip_filename": zip_filename,
+            "zip_size": zip_file_size,
+            "excel_filename": excel_filename,
+            "total_renamed_files": len(zip_members),
+            "total_records": len(all_data)
+        }
+    }
+
+    return response_data
 
 @app.post("/extract-with-rename")
 async def extract_with_rename(
     files: List[UploadFile] = File(...),
-    document_type: str = Form(...),
+    document_type: str = Form(AUTO_DETECT),
+    use_name_for_rename: bool = Form(True),
+    use_passport_for_rename: bool = Form(True),
+    verify_zip: bool = Form(False)
+):
+    """Extract data and provide renamed files with ZIP download
+
+    verify_zip re-reads the finished archive and checks every CRC; it is off
+    by default because the archive is written straight from memory.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+
+    temp_dir = artifact_store.new_dir()
+    batch = upload_spool.batch()
+
+    try:
+        pdf_files = [file for file in files if file.filename.lower().endswith('.pdf')]
+        spooled = await batch.add_all(pdf_files)
+
+        # Extract data, in parallel on the engine, once per distinct file
+        results, duplicates = await extract_spooled_unique(spooled, document_type)
+
+        entries = [(pdf.filename, pdf.path, data, pdf.digest) for pdf, (_, _, data) in zip(spooled, results)]
+
+        # Excel and ZIP building is blocking file I/O, keep it off the event loop
+        response_data = await asyncio.to_thread(
+            build_rename_outputs,
+            entries,
+            document_type,
+            use_name_for_rename,
+            use_passport_for_rename,
+            len(files),
+            temp_dir,
+            verify_zip
+        )
+        response_data["duplicates"] = duplicates
+        if document_type == AUTO_DETECT:
+            response_data["detected_types"] = detection_summary(spooled, results)
+        return response_data
+
+    except EngineBusyError as e:
+        artifact_store.discard_dir(temp_dir)
+        raise HTTPException(status_code=503, detail=str(e))
+    except UploadTooLargeError:
+        artifact_store.discard_dir(temp_dir)
+        raise
+    except Exception as e:
+        artifact_store.discard_dir(temp_dir)
+        logger.exception("extract-with-rename failed")
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+    finally:
+        await asyncio.to_thread(batch.close)
+
+@app.post("/extract-rename-zip")
+async def extract_rename_zip(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(AUTO_DETECT),
     use_name_for_rename: bool = Form(True),
     use_passport_for_rename: bool = Form(True)
 ):
-    """Extract data and provide renamed files with ZIP download"""
+    """Extract data and stream the ZIP of renamed PDFs as the response itself
+
+    Nothing is written to disk; use /extract-with-rename when the extracted
+    data and an Excel summary are needed as well.
+    """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
 
-    if document_type not in ["SKTT", "EVLN", "ITAS", "ITK", "Notifikasi", "DKPTKA"]:
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
         raise HTTPException(status_code=400, detail="Invalid document type")
 
-    all_data = []
-    renamed_files = {}
-    temp_dir = tempfile.mkdtemp()
+    pdf_files = [file for file in files if file.filename.lower().endswith('.pdf')]
+    batch = upload_spool.batch()
 
     try:
-        for file in files:
-            if not file.filename.lower().endswith('.pdf'):
-                continue
-
-            content = await file.read()
-
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                texts = [page.extract_text() for page in pdf.pages if page.extract_text()]
-                full_text = "\n".join(texts)
-
-            # Extract data
-            if document_type == "SKTT":
-                extracted_data = extract_sktt(full_text)
-            elif document_type == "EVLN":
-                extracted_data = extract_evln(full_text)
-            elif document_type == "ITAS":
-                extracted_data = extract_itas(full_text)
-            elif document_type == "ITK":
-                extracted_data = extract_itk(full_text)
-            elif document_type == "Notifikasi":
-                extracted_data = extract_notifikasi(full_text)
-            elif document_type == "DKPTKA":
-                extracted_data = extract_dkptka(full_text)
-            else:
-                extracted_data = {}
+        spooled = await batch.add_all(pdf_files)
+        results, _ = await extract_spooled_unique(spooled, document_type)
+    except EngineBusyError as e:
+        await asyncio.to_thread(batch.close)
+        raise HTTPException(status_code=503, detail=str(e))
+    except UploadTooLargeError:
+        await asyncio.to_thread(batch.close)
+        raise
+    except Exception as e:
+        await asyncio.to_thread(batch.close)
+        logger.exception("extract-rename-zip failed")
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
 
-            # Add source filename to the data
-            extracted_data["Source_File"] = file.filename
-            all_data.append(extracted_data)
+    zip_members, _ = assign_zip_names([
+        (pdf.digest, generate_new_filename(extracted_data, use_name_for_rename, use_passport_for_rename), pdf.path)
+        for pdf, (_, _, extracted_data) in zip(spooled, results)
+    ])
 
-            # Generate new filename
-            new_filename = generate_new_filename(
-                extracted_data, 
-                use_name_for_rename, 
-                use_passport_for_rename
-            )
-
-            # Save renamed file
-            temp_file_path = os.path.join(temp_dir, new_filename)
-            with open(temp_file_path, 'wb') as f:
-                f.write(content)
-
-            renamed_files[file.filename] = {
-                'new_name': new_filename, 
-                'path': temp_file_path
-            }
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    zip_filename = f"Renamed_Files_{document_type}_{timestamp}.zip"
 
-        # Create Excel file with enhanced formatting
-        df = pd.DataFrame(all_data)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        excel_filename = f"Hasil_Ekstraksi_{document_type}_{timestamp}.xlsx"
-        excel_path = os.path.join(temp_dir, excel_filename)
-        
-        # Save to Excel with formatting
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name=f'Data_{document_type}', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets[f'Data_{document_type}']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        # Create ZIP file with renamed PDFs
-        zip_filename = f"Renamed_Files_{document_type}_{timestamp}.zip"
-        zip_path = os.path.join(temp_dir, zip_filename)
-
-        print(f"=== CREATING ZIP FILE ===")
-        print(f"ZIP filename: {zip_filename}")
-        print(f"ZIP path: {zip_path}")
-        print(f"Temp directory: {temp_dir}")
-        print(f"Files to add to ZIP: {len(renamed_files)}")
-
-        # Ensure temp directory exists
-        os.makedirs(temp_dir, exist_ok=True)
-
-        # Create ZIP file with proper error handling
-        try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=6) as zipf:
-                files_added = 0
-                for original_name, file_info in renamed_files.items():
-                    file_path = file_info['path']
-                    new_name = file_info['new_name']
-                    
-                    if os.path.exists(file_path):
-                        file_size = os.path.getsize(file_path)
-                        print(f"Adding: {new_name} (size: {file_size} bytes)")
-                        zipf.write(file_path, arcname=new_name)
-                        files_added += 1
-                    else:
-                        print(f"ERROR: File not found: {file_path}")
-                
-                print(f"Successfully added {files_added} files to ZIP")
-                
-        except Exception as zip_error:
-            print(f"Error creating ZIP file: {str(zip_error)}")
-            raise Exception(f"Failed to create ZIP file: {str(zip_error)}")
-
-        # Verify ZIP file was created and is valid
-        if not os.path.exists(zip_path):
-            raise Exception(f"ZIP file was not created: {zip_path}")
-
-        zip_file_size = os.path.getsize(zip_path)
-        if zip_file_size == 0:
-            raise Exception("ZIP file is empty")
-
-        print(f"ZIP file created successfully!")
-        print(f"ZIP file size: {zip_file_size} bytes")
-
-        # Verify ZIP contents
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zipf:
-                zip_contents = zipf.namelist()
-                print(f"ZIP contents ({len(zip_contents)} files): {zip_contents}")
-                
-                # Test ZIP integrity
-                bad_file = zipf.testzip()
-                if bad_file:
-                    raise Exception(f"ZIP file is corrupted: {bad_file}")
-                    
-        except Exception as verify_error:
-            print(f"ZIP verification failed: {str(verify_error)}")
-            raise Exception(f"ZIP file is corrupted: {str(verify_error)}")
-
-        # Store files in global temp storage
-        temp_files_storage[zip_filename] = zip_path
-        temp_files_storage[excel_filename] = excel_path
-
-        print(f"=== FILES STORED IN TEMP STORAGE ===")
-        print(f"ZIP: {zip_filename} -> {zip_path}")
-        print(f"Excel: {excel_filename} -> {excel_path}")
-        print(f"Total files in storage: {len(temp_files_storage)}")
-        
-        # Verify files are accessible
-        for filename, filepath in temp_files_storage.items():
-            exists = os.path.exists(filepath)
-            size = os.path.getsize(filepath) if exists else 0
-            print(f"  {filename}: exists={exists}, size={size} bytes")
-
-        # Create response data
-        response_data = {
-            "success": True,
-            "timestamp": datetime.now().isoformat(),
-            "document_type": document_type,
-            "total_files": len(files),
-            "processed_files": len(all_data),
-            "extraction_data": all_data,
-            "renamed_files": {k: v['new_name'] for k, v in renamed_files.items()},
-            "download_links": {
-                "excel": f"/download-excel/{excel_filename}",
-                "zip": f"/download-zip/{zip_filename}"
-            },
-            "file_info": {
-                "zip_filename": zip_filename,
-                "zip_size": zip_file_size,
-                "excel_filename": excel_filename,
-                "total_renamed_files": len(renamed_files),
-                "total_records": len(all_data)
-            }
-        }
+    return StreamingResponse(
+        stream_zip(zip_members),
+        media_type='application/zip',
+        headers={
+            "Content-Disposition": f"attachment; filename=\"{zip_filename}\"",
+            "Access-Control-Allow-Origin": "*",
+            "Cache-Control": "no-cache, no-store, must-revalidate"
+        },
+        # The spooled uploads are needed until the last ZIP chunk is sent
+        background=BackgroundTask(batch.close)
+    )
 
-        print(f"Response data: {response_data}")
-        return response_data
+# ========================= EXPORT SESSIONS =========================
+
+def keep_distinct_pdfs(spooled, directory):
+    """Move one copy of each distinct spooled PDF into directory; digest -> its path there"""
+    kept = {}
+    for pdf in spooled:
+        if pdf.digest not in kept:
+            kept[pdf.digest] = os.path.join(directory, f"{len(kept):05d}.pdf")
+            shutil.move(pdf.path, kept[pdf.digest])
+    return kept
+
+def rename_suffix(use_name_for_rename, use_passport_for_rename):
+    parts = [part for part, used in (("name", use_name_for_rename), ("passport", use_passport_for_rename)) if used]
+    return "_".join(parts) or "plain"
+
+def export_response(session, use_name_for_rename, use_passport_for_rename):
+    """/extract-export payload of a session, with the ZIP names for the given rename flags"""
+    rows = session.rows()
+    _, new_names = assign_zip_names([
+        (file.digest, generate_new_filename(file.data, use_name_for_rename, use_passport_for_rename), file.path)
+        for file in session.files
+    ])
+    flags = f"use_name_for_rename={str(use_name_for_rename).lower()}" \
+            f"&use_passport_for_rename={str(use_passport_for_rename).lower()}"
+    response_data = {
+        "success": True,
+        "export_id": session.id,
+        "timestamp": datetime.now().isoformat(),
+        "document_type": session.document_type,
+        "processed_files": len(rows),
+        "extraction_data": rows,
+        "renamed_files": {file.filename: new_name for file, new_name in zip(session.files, new_names)},
+        "duplicates": session.duplicates,
+        "download_links": {
+            "excel": f"/exports/{session.id}/excel",
+            "parquet": f"/exports/{session.id}/parquet",
+            "zip": f"/exports/{session.id}/zip?{flags}"
+        },
+        "total_records": len(rows)
+    }
+    if session.document_type == AUTO_DETECT:
+        response_data["detected_types"] = [
+            {"filename": file.filename, "document_type": file.document_type, "confidence": file.confidence}
+            for file in session.files
+        ]
+    return response_data
+
+@app.post("/extract-export")
+async def extract_export(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(AUTO_DETECT),
+    use_name_for_rename: bool = Form(True),
+    use_passport_for_rename: bool = Form(True)
+):
+    """Extract a batch once and keep it for Excel, Parquet and ZIP downloads built on first use
+
+    The response has the extracted data like /extract-batch and an export_id;
+    GET /exports/{export_id} returns it again, with the renamed files for
+    other rename flags, without parsing anything again.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+
+    session_dir = artifact_store.new_dir()
+    batch = upload_spool.batch()
 
+    try:
+        pdf_files = [file for file in files if file.filename.lower().endswith('.pdf')]
+        spooled = await batch.add_all(pdf_files)
+
+        # Extract data, in parallel on the engine, once per distinct file
+        results, duplicates = await extract_spooled_unique(spooled, document_type)
+
+        # The PDFs stay with the session for the renamed-files ZIP
+        kept = await asyncio.to_thread(keep_distinct_pdfs, spooled, session_dir)
+        session = export_store.create(session_dir, document_type, [
+            ExportFile(pdf.filename, kept[pdf.digest], pdf.digest, detected_type, confidence, data)
+            for pdf, (detected_type, confidence, data) in zip(spooled, results)
+        ], duplicates)
+
+    except EngineBusyError as e:
+        artifact_store.discard_dir(session_dir)
+        raise HTTPException(status_code=503, detail=str(e))
+    except UploadTooLargeError:
+        artifact_store.discard_dir(session_dir)
+        raise
     except Exception as e:
-        print(f"Error in extract_with_rename: {str(e)}")
+        artifact_store.discard_dir(session_dir)
+        logger.exception("extract-export failed")
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
     finally:
-        # Cleanup will be handled by the download endpoints
-        pass
+        await asyncio.to_thread(batch.close)
+
+    response_data = export_response(session, use_name_for_rename, use_passport_for_rename)
+    response_data["total_files"] = len(files)
+    return response_data
+
+def get_export_session(export_id):
+    try:
+        return export_store.get(export_id)
+    except ExportNotFoundError:
+        raise HTTPException(status_code=404, detail="Export not found or expired")
+
+@app.get("/exports/{export_id}")
+async def get_export(export_id: str, use_name_for_rename: bool = True, use_passport_for_rename: bool = True):
+    """Stored results of an /extract-export batch, with the ZIP names for the given rename flags"""
+    return export_response(get_export_session(export_id), use_name_for_rename, use_passport_for_rename)
+
+async def export_artifact(session, kind, filename, build):
+    """Artifact store key of a session's artifact, built by ``build(path)`` if not built yet (or expired)"""
+    async with session.lock(kind):
+        key = session.artifacts.get(kind)
+        if key is not None and artifact_store.get(key) is not None:
+            EXPORT_ARTIFACTS_TOTAL.inc(kind=kind.split(":")[0], outcome="reused")
+            return key
+        path = os.path.join(session.directory, filename)
+        await asyncio.to_thread(build, path)
+        key = artifact_key(session.directory, filename)
+        artifact_store.add(key, path)
+        session.artifacts[kind] = key
+        EXPORT_ARTIFACTS_TOTAL.inc(kind=kind.split(":")[0], outcome="built")
+        return key
+
+def export_basename(session):
+    timestamp = datetime.fromtimestamp(session.created_at).strftime('%Y%m%d_%H%M%S')
+    return f"{session.document_type}_{timestamp}_{session.id[:8]}"
+
+@app.get("/exports/{export_id}/excel")
+async def download_export_excel(export_id: str):
+    """Excel summary of an /extract-export batch, written on the first download"""
+    session = get_export_session(export_id)
+    name = await export_artifact(
+        session, "excel", f"Hasil_Ekstraksi_{export_basename(session)}.xlsx",
+        lambda path: write_excel(path, session.rows(), f'Data_{session.document_type}')
+    )
+    return await download_excel(name)
+
+@app.get("/exports/{export_id}/parquet")
+async def download_export_parquet(export_id: str):
+    """Typed Parquet copy of an /extract-export batch, written on the first download"""
+    session = get_export_session(export_id)
+    try:
+        name = await export_artifact(
+            session, "parquet", f"Hasil_Ekstraksi_{export_basename(session)}.parquet",
+            lambda path: write_parquet(path, session.rows(), session.document_type)
+        )
+    except ParquetUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return await download_parquet(name)
+
+@app.get("/exports/{export_id}/zip")
+async def download_export_zip(export_id: str, use_name_for_rename: bool = True, use_passport_for_rename: bool = True):
+    """Renamed PDFs of an /extract-export batch, one ZIP per rename flag combination, written on first download"""
+    session = get_export_session(export_id)
+    suffix = rename_suffix(use_name_for_rename, use_passport_for_rename)
+
+    def build(path):
+        zip_members, _ = assign_zip_names([
+            (file.digest, generate_new_filename(file.data, use_name_for_rename, use_passport_for_rename), file.path)
+            for file in session.files
+        ])
+        write_zip(path, zip_members)
+
+    name = await export_artifact(
+        session, f"zip:{suffix}", f"Renamed_Files_{export_basename(session)}_{suffix}.zip", build
+    )
+    return await download_zip(name)
+
+# ========================= RESUMABLE UPLOADS =========================
+
+def start_upload_extraction(session, file):
+    """Extract an upload session's file as soon as its last byte is in"""
+    pdf = SpooledPdf(file.filename, file.path, file.size, file.digest)
+    file.extraction = asyncio.ensure_future(extract_spooled(pdf, session.document_type))
+    # Failures are reported by finalize; don't log them as never retrieved
+    file.extraction.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+upload_sessions = UploadSessionStore(
+    root_dir=os.environ.get("UPLOAD_SESSIONS_DIR") or os.path.join(
+        tempfile.gettempdir(), "pdf_extractor_upload_sessions"
+    ),
+    on_file_complete=start_upload_extraction,
+    ttl_seconds=int(os.environ.get("UPLOAD_SESSION_TTL_SECONDS", 86400)),
+    max_file_bytes=upload_spool.max_file_bytes
+)
+
+class UploadFileInfo(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
+
+class UploadSessionRequest(BaseModel):
+    files: List[UploadFileInfo]
+    document_type: str = AUTO_DETECT
+
+def get_upload_session(upload_id):
+    try:
+        return upload_sessions.get(upload_id)
+    except UploadSessionNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+
+@app.post("/uploads", status_code=201)
+async def create_upload_session(request: UploadSessionRequest):
+    """Start a resumable upload of a batch; the files are then sent with PUT /uploads/{id}/files/{index}"""
+    if not request.files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if request.document_type not in ACCEPTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+
+    not_pdf = [file.filename for file in request.files if not file.filename.lower().endswith('.pdf')]
+    if not_pdf:
+        raise HTTPException(status_code=400, detail=f"Files are not PDFs: {', '.join(not_pdf)}")
+
+    try:
+        session = await asyncio.to_thread(
+            upload_sessions.create,
+            request.document_type,
+            [(file.filename, file.size, file.sha256) for file in request.files]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.status()
+
+@app.get("/uploads/{upload_id}")
+async def get_upload_session_status(upload_id: str):
+    """Offsets of every file of an upload session, to resume after a dropped connection"""
+    return get_upload_session(upload_id).status()
+
+@app.put("/uploads/{upload_id}/files/{index}")
+async def upload_chunk(upload_id: str, index: int, offset: int, request: Request):
+    """Write the request body into file ``index`` at ``offset`` (where that file currently ends)
+
+    A 409 carries the offset to continue from. Extraction of the file starts
+    as soon as its last chunk is in.
+    """
+    session = get_upload_session(upload_id)
+    try:
+        file = await upload_sessions.write_chunk(session, index, offset, request.stream())
+    except OffsetMismatchError as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.expected})
+    except ChecksumMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"index": file.index, "filename": file.filename, "offset": file.offset, "complete": file.complete}
+
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str, use_name_for_rename: bool = True, use_passport_for_rename: bool = True):
+    """Wait for the upload session's extractions and turn it into an /extract-export session
+
+    Responds like /extract-export, plus the files whose extraction failed.
+    """
+    session = get_upload_session(upload_id)
+    incomplete = [file.filename for file in session.files if not file.complete]
+    if incomplete:
+        raise HTTPException(status_code=409, detail=f"Files are not completely uploaded: {', '.join(incomplete)}")
+    if session.finalizing:
+        raise HTTPException(status_code=409, detail="Upload session is already being finalized")
+
+    session.finalizing = True
+    try:
+        await asyncio.gather(*[file.extraction for file in session.files], return_exceptions=True)
+        # Files turned away by a full queue while uploading get another try now
+        for file in session.files:
+            if not file.extraction.cancelled() and isinstance(file.extraction.exception(), EngineBusyError):
+                start_upload_extraction(session, file)
+        await asyncio.gather(*[file.extraction for file in session.files], return_exceptions=True)
+
+        extracted = []
+        failed_files = []
+        for file in session.files:
+            error = file.extraction.exception() if not file.extraction.cancelled() else None
+            if isinstance(error, EngineBusyError):
+                raise HTTPException(status_code=503, detail=str(error))
+            if file.extraction.cancelled() or error is not None:
+                failed_files.append({"filename": file.filename, "error": str(error) if error else "cancelled"})
+            else:
+                extracted.append((file, file.extraction.result()))
+
+        first = {}
+        duplicates = []
+        for file, _ in extracted:
+            if file.digest in first:
+                duplicates.append({"filename": file.filename, "duplicate_of": first[file.digest]})
+            else:
+                first[file.digest] = file.filename
+
+        session_dir = artifact_store.new_dir()
+        try:
+            kept = await asyncio.to_thread(keep_distinct_pdfs, [file for file, _ in extracted], session_dir)
+        except Exception:
+            artifact_store.discard_dir(session_dir)
+            raise
+        export = export_store.create(session_dir, session.document_type, [
+            ExportFile(file.filename, kept[file.digest], file.digest, detected_type, confidence, data)
+            for file, (detected_type, confidence, data) in extracted
+        ], duplicates)
+    except Exception:
+        session.finalizing = False
+        raise
+
+    await asyncio.to_thread(upload_sessions.remove, session)
+    response_data = export_response(export, use_name_for_rename, use_passport_for_rename)
+    response_data["total_files"] = len(session.files)
+    response_data["failed_files"] = failed_files
+    return response_data
+
+@app.delete("/uploads/{upload_id}")
+async def delete_upload_session(upload_id: str):
+    """Abandon an upload session and remove what was uploaded"""
+    session = get_upload_session(upload_id)
+    for file in session.files:
+        if file.extraction is not None:
+            file.extraction.cancel()
+    await asyncio.to_thread(upload_sessions.remove, session)
+    return {"success": True, "upload_id": upload_id}
+
+# ========================= BACKGROUND JOBS =========================
+
+async def process_job_file(path, document_type, filename):
+    digest = await asyncio.to_thread(file_sha256, path)
+    if document_type == AUTO_DETECT:
+        detected = await engine.detect_and_extract(path, digest)
+        document_type, data = detected["document_type"], detected["data"]
+    else:
+        data = await engine.extract(path, document_type, digest)
+    if document_type is not None:
+        await record_extraction(digest, document_type, data, filename)
+    return data
+
+def finalize_rename_job(job, entries):
+    """Build the Excel and ZIP outputs of a finished /jobs batch"""
+    options = json.loads(job["options"])
+    output_dir = os.path.join(job_manager.job_dir(job["id"]), "output")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Job files are hashed while the ZIP is built
+    result = build_rename_outputs(
+        [(filename, path, data, None) for filename, path, data in entries],
+        job["document_type"],
+        options["use_name_for_rename"],
+        options["use_passport_for_rename"],
+        job["total_files"],
+        output_dir,
+        batch=job["id"]
+    )
+    result["output_dir"] = output_dir
+    return result
+
+job_manager = JobManager(
+    root_dir=os.environ.get("JOBS_DIR") or os.path.join(tempfile.gettempdir(), "pdf_extractor_jobs"),
+    process_file=process_job_file,
+    finalize=finalize_rename_job,
+    concurrency=int(os.environ.get("JOB_CONCURRENCY", "1")),
+    # A job keeps at most the engine's in-flight files queued, so it neither
+    # fills the queue for /extract nor loses files to EngineBusyError
+    file_concurrency=engine.max_in_flight,
+    retry_exceptions=(EngineBusyError,),
+    # Finished jobs are kept as long as their download artifacts
+    ttl_seconds=artifact_store.ttl_seconds,
+    sweep_interval=artifact_store.sweep_interval
+)
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    files: List[UploadFile] = File(...),
+    document_type: str = Form(AUTO_DETECT),
+    use_name_for_rename: bool = Form(True),
+    use_passport_for_rename: bool = Form(True)
+):
+    """Queue an /extract-with-rename style batch and return its job id right away"""
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if document_type not in ACCEPTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+
+    pdf_files = [file for file in files if file.filename.lower().endswith('.pdf')]
+    if not pdf_files:
+        raise HTTPException(status_code=400, detail="No PDF files provided")
+
+    options = {
+        "use_name_for_rename": use_name_for_rename,
+        "use_passport_for_rename": use_passport_for_rename
+    }
+    async with upload_spool.batch() as batch:
+        spooled = await batch.add_all(pdf_files)
+        # The spooled files are moved into the job directory
+        job_id = await asyncio.to_thread(
+            job_manager.submit, document_type, options, [(pdf.filename, pdf.path) for pdf in spooled]
+        )
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "total_files": len(pdf_files),
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        return await asyncio.to_thread(job_manager.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    try:
+        status = await asyncio.to_thread(job_manager.status, job_id)
+        result = await asyncio.to_thread(job_manager.result, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if result is None:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job is not completed (status: {status['status']})"
+        )
+
+    # Re-register the outputs, e.g. after a restart emptied the artifact store
+    output_dir = result.pop("output_dir")
+    for filename in (result["file_info"]["zip_filename"], result["file_info"]["excel_filename"]):
+        key = artifact_key(job_id, filename)
+        path = os.path.join(output_dir, filename)
+        if key not in artifact_store and os.path.exists(path):
+            artifact_store.add(key, path)
+
+    return {"job_id": job_id, **result}
+
+# ========================= EXTRACTION RECORDS =========================
+
+@app.get("/records/search")
+async def search_records(
+    passport: Optional[str] = None,
+    nik: Optional[str] = None,
+    kitas: Optional[str] = None,
+    name: Optional[str] = None,
+    document_type: Optional[str] = None,
+    limit: int = 50
+):
+    """Look up earlier extractions by passport, NIK, KITAS/KITAP number or name"""
+    if document_type is not None and document_type not in SUPPORTED_DOCUMENT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid document type")
+    try:
+        records = await asyncio.to_thread(
+            record_store.search, passport, nik, kitas, name, document_type, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"count": len(records), "records": records}
+
+@app.get("/records/by-hash/{digest}")
+async def get_records_by_hash(digest: str):
+    """Every recorded extraction of the file with this sha256"""
+    records = await asyncio.to_thread(record_store.by_digest, digest.lower())
+    if not records:
+        raise HTTPException(status_code=404, detail="No records for this file")
+    return {"count": len(records), "records": records}
 
 @app.get("/health")
 async def health_check():
@@ -844,10 +1205,83 @@ async def health_check():
         "service": "PDF Document Extractor API"
     }
 
+@app.get("/stats")
+async def get_stats():
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "engine": engine.stats(),
+        "result_cache": result_cache.stats(),
+        "jobs": await asyncio.to_thread(job_manager.stats),
+        "artifacts": artifact_store.stats(),
+        "exports": export_store.stats(),
+        "upload_sessions": upload_sessions.stats(),
+        "records": await asyncio.to_thread(record_store.stats)
+    }
+
+# ========================= METRICS =========================
+
+registry.register(Gauge(
+    "pdf_extractor_engine_running", "Files being extracted on the engine right now",
+    callback=lambda: engine.stats()["running"]
+))
+registry.register(Gauge(
+    "pdf_extractor_engine_waiting", "Files waiting for a free engine slot (queue depth)",
+    callback=lambda: engine.stats()["waiting"]
+))
+registry.register(Gauge(
+    "pdf_extractor_ocr_running", "Scanned files being OCRed on the OCR lane right now",
+    callback=lambda: engine.ocr.stats()["running"] if engine.ocr else 0
+))
+registry.register(Gauge(
+    "pdf_extractor_ocr_waiting", "Scanned files waiting for a free OCR lane slot (queue depth)",
+    callback=lambda: engine.ocr.stats()["waiting"] if engine.ocr else 0
+))
+registry.register(Gauge(
+    "pdf_extractor_client_queue_depth", "Files waiting for an engine or OCR slot, by client", ["client"],
+    callback=lambda: {(client,): depth for client, depth in engine.queue_depths().items()}
+))
+registry.register(CallbackCounter(
+    "pdf_extractor_cache_lookups_total", "Result cache lookups by result (hit, disk_hit, miss)", ["result"],
+    callback=lambda: {
+        ("hit",): result_cache.hits, ("disk_hit",): result_cache.disk_hits, ("miss",): result_cache.misses
+    }
+))
+registry.register(CallbackCounter(
+    "pdf_extractor_cache_evictions_total", "Entries evicted from the in-memory result cache",
+    callback=lambda: result_cache.evictions
+))
+registry.register(Gauge(
+    "pdf_extractor_cache_hit_ratio", "Share of result cache lookups served from the cache",
+    callback=lambda: result_cache.stats()["hit_rate"]
+))
+registry.register(Gauge(
+    "pdf_extractor_jobs_queued", "Background jobs waiting for a job worker",
+    callback=lambda: job_manager.stats()["queued"]
+))
+registry.register(Gauge(
+    "pdf_extractor_jobs", "Background jobs by status", ["status"],
+    callback=lambda: {(status,): count for status, count in job_manager.stats()["jobs"].items()}
+))
+registry.register(Gauge(
+    "pdf_extractor_artifact_bytes", "Bytes of downloadable artifacts kept on disk",
+    callback=lambda: artifact_store.stats()["bytes"]
+))
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of the counters, gauges and stage histograms"""
+    # The job gauges query SQLite
+    return PlainTextResponse(await asyncio.to_thread(registry.render), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/document-types")
 async def get_document_types():
     return {
         "supported_types": [
+            {
+                "code": AUTO_DETECT,
+                "name": "Deteksi otomatis",
+                "description": "Detect the type of every file from its first page"
+            },
             {
                 "code": "SKTT",
                 "name": "Surat Keterangan Tinggal Terbatas",
@@ -881,93 +1315,90 @@ async def get_document_types():
         ]
     }
 
-# Global storage for temporary files
-temp_files_storage = {}
+def observe_download(kind, size, started):
+    """Runs once the download body has been sent"""
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="download")
+    DOWNLOADS_TOTAL.inc(kind=kind, status="served")
+    DOWNLOAD_BYTES_TOTAL.inc(size, kind=kind)
 
-@app.get("/download-zip/{filename}")
-async def download_zip(filename: str):
+@app.get("/download-zip/{key:path}")
+async def download_zip(key: str):
     """Download ZIP file containing renamed PDFs"""
-    print(f"=== ZIP DOWNLOAD REQUEST ===")
-    print(f"Requested filename: {filename}")
-    print(f"Available files in temp_files_storage: {list(temp_files_storage.keys())}")
-
-    # Try exact match first
-    zip_path = temp_files_storage.get(filename)
-
-    # If not found, try pattern matching for ZIP files
-    if not zip_path:
-        print("Exact match not found, trying pattern matching...")
-        for stored_filename, stored_path in temp_files_storage.items():
-            if stored_filename.endswith('.zip'):
-                if filename in stored_filename or filename == stored_filename:
-                    print(f"Found matching ZIP file: {stored_filename}")
-                    zip_path = stored_path
-                    filename = stored_filename  # Use the actual stored filename
-                    break
-
-    print(f"Resolved ZIP path: {zip_path}")
-
-    if not zip_path:
-        error_msg = f"ZIP file not found: {filename}"
-        print(f"ERROR: {error_msg}")
-        print(f"Available files: {list(temp_files_storage.keys())}")
+    started = time.perf_counter()
+    artifact = artifact_store.get(key)
+    if artifact is None:
+        error_msg = f"ZIP file not found or expired: {key}"
+        logger.warning("download not found", extra={"download_filename": key})
+        DOWNLOADS_TOTAL.inc(kind="zip", status="not_found")
         raise HTTPException(status_code=404, detail=error_msg)
 
-    # Verify file exists on disk
-    if not os.path.exists(zip_path):
-        error_msg = f"ZIP file does not exist on disk: {zip_path}"
-        print(f"ERROR: {error_msg}")
-        # Remove from storage if file doesn't exist
-        if filename in temp_files_storage:
-            del temp_files_storage[filename]
+    if artifact.size == 0:
+        error_msg = f"ZIP file is empty: {artifact.filename}"
+        logger.warning("download empty", extra={"download_filename": key})
+        DOWNLOADS_TOTAL.inc(kind="zip", status="empty")
         raise HTTPException(status_code=404, detail=error_msg)
 
-    # Get file size and verify it's not empty
-    file_size = os.path.getsize(zip_path)
-    if file_size == 0:
-        error_msg = f"ZIP file is empty: {filename}"
-        print(f"ERROR: {error_msg}")
-        raise HTTPException(status_code=404, detail=error_msg)
-
-    print(f"SUCCESS: Serving ZIP file: {filename}")
-    print(f"File path: {zip_path}")
-    print(f"File size: {file_size} bytes")
-
     # Return FileResponse
     return FileResponse(
-        zip_path,
+        artifact.path,
         media_type='application/zip',
-        filename=filename,
+        filename=artifact.filename,
         headers={
-            "Content-Disposition": f"attachment; filename=\"{filename}\"",
+            "Content-Disposition": f"attachment; filename=\"{artifact.filename}\"",
             "Content-Type": "application/zip",
-            "Content-Length": str(file_size),
+            "Content-Length": str(artifact.size),
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET",
             "Access-Control-Allow-Headers": "*",
             "Cache-Control": "no-cache, no-store, must-revalidate",
             "Pragma": "no-cache",
             "Expires": "0"
-        }
+        },
+        background=BackgroundTask(observe_download, "zip", artifact.size, started)
     )
 
-@app.get("/download-excel/{filename}")
-async def download_excel(filename: str):
+@app.get("/download-excel/{key:path}")
+async def download_excel(key: str):
     """Download Excel file"""
-    excel_path = temp_files_storage.get(filename)
-    if not excel_path or not os.path.exists(excel_path):
+    started = time.perf_counter()
+    artifact = artifact_store.get(key)
+    if artifact is None:
+        DOWNLOADS_TOTAL.inc(kind="excel", status="not_found")
         raise HTTPException(status_code=404, detail="Excel file not found")
 
     return FileResponse(
-        excel_path,
+        artifact.path,
         media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        filename=filename,
+        filename=artifact.filename,
         headers={
-            "Content-Disposition": f"attachment; filename=\"{filename}\"",
+            "Content-Disposition": f"attachment; filename=\"{artifact.filename}\"",
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET",
             "Access-Control-Allow-Headers": "*"
-        }
+        },
+        background=BackgroundTask(observe_download, "excel", artifact.size, started)
+    )
+
+@app.get("/download-parquet/{key:path}")
+async def download_parquet(key: str):
+    """Download Parquet file"""
+    started = time.perf_counter()
+    artifact = artifact_store.get(key)
+    if artifact is None:
+        DOWNLOADS_TOTAL.inc(kind="parquet", status="not_found")
+        raise HTTPException(status_code=404, detail="Parquet file not found")
+
+    return FileResponse(
+        artifact.path,
+        media_type='application/vnd.apache.parquet',
+        filename=artifact.filename,
+        headers={
+            "Content-Disposition": f"attachment; filename=\"{artifact.filename}\"",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET",
+            "Access-Control-Allow-Headers": "*"
+        },
+        background=BackgroundTask(observe_download, "parquet", artifact.size, started)
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+"""Counters, gauges and histograms exported in the Prometheus text format.
+
+A small in-process registry, so /metrics needs no extra dependency. Stage
+timings and counts taken inside the extraction worker processes cannot
+touch the API process's registry directly: ``collect_samples`` runs a task
+with a per-thread sample buffer and returns the samples with its result,
+and ``observe_samples`` replays them in the API process.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _label_key(labelnames, labels):
+    missing = set(labelnames) - set(labels)
+    if missing or len(labels) != len(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self):
+        with self._lock:
+            return [
+                (self.name, list(zip(self.labelnames, key)), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+    def render(self):
+        lines = self.header()
+        for name, pairs, value in self.samples():
+            lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge set explicitly, or read from ``callback`` at scrape time.
+
+    The callback returns a number, or a dict of label-value tuples to
+    numbers for labelled gauges.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        value = self.callback()
+        if not isinstance(value, dict):
+            return [(self.name, [], value)]
+        return [
+            (self.name, list(zip(self.labelnames, key)), item)
+            for key, item in sorted(value.items())
+        ]
+
+
+class CallbackCounter(Gauge):
+    """Counter whose (monotonic) value is owned elsewhere, e.g. cache stats."""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block (in seconds)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record(self, time.perf_counter() - started, labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", pairs + [("le", _format_value(bound))], cumulative))
+            samples.append((f"{self.name}_bucket", pairs + [("le", "+Inf")], count))
+            samples.append((f"{self.name}_sum", pairs, total))
+            samples.append((f"{self.name}_count", pairs, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ========================= WORKER SAMPLES =========================
+
+_local = threading.local()
+
+
+def _apply(metric, value, labels):
+    if isinstance(metric, Counter):
+        metric.inc(value, **labels)
+    else:
+        metric.observe(value, **labels)
+
+
+def record(metric, value, labels):
+    """Observe a histogram value or increment a counter, buffered when a worker task is collecting."""
+    buffer = getattr(_local, "samples", None)
+    if buffer is None:
+        _apply(metric, value, labels)
+    else:
+        buffer.append((metric.name, labels, value))
+
+
+def collect_samples(func, *args):
+    """Run ``func(*args)`` and return (result, metric samples it recorded).
+
+    Used as the task actually sent to a pool worker, so timings taken in
+    another process can be replayed with ``observe_samples``.
+    """
+    _local.samples = []
+    try:
+        result = func(*args)
+        return result, _local.samples
+    finally:
+        _local.samples = None
+
+
+def observe_samples(samples):
+    for name, labels, value in samples:
+        metric = registry.get(name)
+        if metric is not None:
+            _apply(metric, value, labels)
+
+
+# ========================= METRICS =========================
+
+STAGE_SECONDS = registry.register(Histogram(
+    "pdf_extractor_stage_seconds",
+    "Time spent per processing stage",
+    ["stage"],
+))
+FIELDS_SECONDS = registry.register(Histogram(
+    "pdf_extractor_fields_seconds",
+    "Time spent running a document type's field extractors on one text",
+    ["document_type"],
+))
+DOCUMENTS_TOTAL = registry.register(Counter(
+    "pdf_extractor_documents_total",
+    "Documents processed by document type and outcome (extracted, ocr, cached, shared, failed)",
+    ["document_type", "outcome"],
+))
+UPLOAD_BYTES_TOTAL = registry.register(Counter(
+    "pdf_extractor_upload_bytes_total",
+    "Bytes of uploaded files spooled to disk",
+))
+DOWNLOADS_TOTAL = registry.register(Counter(
+    "pdf_extractor_downloads_total",
+    "Downloads served by kind (zip, excel, parquet) and status",
+    ["kind", "status"],
+))
+DOWNLOAD_BYTES_TOTAL = registry.register(Counter(
+    "pdf_extractor_download_bytes_total",
+    "Bytes of downloads served by kind",
+    ["kind"],
+))
+TEXT_BACKEND_SECONDS = registry.register(Histogram(
+    "pdf_extractor_text_backend_seconds",
+    "Time spent per text backend (pdfium, pdfplumber, ocr) and operation (open, page_text, render)",
+    ["backend", "operation"],
+))
+TEXT_BACKEND_FALLBACKS_TOTAL = registry.register(Counter(
+    "pdf_extractor_text_backend_fallbacks_total",
+    "Documents re-read with the next text backend after failing validation, by document type and backend",
+    ["document_type", "backend"],
+))
+OCR_PAGES_TOTAL = registry.register(Counter(
+    "pdf_extractor_ocr_pages_total",
+    "Pages without a text layer run through OCR, by outcome (recognized, cached)",
+    ["outcome"],
+))
+EXPORT_ARTIFACTS_TOTAL = registry.register(Counter(
+    "pdf_extractor_export_artifacts_total",
+    "Export session downloads by kind (excel, parquet, zip) and whether the artifact was built or reused",
+    ["kind", "outcome"],
+))
+STARTUP_SECONDS = registry.register(Gauge(
+    "pdf_extractor_startup_seconds",
+    "Seconds from the start of importing the API to the end of each startup phase "
+    "(import, warmup, first_extraction)",
+    ["phase"],
+))
+RATE_LIMITED_TOTAL = registry.register(Counter(
+    "pdf_extractor_rate_limited_total",
+    "Requests rejected with 429 because their client's token bucket was empty",
+))
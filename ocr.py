@@ -0,0 +1,84 @@
+"""OCR of pages without a text layer, with local Tesseract.
+
+Pages are rendered with pdfium (pypdfium2) and passed to the ``tesseract``
+command line tool, so nothing beyond the tesseract binary and its language
+data has to be installed. OCR text is cached on disk under the sha256 of
+the rendered page image, shared by every OCR worker process and kept
+across restarts, so the same scan is only ever recognized once.
+
+pdf_text.OcrDocument is the text backend built on it: pages that do have a
+text layer are read directly, only the empty ones are recognized.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+from metrics import OCR_PAGES_TOTAL, STAGE_SECONDS, record
+
+OCR_LANGUAGES = os.environ.get("OCR_LANGUAGES") or "eng+ind"
+OCR_DPI = int(os.environ.get("OCR_DPI", 300))
+OCR_TIMEOUT_SECONDS = int(os.environ.get("OCR_TIMEOUT_SECONDS", 120))
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "pdf_extractor_ocr")
+
+
+class OcrError(Exception):
+    """Raised when tesseract is missing or fails on a page."""
+
+
+def tesseract_path():
+    return shutil.which("tesseract")
+
+
+def ocr_available():
+    return tesseract_path() is not None
+
+
+def ocr_enabled():
+    """OCR_ENABLED: "auto" (default) uses OCR when tesseract is installed, "1"/"0" force it on or off."""
+    setting = (os.environ.get("OCR_ENABLED") or "auto").lower()
+    if setting == "auto":
+        return ocr_available()
+    return setting in ("1", "true", "yes", "on")
+
+
+def _cache_path(digest):
+    return os.path.join(OCR_CACHE_DIR, digest[:2], f"{digest}.txt")
+
+
+def recognize(image_png):
+    """Text of a PNG page image, from the OCR cache or tesseract."""
+    digest = hashlib.sha256(image_png).hexdigest()
+    cache_path = _cache_path(digest)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            text = f.read()
+        record(OCR_PAGES_TOTAL, 1, {"outcome": "cached"})
+        return text
+    except FileNotFoundError:
+        pass
+
+    executable = tesseract_path()
+    if executable is None:
+        raise OcrError("tesseract is not installed")
+    with STAGE_SECONDS.time(stage="ocr_page"):
+        completed = subprocess.run(
+            [executable, "stdin", "stdout", "-l", OCR_LANGUAGES, "--psm", "6"],
+            input=image_png,
+            capture_output=True,
+            timeout=OCR_TIMEOUT_SECONDS,
+        )
+    if completed.returncode != 0:
+        raise OcrError(f"tesseract failed: {completed.stderr.decode(errors='replace').strip()[:200]}")
+    text = completed.stdout.decode("utf-8", errors="replace")
+    record(OCR_PAGES_TOTAL, 1, {"outcome": "recognized"})
+
+    # Written under a temporary name first, other workers may read it concurrently
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    return text
+
@@ -0,0 +1,130 @@
+"""Parquet export of extraction results.
+
+Columns follow the document type's field table (extractors.output_schema):
+fields of kind "date" become real date columns parsed from the dd/mm/yyyy
+strings format_date produces, everything else is a string, and columns not
+in the table (Source_File and the like) are appended as strings. Rows are
+written in row groups of ROW_GROUP_SIZE, so a large export never holds more
+than one group as Arrow data.
+
+pyarrow is imported on first use; without it ParquetUnavailableError is
+raised and the rest of the API keeps working.
+"""
+import re
+from datetime import date
+
+from extractors import output_schema
+from metrics import STAGE_SECONDS
+
+ROW_GROUP_SIZE = 10000
+
+_DATE_RE = re.compile(r"^(\d{2})/(\d{2})/(\d{4})$")
+
+
+class ParquetUnavailableError(RuntimeError):
+    pass
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ParquetUnavailableError("Parquet export needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def parse_date(value):
+    """date from a dd/mm/yyyy string, None when empty or not a valid date."""
+    match = _DATE_RE.match(value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _to_string(value):
+    if value is None or value == "":
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ParquetRowWriter:
+    """Typed Parquet file for one document type, written one row group at a time.
+
+    ``extra_columns`` maps columns that are not extracted fields to a kind:
+    "string" or "float" (e.g. detection confidence).
+    """
+
+    def __init__(self, path, document_type, extra_columns=None, row_group_size=ROW_GROUP_SIZE):
+        pa = require_pyarrow()
+        self._pa = pa
+        self.row_group_size = row_group_size
+        self.columns = output_schema(document_type)
+        fields = {name for name, _ in self.columns}
+        for name, kind in (extra_columns or {}).items():
+            if name not in fields:
+                self.columns.append((name, kind))
+
+        arrow_types = {"string": pa.string(), "date": pa.date32(), "float": pa.float64()}
+        self.schema = pa.schema(
+            [(name, arrow_types[kind]) for name, kind in self.columns],
+            metadata={"document_type": document_type},
+        )
+        self._converters = [
+            (name, parse_date if kind == "date" else _to_float if kind == "float" else _to_string)
+            for name, kind in self.columns
+        ]
+        self._writer = pa.parquet.ParquetWriter(path, self.schema, compression="snappy")
+        self._pending = []
+        self.rows = 0
+
+    def write(self, rows):
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        arrays = [
+            self._pa.array([convert(row.get(name)) for row in self._pending], type=field.type)
+            for (name, convert), field in zip(self._converters, self.schema)
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_parquet(path, rows, document_type, extra_columns=None):
+    """Write a list of dicts to a typed .parquet file with one row per dict."""
+    if extra_columns is None:
+        extra_columns = {}
+        for row in rows:
+            for key in row:
+                extra_columns.setdefault(key, "string")
+    with STAGE_SECONDS.time(stage="parquet_build"):
+        with ParquetRowWriter(path, document_type, extra_columns) as writer:
+            writer.write(rows)
+    return path
@@ -0,0 +1,321 @@
+"""Page text loading shared by every extraction path.
+
+Text comes from a pluggable backend. pdfplumber runs a full character-level
+layout analysis per page, which is what the extractors were written
+against and what scanned or oddly built PDFs need. pdfium (pypdfium2, which
+pdfplumber already depends on) reads the text layer directly and is much
+faster on the digitally generated permits; its output is normalized to
+pdfplumber's line layout. extractors.extract_document tries the fast backend
+first and falls back to pdfplumber when the result fails validation. The
+ocr backend is pdfium plus Tesseract for pages without a text layer (scans).
+
+Each page is extracted at most once per open document and only when
+something actually asks for it. The PDF libraries are imported by the first
+document opened, so importing the API stays cheap.
+"""
+import io
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+from metrics import STAGE_SECONDS, TEXT_BACKEND_SECONDS
+from ocr import OCR_DPI, ocr_available, recognize
+
+
+class PdfplumberDocument:
+    name = "pdfplumber"
+
+    def __init__(self, source):
+        import pdfplumber
+
+        self._pdf = pdfplumber.open(source)
+
+    def __len__(self):
+        return len(self._pdf.pages)
+
+    def page_text(self, index, region):
+        page = self._pdf.pages[index]
+        if region is not None:
+            x0, top, x1, bottom = region
+            page = page.crop((x0 * page.width, top * page.height, x1 * page.width, bottom * page.height))
+        return page.extract_text() or ""
+
+    def close(self):
+        self._pdf.close()
+
+
+_PDFIUM_SPACES_RE = re.compile(r"[ \t\xa0]+")
+# pdfium is not thread safe; only the thread executor (EXTRACTION_WORKERS=0) ever contends
+_PDFIUM_LOCK = threading.Lock()
+
+
+class PdfiumDocument:
+    name = "pdfium"
+
+    def __init__(self, source):
+        import pypdfium2
+
+        with _PDFIUM_LOCK:
+            self._pdf = pypdfium2.PdfDocument(source)
+
+    def __len__(self):
+        return len(self._pdf)
+
+    def page_text(self, index, region):
+        with _PDFIUM_LOCK:
+            page = self._pdf[index]
+            textpage = page.get_textpage()
+            try:
+                if region is None:
+                    text = textpage.get_text_range()
+                else:
+                    # pdfium boxes are in points from the bottom-left corner
+                    x0, top, x1, bottom = region
+                    width, height = page.get_size()
+                    text = textpage.get_text_bounded(
+                        left=x0 * width, bottom=(1 - bottom) * height, right=x1 * width, top=(1 - top) * height
+                    )
+            finally:
+                textpage.close()
+                page.close()
+        return _normalize_lines(text)
+
+    def close(self):
+        with _PDFIUM_LOCK:
+            self._pdf.close()
+
+
+def _normalize_lines(text):
+    # Same shape as pdfplumber: "\n" line breaks, no indentation, single spaces, no blank lines
+    lines = (_PDFIUM_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class OcrDocument(PdfiumDocument):
+    """pdfium's text layer where a page has one, Tesseract OCR of the rendered page where it does not.
+
+    Only used for documents that came back without any text (see
+    extractors.NoTextLayerError), on the engine's separate OCR lane.
+    """
+
+    name = "ocr"
+
+    def page_text(self, index, region):
+        text = super().page_text(index, region)
+        if text:
+            return text
+        with TEXT_BACKEND_SECONDS.time(backend=self.name, operation="render"):
+            image_png = self._render(index, region)
+        return _normalize_lines(recognize(image_png))
+
+    def _render(self, index, region):
+        with _PDFIUM_LOCK:
+            page = self._pdf[index]
+            try:
+                crop = (0, 0, 0, 0)
+                if region is not None:
+                    # render crops (left, bottom, right, top) points off each side
+                    x0, top, x1, bottom = region
+                    width, height = page.get_size()
+                    crop = (x0 * width, (1 - bottom) * height, (1 - x1) * width, top * height)
+                image = page.render(scale=OCR_DPI / 72, crop=crop, grayscale=True).to_pil()
+            finally:
+                page.close()
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+TEXT_BACKENDS = {"pdfplumber": PdfplumberDocument, "pdfium": PdfiumDocument, "ocr": OcrDocument}
+
+# Backends tried in order for TEXT_BACKEND=auto; pdfplumber is always the last resort
+AUTO_BACKENDS = ["pdfium", "pdfplumber"]
+
+
+def _available(name):
+    if name == "pdfplumber":
+        return True
+    try:
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return name != "ocr" or ocr_available()
+
+
+def text_backends(setting=None):
+    """Backend names to try in order, from ``setting`` or TEXT_BACKEND (auto, pdfium or pdfplumber)."""
+    setting = (setting or os.environ.get("TEXT_BACKEND") or "auto").lower()
+    names = AUTO_BACKENDS if setting == "auto" else [setting]
+    unknown = [name for name in names if name not in TEXT_BACKENDS]
+    if unknown:
+        raise ValueError(f"Unknown text backend: {unknown[0]}")
+    return [name for name in names if _available(name)] or ["pdfplumber"]
+
+
+class PdfText:
+    """Lazily extracted, cached per-page text of an open PDF."""
+
+    def __init__(self, document):
+        self._document = document
+        self._pages = {}
+
+    @property
+    def backend(self):
+        return self._document.name
+
+    def __len__(self):
+        return len(self._document)
+
+    @property
+    def pages_extracted(self):
+        return len(self._pages)
+
+    @property
+    def has_text(self):
+        """Whether any page read so far had text; False for a scan without a text layer."""
+        return any(self._pages.values())
+
+    def page(self, index, region=None):
+        """Text of page ``index`` (0-based), "" when the page has no text layer.
+
+        ``region`` limits the text to a (x0, top, x1, bottom) box given as
+        fractions of the page size, so layout analysis only covers that box.
+        """
+        key = index if region is None else (index, region)
+        if key not in self._pages:
+            with STAGE_SECONDS.time(stage="page_text"), \
+                    TEXT_BACKEND_SECONDS.time(backend=self.backend, operation="page_text"):
+                self._pages[key] = self._document.page_text(index, region)
+        return self._pages[key]
+
+    def text(self, page_count=None):
+        """Join the non-empty text of the first ``page_count`` pages (all by default)."""
+        if page_count is None:
+            page_count = len(self)
+        texts = [self.page(i) for i in range(min(page_count, len(self)))]
+        return "\n".join(text for text in texts if text)
+
+
+@contextmanager
+def load_pdf_text(source, backend="pdfplumber"):
+    """Open a PDF (path or file object) with the named backend and yield its lazy PdfText."""
+    with STAGE_SECONDS.time(stage="pdf_open"), TEXT_BACKEND_SECONDS.time(backend=backend, operation="open"):
+        document = TEXT_BACKENDS[backend](source)
+    try:
+        yield PdfText(document)
+    finally:
+        document.close()
+
+
+class PagePlan:
+    """Pages of a document type that normally hold all of its data.
+
+    ``pages`` are 0-based indexes, negative ones counting from the end (e.g.
+    -1 for a signature page). ``regions`` optionally maps a planned page to
+    the (x0, top, x1, bottom) box, as page fractions, its fields sit in.
+    When any of the ``required`` fields comes back empty the plan did not
+    fit this PDF and the whole document is scanned after all.
+    """
+
+    def __init__(self, pages, required, regions=None):
+        self.pages = tuple(pages)
+        self.required = tuple(required)
+        self.regions = dict(regions or {})
+
+    def planned_pages(self, page_count):
+        """(page index, region or None) of the planned pages this PDF has, in plan order."""
+        planned = {}
+        for index in self.pages:
+            if -page_count <= index < page_count:
+                planned.setdefault(index % page_count, self.regions.get(index))
+        return list(planned.items())
+
+
+def missing_fields(data):
+    """Names of the extracted fields that are still empty."""
+    return [key for key, value in data.items() if not value]
+
+
+# New pages the extractor is re-run on over the whole text read so far; after
+# that a page is first checked on its own for the fields still missing
+PROBE_PAGES = 2
+
+
+def _extract_more(doc, extractor, indexes, texts, data):
+    """Extend ``data``, the extractor's result over ``texts``, with the pages at ``indexes``.
+
+    The first PROBE_PAGES new pages with text are handled like before: the
+    extractor runs over everything read so far and stops once nothing is
+    missing. Later pages are only searched on their own for the fields still
+    missing, and the whole text is extracted again when they have all turned
+    up and once at the end, so a document that never fills every field costs
+    regex work linear in its pages instead of quadratic.
+    """
+    probes = 0
+    missing = set(missing_fields(data))
+    stale = False
+    for index in indexes:
+        text = doc.page(index)
+        if not text:
+            # No new text, the previous result still stands
+            continue
+        texts.append(text)
+        if probes < PROBE_PAGES:
+            probes += 1
+            data = extractor("\n".join(texts))
+            missing = set(missing_fields(data))
+            if not missing:
+                return data
+            continue
+        stale = True
+        found = extractor(text)
+        missing = {field for field in missing if not found.get(field)}
+        if not missing:
+            data = extractor("\n".join(texts))
+            stale = False
+            missing = set(missing_fields(data))
+            if not missing:
+                return data
+    if stale:
+        data = extractor("\n".join(texts))
+    return data
+
+
+def extract_progressively(doc, extractor):
+    """Run extractor over a growing page prefix and stop once nothing is missing.
+
+    Most permits carry every field on page 1, so long scanned bundles usually
+    only pay for one page of layout analysis. Documents with a field that is
+    never found end up being read in full, with one extraction pass over the
+    full text rather than one per page (see _extract_more).
+    """
+    return _extract_more(doc, extractor, range(len(doc)), [], extractor(""))
+
+
+def extract_planned(doc, extractor, plan):
+    """Run extractor over the pages of ``plan`` only, scanning further when a required field is missing.
+
+    Planned pages are read one at a time like in extract_progressively, so
+    a document complete on its first planned page stops there. The scan
+    continues after the planned pages with the ones not read yet.
+    """
+    if plan is None:
+        return extract_progressively(doc, extractor)
+
+    data = extractor("")
+    texts = []
+    read = set()
+    for index, region in plan.planned_pages(len(doc)):
+        text = doc.page(index, region)
+        if region is None:
+            read.add(index)
+        if not text:
+            continue
+        texts.append(text)
+        data = extractor("\n".join(texts))
+        if not missing_fields(data):
+            return data
+    if all(data.get(field) for field in plan.required):
+        return data
+    return _extract_more(doc, extractor, [index for index in range(len(doc)) if index not in read], texts, data)
@@ -0,0 +1,210 @@
+"""Persistent, searchable store of extraction results.
+
+Every successful extraction is recorded once per (file hash, document type)
+with its fields and when it was first and last seen, so documents can be
+looked up later without re-uploading them. The identifiers people search by
+are pulled out of the type-specific field names into indexed columns:
+
+* passport: "Passport Number" (ITAS/ITK), "Passport No" (EVLN),
+  "Nomor Paspor" (Notifikasi, DKPTKA)
+* nik: "NIK" (SKTT)
+* kitas: "KITAS/KITAP" (SKTT), "Permit Number" (ITAS/ITK)
+* name: "Name" or "Nama TKA", normalized (uppercase, letters and digits,
+  single spaces), plus one indexed row per name token so a search for one
+  word of the name (e.g. the family name) is an index lookup too.
+
+Every lookup is an equality or prefix range scan on a B-tree index.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+PASSPORT_FIELDS = ("Passport Number", "Passport No", "Nomor Paspor")
+NIK_FIELDS = ("NIK",)
+KITAS_FIELDS = ("KITAS/KITAP", "Permit Number")
+NAME_FIELDS = ("Name", "Nama TKA")
+
+MAX_LIMIT = 500
+
+_NON_ALNUM_RE = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize_name(value):
+    """"  John  o'Brien-smith " -> "JOHN O BRIEN SMITH"; None when nothing is left."""
+    if not value:
+        return None
+    normalized = _NON_ALNUM_RE.sub(" ", str(value).upper()).strip()
+    return normalized or None
+
+
+def normalize_identifier(value):
+    """Passport/NIK/KITAS numbers compared without case, spaces or punctuation."""
+    if not value:
+        return None
+    normalized = _NON_ALNUM_RE.sub("", str(value).upper())
+    return normalized or None
+
+
+def _first(data, fields):
+    for field in fields:
+        if data.get(field):
+            return data[field]
+    return None
+
+
+class RecordStore:
+    """SQLite store of extraction records, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    document_type TEXT NOT NULL,
+                    filename TEXT,
+                    data TEXT NOT NULL,
+                    passport TEXT,
+                    nik TEXT,
+                    kitas TEXT,
+                    name TEXT,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    times_seen INTEGER NOT NULL DEFAULT 1,
+                    UNIQUE (digest, document_type)
+                );
+                CREATE INDEX IF NOT EXISTS records_passport ON records (passport);
+                CREATE INDEX IF NOT EXISTS records_nik ON records (nik);
+                CREATE INDEX IF NOT EXISTS records_kitas ON records (kitas);
+                CREATE TABLE IF NOT EXISTS record_name_tokens (
+                    token TEXT NOT NULL,
+                    record_id INTEGER NOT NULL,
+                    PRIMARY KEY (token, record_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS record_name_tokens_record ON record_name_tokens (record_id, token);
+                """
+            )
+            self._db.commit()
+
+    def add(self, digest, document_type, data, filename=None):
+        """Record one extraction; the same file and type again only refreshes it."""
+        name = normalize_name(_first(data, NAME_FIELDS))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                """
+                INSERT INTO records (digest, document_type, filename, data, passport, nik, kitas, name,
+                                     first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (digest, document_type) DO UPDATE SET
+                    filename = excluded.filename, data = excluded.data, passport = excluded.passport,
+                    nik = excluded.nik, kitas = excluded.kitas, name = excluded.name,
+                    last_seen = excluded.last_seen, times_seen = times_seen + 1
+                """,
+                (
+                    digest, document_type, filename, json.dumps(data),
+                    normalize_identifier(_first(data, PASSPORT_FIELDS)),
+                    normalize_identifier(_first(data, NIK_FIELDS)),
+                    normalize_identifier(_first(data, KITAS_FIELDS)),
+                    name, now, now,
+                ),
+            )
+            record_id = self._db.execute(
+                "SELECT id FROM records WHERE digest = ? AND document_type = ?", (digest, document_type)
+            ).fetchone()[0]
+            self._db.execute("DELETE FROM record_name_tokens WHERE record_id = ?", (record_id,))
+            if name:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO record_name_tokens (token, record_id) VALUES (?, ?)",
+                    [(token, record_id) for token in set(name.split())],
+                )
+        return record_id
+
+    def search(self, passport=None, nik=None, kitas=None, name=None, document_type=None, limit=50):
+        """Records matching every given criterion, most recently seen first.
+
+        ``name`` matches records whose normalized name contains all of its
+        words as whole words (in any order); the last word may be a prefix.
+        """
+        clauses = []
+        params = []
+        for column, value in (("passport", passport), ("nik", nik), ("kitas", kitas)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(normalize_identifier(value))
+        tokens = (normalize_name(name) or "").split()
+        for token in tokens[:-1]:
+            clauses.append("id IN (SELECT record_id FROM record_name_tokens WHERE token = ?)")
+            params.append(token)
+        if tokens:
+            # Prefix range on the token index, e.g. "SIL" -> ["SIL", "SIM"). With whole
+            # words to narrow the candidates first it is checked per candidate instead,
+            # since a short prefix can match a large share of all records.
+            last = tokens[-1]
+            if len(tokens) == 1:
+                clauses.append("id IN (SELECT record_id FROM record_name_tokens WHERE token >= ? AND token < ?)")
+            else:
+                clauses.append(
+                    "EXISTS (SELECT 1 FROM record_name_tokens AS t "
+                    "WHERE t.record_id = records.id AND t.token >= ? AND t.token < ?)"
+                )
+            params.extend([last, last[:-1] + chr(ord(last[-1]) + 1)])
+        if not clauses:
+            raise ValueError("At least one of passport, nik, kitas or name is required")
+        if document_type:
+            clauses.append("document_type = ?")
+            params.append(document_type)
+
+        sql = f"SELECT * FROM records WHERE {' AND '.join(clauses)} ORDER BY last_seen DESC LIMIT ?"
+        params.append(max(1, min(limit, MAX_LIMIT)))
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def by_digest(self, digest):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM records WHERE digest = ? ORDER BY last_seen DESC", (digest,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "id": row["id"],
+            "digest": row["digest"],
+            "document_type": row["document_type"],
+            "filename": row["filename"],
+            "data": json.loads(row["data"]),
+            "first_seen": row["first_seen"],
+            "last_seen": row["last_seen"],
+            "times_seen": row["times_seen"],
+        }
+
+    def stats(self):
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+            by_type = dict(self._db.execute(
+                "SELECT document_type, COUNT(*) FROM records GROUP BY document_type"
+            ).fetchall())
+        return {"path": self.path, "records": total, "by_document_type": by_type}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+record_store = RecordStore(
+    os.environ.get("RECORD_STORE_PATH") or os.path.join(tempfile.gettempdir(), "pdf_extractor_records.sqlite3")
+)
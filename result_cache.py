@@ -0,0 +1,199 @@
+"""Content-addressed cache of extraction results.
+
+Results are keyed by ``sha256(pdf bytes)``, the document type, the
+extractor version and the text backends in use, so re-uploading the same
+PDF skips text extraction entirely while any change to an extractor (bumped
+in EXTRACTOR_VERSIONS), to the classifier or to TEXT_BACKEND invalidates
+its old entries. Entries live in an in-memory LRU
+bounded by size and, optionally, in a second LRU tier stored in SQLite.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from extractors import extractor_version
+from pdf_text import text_backends
+
+_backends_key = None
+
+
+def backends_key():
+    """The TEXT_BACKEND backends as a cache key part, e.g. "pdfium+pdfplumber"."""
+    global _backends_key
+    if _backends_key is None:
+        # Resolved on first use: checking for pypdfium2 imports it
+        _backends_key = "+".join(text_backends())
+    return _backends_key
+
+
+def digest_key(digest, document_type):
+    return f"{digest}:{document_type}:{extractor_version(document_type)}:{backends_key()}"
+
+
+def cache_key(content, document_type):
+    return digest_key(hashlib.sha256(content).hexdigest(), document_type)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_cache_key(path, document_type):
+    return digest_key(file_sha256(path), document_type)
+
+
+class ResultCache:
+    """Two-tier (memory, optional SQLite) LRU with size-based eviction.
+
+    Values are stored as JSON, so every ``get`` returns a fresh copy that
+    callers may mutate freely.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, path=None, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        # Running total of the disk tier's sizes, so puts don't sum the table
+        self._disk_size = 0
+        # _lock guards the memory tier, _disk_lock the SQLite one, so memory
+        # hits on the event loop never wait for a disk read in a thread
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            self._db.commit()
+            self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key):
+        value = self._get_memory(key)
+        if value is None:
+            value = self._get_disk(key)
+        return None if value is None else json.loads(value)
+
+    def put(self, key, data):
+        value = json.dumps(data)
+        self._put_memory(key, value)
+        if self._db is not None:
+            self._put_disk(key, value)
+
+    async def get_async(self, key):
+        """get() for the event loop: memory hits inline, the SQLite tier in a thread."""
+        value = self._get_memory(key)
+        if value is None:
+            if self._db is None:
+                value = self._get_disk(key)
+            else:
+                value = await asyncio.to_thread(self._get_disk, key)
+        return None if value is None else json.loads(value)
+
+    async def put_async(self, key, data):
+        """put() for the event loop: the memory tier is updated before returning, SQLite in a thread."""
+        value = json.dumps(data)
+        self._put_memory(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._put_disk, key, value)
+
+    def _get_memory(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def _get_disk(self, key):
+        if self._db is not None:
+            with self._disk_lock:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+            if row:
+                self._put_memory(key, row[0])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+
+    def _put_disk(self, key, value):
+        with self._disk_lock:
+            replaced = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self._disk_size += len(value) - (replaced[0] if replaced else 0)
+            self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key, value):
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_max_bytes:
+            row = self._db.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 1").fetchone()
+            if not row:
+                self._disk_size = 0
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            self._disk_size -= row[1]
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "disk_path": self.path,
+            "disk_bytes": self._disk_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    path=os.environ.get("RESULT_CACHE_PATH") or None,
+    disk_max_bytes=int(os.environ.get("RESULT_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)),
+)
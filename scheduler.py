@@ -0,0 +1,142 @@
+"""Fair sharing of the extraction slots between clients.
+
+Without it the engine's slots went to files in arrival order, so one client
+uploading 500 files kept everyone else's two-file request waiting behind
+the whole batch. Waiting files are now queued per client and slots are
+handed out round-robin across the clients that are waiting, a client with
+weight w getting up to w slots per turn. Files of small interactive
+requests go to a priority lane that is always served first.
+
+Which client and lane a file belongs to comes from ``current_client``, set
+per request by admission.AdmissionMiddleware and inherited by the tasks the
+request starts. Work started outside a request (background jobs, upload
+sessions resumed at startup) runs as the "background" client.
+"""
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+
+BACKGROUND_CLIENT = "background"
+
+# (client id, priority lane) of the work being done
+current_client = contextvars.ContextVar("current_client", default=(BACKGROUND_CLIENT, False))
+
+
+def parse_weights(value):
+    """"alice=3,bob=2" -> {"alice": 3, "bob": 2}"""
+    weights = {}
+    for item in (value or "").split(","):
+        client, sep, weight = item.strip().rpartition("=")
+        if sep and client:
+            weights[client] = max(1, int(weight))
+    return weights
+
+
+class _Lane:
+    """Per-client FIFO queues of waiters, served in weighted round-robin."""
+
+    def __init__(self):
+        # client -> deque of futures; the order is the round-robin order
+        self.queues = OrderedDict()
+        # Slots the client at the front may still take in its current turn
+        self.turn_left = 0
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def push(self, client, waiter):
+        self.queues.setdefault(client, deque()).append(waiter)
+
+    def pop(self, weight_of):
+        while self.queues:
+            client, queue = next(iter(self.queues.items()))
+            if self.turn_left <= 0:
+                self.turn_left = weight_of(client)
+            waiter = queue.popleft()
+            self.turn_left -= 1
+            if not queue:
+                del self.queues[client]
+                self.turn_left = 0
+            elif self.turn_left <= 0:
+                self.queues.move_to_end(client)
+            if not waiter.done():
+                return waiter
+        return None
+
+    def remove(self, client, waiter):
+        queue = self.queues.get(client)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            is_front = next(iter(self.queues)) == client
+            del self.queues[client]
+            if is_front:
+                self.turn_left = 0
+
+
+class FairScheduler:
+    """``slots`` concurrent slots, granted priority lane first, then round-robin per client."""
+
+    def __init__(self, slots, weights=None):
+        self.slots = slots
+        self.weights = dict(weights or {})
+        self._free = slots
+        self._priority = _Lane()
+        self._normal = _Lane()
+        self.granted = {"priority": 0, "normal": 0}
+
+    def _weight(self, client):
+        return self.weights.get(client, 1)
+
+    @property
+    def waiting(self):
+        return len(self._priority) + len(self._normal)
+
+    async def acquire(self, client, priority=False):
+        lane = "priority" if priority else "normal"
+        if self._free > 0 and not self.waiting:
+            self._free -= 1
+            self.granted[lane] += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._priority if priority else self._normal
+        queue.push(client, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation arrived; pass the slot on
+                self.release()
+            else:
+                queue.remove(client, waiter)
+            raise
+        self.granted[lane] += 1
+
+    def release(self):
+        for lane in (self._priority, self._normal):
+            waiter = lane.pop(self._weight)
+            if waiter is not None:
+                # The slot goes straight to the next waiter
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    def queue_depths(self):
+        """client -> files waiting for a slot, over both lanes."""
+        depths = {}
+        for lane in (self._priority, self._normal):
+            for client, queue in lane.queues.items():
+                depths[client] = depths.get(client, 0) + len(queue)
+        return depths
+
+    def stats(self):
+        return {
+            "priority_waiting": len(self._priority),
+            "normal_waiting": len(self._normal),
+            "granted": dict(self.granted),
+            "clients_waiting": len(self.queue_depths()),
+        }
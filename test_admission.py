@@ -0,0 +1,88 @@
+"""Client attribution and rate limiting of admission.AdmissionMiddleware."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from admission import AdmissionMiddleware, RateLimiter, client_id, parse_client_tokens, parse_trusted_proxies
+from scheduler import current_client
+
+# TestClient's peer address
+PEER = "testclient"
+
+
+def scope(peer=PEER, **headers):
+    return {
+        "client": (peer, 50000),
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    }
+
+
+@pytest.mark.parametrize("trusted, forwarded, expected", [
+    # Not configured: the header is ignored
+    ("", "1.2.3.4", PEER),
+    # Peer is not one of the trusted proxies
+    ("10.0.0.1", "1.2.3.4", PEER),
+    # First address from the right not added by a trusted proxy
+    (PEER, "6.6.6.6, 1.2.3.4", "1.2.3.4"),
+    (f"{PEER},10.0.0.2", "6.6.6.6, 1.2.3.4, 10.0.0.2", "1.2.3.4"),
+    # Every hop trusted: the peer, never the left-most (client written) address
+    (f"{PEER},10.0.0.2", "10.0.0.2", PEER),
+    # "*": only the address the single trusted proxy appended
+    ("*", "6.6.6.6, 1.2.3.4", "1.2.3.4"),
+    ("*", "1.2.3.4", "1.2.3.4"),
+    ("*", "", PEER),
+])
+def test_client_id_forwarded_for(trusted, forwarded, expected):
+    assert client_id(scope(x_forwarded_for=forwarded), parse_trusted_proxies(trusted)) == expected
+
+
+def test_client_id_needs_token():
+    tokens = parse_client_tokens("alice:s3cret,bob:t0ken")
+    assert client_id(scope(x_client_id="alice", x_client_token="s3cret"), client_tokens=tokens) == "alice"
+    assert client_id(scope(x_client_id="alice", x_client_token="t0ken"), client_tokens=tokens) == PEER
+    assert client_id(scope(x_client_id="eve", x_client_token="s3cret"), client_tokens=tokens) == PEER
+    assert client_id(scope(x_client_id="alice"), client_tokens=tokens) == PEER
+    # Without CLIENT_TOKENS the header is never honoured
+    assert client_id(scope(x_client_id="alice", x_client_token="s3cret")) == PEER
+
+
+def make_client(trusted):
+    app = FastAPI()
+
+    @app.post("/extract")
+    async def extract():
+        return {"client": current_client.get()[0]}
+
+    app.add_middleware(
+        AdmissionMiddleware,
+        limiter=RateLimiter(per_minute=1, burst=2),
+        trusted_proxies=parse_trusted_proxies(trusted),
+    )
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("trusted, appended, expected", [
+    ("", None, PEER),
+    (f"{PEER},10.0.0.2", "1.2.3.4, 10.0.0.2", "1.2.3.4"),
+    ("*", "1.2.3.4", "1.2.3.4"),
+])
+def test_rotating_forwarded_for_is_still_limited(trusted, appended, expected):
+    client = make_client(trusted)
+    statuses = []
+    for attempt in range(4):
+        # A fresh spoofed address every request, in front of what the proxies appended
+        forwarded = f"203.0.113.{attempt}" + (f", {appended}" if appended else "")
+        response = client.post("/extract", headers={"X-Forwarded-For": forwarded})
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            assert response.json() == {"client": expected}
+        else:
+            assert int(response.headers["Retry-After"]) > 0
+    assert statuses == [200, 200, 429, 429]
+
+
+def test_separate_clients_get_separate_buckets():
+    client = make_client("*")
+    for address in ("1.2.3.4", "5.6.7.8"):
+        statuses = [client.post("/extract", headers={"X-Forwarded-For": address}).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
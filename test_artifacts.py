@@ -0,0 +1,107 @@
+"""ArtifactStore: TTL expiry, the LRU disk quota and per-batch keys."""
+import os
+
+import pytest
+
+from artifacts import ArtifactExistsError, ArtifactStore, artifact_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"), ttl_seconds=60, max_bytes=300)
+
+
+def write(store, filename, size=100):
+    batch = store.new_dir()
+    path = os.path.join(batch, filename)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return artifact_key(batch, filename), path
+
+
+def test_artifact_key_is_unique_per_batch(store):
+    first, _ = write(store, "result.xlsx")
+    second, _ = write(store, "result.xlsx")
+    assert first != second
+    assert first.endswith("/result.xlsx")
+    assert artifact_key("/tmp/artifacts/abc/", "a.zip") == "abc/a.zip"
+
+
+def test_taken_key_refuses_another_file(store):
+    name, path = write(store, "result.xlsx")
+    store.add(name, path)
+    # The same file again only refreshes it
+    store.add(name, path)
+    _, other = write(store, "result.xlsx")
+    with pytest.raises(ArtifactExistsError):
+        store.add(name, other)
+    assert store.get(name).path == path
+    assert store.stats()["bytes"] == 100
+
+
+def test_expired_artifact_is_gone_with_its_directory(store):
+    name, path = write(store, "result.xlsx")
+    store.add(name, path, ttl=0)
+    assert store.get(name) is None
+    assert not os.path.exists(os.path.dirname(path))
+    assert store.stats()["expired"] == 1
+
+
+def test_sweep_drops_only_expired_artifacts(store):
+    old, old_path = write(store, "old.zip")
+    fresh, fresh_path = write(store, "fresh.zip")
+    store.add(old, old_path, ttl=0)
+    store.add(fresh, fresh_path)
+    assert store.sweep() == 1
+    assert old not in store and not os.path.exists(old_path)
+    assert fresh in store
+
+
+def test_quota_evicts_least_recently_used(store):
+    names = []
+    for index in range(3):
+        name, path = write(store, f"{index}.xlsx")
+        store.add(name, path)
+        names.append(name)
+    # Touch the oldest so the second one is evicted instead
+    store.get(names[0])
+    name, path = write(store, "3.xlsx")
+    store.add(name, path)
+    assert [n in store for n in names] == [True, False, True]
+    assert name in store
+    assert store.stats()["bytes"] == 300
+    assert store.stats()["evicted"] == 1
+
+
+def test_oversized_artifact_is_kept_until_something_else_arrives(store):
+    small, small_path = write(store, "small.xlsx")
+    store.add(small, small_path)
+    big, big_path = write(store, "big.zip", size=500)
+    store.add(big, big_path)
+    # Never evicts the artifact just added, only the others
+    assert big in store and small not in store
+    assert os.path.exists(big_path)
+
+
+def test_reserved_bytes_count_against_the_quota(store):
+    name, path = write(store, "result.xlsx")
+    store.add(name, path)
+    store.reserve("export-1", 250)
+    assert name not in store
+    assert store.stats()["reserved_bytes"] == 250
+    # Reserving again replaces the earlier amount, it does not add up
+    store.reserve("export-1", 200)
+    assert store.stats()["reserved_bytes"] == 200
+    store.release("export-1")
+    name, path = write(store, "again.xlsx")
+    store.add(name, path)
+    assert (store.stats()["bytes"], store.stats()["reserved_bytes"]) == (100, 0)
+
+
+def test_clear_orphans_keeps_registered_batches(store):
+    name, path = write(store, "kept.xlsx")
+    store.add(name, path)
+    _, orphan = write(store, "orphan.xlsx")
+    store.clear_orphans()
+    assert os.path.exists(path)
+    assert not os.path.exists(os.path.dirname(orphan))
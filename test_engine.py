@@ -0,0 +1,156 @@
+"""ExtractionEngine: slot and queue limits, result cache and in-flight deduplication."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import engine as engine_module
+from engine import EngineBusyError, ExtractionEngine
+from result_cache import ResultCache
+
+
+def make_engine(**kwargs):
+    # workers=0: the default thread executor, so test doubles need no pickling
+    return ExtractionEngine(workers=0, **kwargs)
+
+
+class FakeExtractor:
+    """Stands in for extractors.extract_document; blocks until ``release`` is set."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.result = result if result is not None else {"Name": "JOHN"}
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self, source, document_type, backends, scanned_error):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return dict(self.result)
+
+
+@pytest.fixture
+def extractor(monkeypatch):
+    fake = FakeExtractor()
+    monkeypatch.setattr(engine_module, "extract_document", fake)
+    return fake
+
+
+async def wait_for(event):
+    assert await asyncio.to_thread(event.wait, 5)
+
+
+def test_run_never_exceeds_max_in_flight():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+
+    async def main():
+        engine = make_engine(max_in_flight=2)
+        engine.start()
+        await asyncio.gather(*[engine.run(work) for _ in range(8)])
+        assert engine.stats()["running"] == 0
+
+    asyncio.run(main())
+    assert max(peak) == 2
+
+
+def test_full_queue_raises_engine_busy():
+    release = threading.Event()
+
+    async def main():
+        engine = make_engine(max_in_flight=1, max_queue=2)
+        engine.start()
+        running = asyncio.ensure_future(engine.run(release.wait, 5))
+        waiting = [asyncio.ensure_future(engine.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert engine.stats()["waiting"] == 2
+        with pytest.raises(EngineBusyError):
+            await engine.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(running, *waiting)
+        # Room again once the queue drained
+        assert await engine.run(lambda: "ok") == "ok"
+
+    asyncio.run(main())
+
+
+def test_same_content_is_extracted_once_and_then_cached(extractor):
+    async def main():
+        engine = make_engine(cache=ResultCache())
+        engine.start()
+        first = asyncio.ensure_future(engine.extract(b"%PDF same", "ITAS"))
+        await wait_for(extractor.started)
+        second = asyncio.ensure_future(engine.extract(b"%PDF same", "ITAS"))
+        await asyncio.sleep(0.05)
+        extractor.release.set()
+        a, b = await asyncio.gather(first, second)
+        assert a == b == {"Name": "JOHN"}
+        # Every caller gets its own copy to mutate
+        assert a is not b
+
+        assert await engine.extract(b"%PDF same", "ITAS") == {"Name": "JOHN"}
+        # Another document type is another cache entry
+        await engine.extract(b"%PDF same", "SKTT")
+        assert engine._in_progress == {}
+
+    asyncio.run(main())
+    assert extractor.calls == 2
+
+
+def test_cancelled_extraction_is_taken_over_by_a_waiting_caller(extractor):
+    async def main():
+        engine = make_engine(cache=ResultCache())
+        engine.start()
+        leader = asyncio.ensure_future(engine.extract(b"%PDF shared", "ITAS"))
+        await wait_for(extractor.started)
+        follower = asyncio.ensure_future(engine.extract(b"%PDF shared", "ITAS"))
+        await asyncio.sleep(0.05)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await asyncio.sleep(0.05)
+        extractor.release.set()
+        assert await follower == {"Name": "JOHN"}
+        assert engine._in_progress == {}
+
+    asyncio.run(main())
+    # The follower ran the extraction itself
+    assert extractor.calls == 2
+
+
+def test_failure_reaches_every_caller_and_is_not_cached(extractor):
+    extractor.error = ValueError("broken PDF")
+
+    async def main():
+        engine = make_engine(cache=ResultCache())
+        engine.start()
+        first = asyncio.ensure_future(engine.extract(b"%PDF bad", "ITAS"))
+        await wait_for(extractor.started)
+        second = asyncio.ensure_future(engine.extract(b"%PDF bad", "ITAS"))
+        await asyncio.sleep(0.05)
+        extractor.release.set()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+        extractor.error = None
+        assert await engine.extract(b"%PDF bad", "ITAS") == {"Name": "JOHN"}
+
+    asyncio.run(main())
+    assert extractor.calls == 2
@@ -0,0 +1,150 @@
+"""JobManager: resuming after a restart, retries, per-job file concurrency and expiry."""
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from jobs import JobManager, JobNotFoundError
+
+
+class Busy(Exception):
+    pass
+
+
+def finalize(job, entries):
+    return {"files": [filename for filename, _, _ in entries]}
+
+
+def make_manager(root, process_file, **kwargs):
+    return JobManager(str(root), process_file, finalize, retry_delay=0.01, **kwargs)
+
+
+def spool(tmp_path, names):
+    files = []
+    for name in names:
+        path = tmp_path / f"upload-{name}"
+        path.write_bytes(b"%PDF " + name.encode())
+        files.append((name, str(path)))
+    return files
+
+
+async def finished(manager, job_id):
+    for _ in range(500):
+        status = await asyncio.to_thread(manager.status, job_id)
+        if status["status"] in ("completed", "failed"):
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_runs_and_records_failed_files(tmp_path):
+    async def process(path, document_type, filename):
+        if filename == "bad.pdf":
+            raise ValueError("broken PDF")
+        return {"Name": filename}
+
+    async def main():
+        manager = make_manager(tmp_path / "jobs", process)
+        await manager.start()
+        job_id = await asyncio.to_thread(manager.submit, "ITAS", {}, spool(tmp_path, ["a.pdf", "bad.pdf", "b.pdf"]))
+        status = await finished(manager, job_id)
+        result = manager.result(job_id)
+        await manager.stop()
+        return status, result
+
+    status, result = asyncio.run(main())
+    assert (status["status"], status["files_done"], status["files_failed"]) == ("completed", 2, 1)
+    assert result == {"files": ["a.pdf", "b.pdf"], "failed_files": [{"filename": "bad.pdf", "error": "broken PDF"}]}
+
+
+def test_unfinished_job_resumes_after_a_restart(tmp_path):
+    processed = []
+
+    async def process(path, document_type, filename):
+        processed.append(filename)
+        return {"Name": filename}
+
+    # Submitted and half done by a process that then went away
+    before = make_manager(tmp_path / "jobs", process)
+    job_id = before.submit("ITAS", {}, spool(tmp_path, ["a.pdf", "b.pdf"]))
+    before.store.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id))
+    before.store.execute(
+        "UPDATE job_files SET status = 'done', data = ? WHERE job_id = ? AND idx = 0",
+        (json.dumps({"Name": "a.pdf"}), job_id),
+    )
+
+    async def main():
+        manager = make_manager(tmp_path / "jobs", process)
+        await manager.start()
+        status = await finished(manager, job_id)
+        await manager.stop()
+        return status
+
+    assert asyncio.run(main())["files_done"] == 2
+    assert processed == ["b.pdf"]
+
+
+def test_busy_engine_is_retried_not_failed(tmp_path):
+    attempts = []
+
+    async def process(path, document_type, filename):
+        attempts.append(filename)
+        if len(attempts) < 3:
+            raise Busy()
+        return {"Name": filename}
+
+    async def main():
+        manager = make_manager(tmp_path / "jobs", process, retry_exceptions=(Busy,))
+        await manager.start()
+        job_id = await asyncio.to_thread(manager.submit, "ITAS", {}, spool(tmp_path, ["a.pdf"]))
+        status = await finished(manager, job_id)
+        await manager.stop()
+        return status, manager.stats()["retries"]
+
+    status, retries = asyncio.run(main())
+    assert (status["files_done"], status["files_failed"], retries) == (1, 0, 2)
+
+
+def test_file_concurrency_caps_files_in_flight(tmp_path):
+    running = []
+    peak = []
+
+    async def process(path, document_type, filename):
+        running.append(filename)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(filename)
+        return {}
+
+    async def main():
+        manager = make_manager(tmp_path / "jobs", process, file_concurrency=2)
+        await manager.start()
+        names = [f"{index}.pdf" for index in range(6)]
+        job_id = await asyncio.to_thread(manager.submit, "ITAS", {}, spool(tmp_path, names))
+        await finished(manager, job_id)
+        await manager.stop()
+
+    asyncio.run(main())
+    assert max(peak) == 2
+
+
+def test_sweep_removes_expired_jobs_with_their_directory(tmp_path):
+    async def process(path, document_type, filename):
+        return {}
+
+    async def main():
+        manager = make_manager(tmp_path / "jobs", process, ttl_seconds=0)
+        await manager.start()
+        job_id = await asyncio.to_thread(manager.submit, "ITAS", {}, spool(tmp_path, ["a.pdf"]))
+        await finished(manager, job_id)
+        await manager.stop()
+        return manager, job_id
+
+    manager, job_id = asyncio.run(main())
+    assert manager.sweep() == 1
+    assert not os.path.exists(manager.job_dir(job_id))
+    with pytest.raises(JobNotFoundError):
+        manager.status(job_id)
+    assert manager.stats()["expired"] == 1
@@ -0,0 +1,79 @@
+"""RecordStore: normalized identifiers, name search and refreshing a seen file."""
+from types import SimpleNamespace
+
+import pytest
+
+import records
+from records import RecordStore, normalize_identifier, normalize_name
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RecordStore(str(tmp_path / "records.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def filled(store, monkeypatch):
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(records, "time", SimpleNamespace(time=lambda: next(clock)))
+    store.add("d1", "ITAS", {"Name": "John O'Brien Smith", "Passport Number": "a 123-456", "Permit Number": "2C11"})
+    store.add("d2", "SKTT", {"Name": "MARIA SILVA", "NIK": "5171 0000", "KITAS/KITAP": "2c11"})
+    store.add("d3", "DKPTKA", {"Nama TKA": "Silvano Rossi", "Nomor Paspor": "YB999"})
+    return store
+
+
+def names(found):
+    return [record["digest"] for record in found]
+
+
+def test_normalization():
+    assert normalize_name("  John  o'Brien-smith ") == "JOHN O BRIEN SMITH"
+    assert normalize_name("--") is None
+    assert normalize_identifier("a 123-456") == "A123456"
+
+
+def test_identifiers_match_without_case_or_punctuation(filled):
+    assert names(filled.search(passport="A123456")) == ["d1"]
+    assert names(filled.search(passport="yb-999")) == ["d3"]
+    assert names(filled.search(nik="51710000")) == ["d2"]
+    # "Permit Number" and "KITAS/KITAP" share a column; most recently seen first
+    assert names(filled.search(kitas="2C11")) == ["d2", "d1"]
+    assert names(filled.search(kitas="2C11", document_type="ITAS")) == ["d1"]
+
+
+def test_name_words_in_any_order_and_a_last_word_prefix(filled):
+    assert names(filled.search(name="smith john")) == ["d1"]
+    assert names(filled.search(name="obrien")) == []
+    assert names(filled.search(name="sil")) == ["d3", "d2"]
+    assert names(filled.search(name="maria sil")) == ["d2"]
+    assert names(filled.search(name="rossi")) == ["d3"]
+    assert names(filled.search(name="rossi", passport="A123456")) == []
+
+
+def test_search_needs_a_criterion(filled):
+    with pytest.raises(ValueError):
+        filled.search(document_type="ITAS")
+    assert len(filled.search(name="s", limit=0)) == 1
+
+
+def test_same_file_again_refreshes_the_record(filled):
+    filled.add("d1", "ITAS", {"Name": "John Smith Junior", "Passport Number": "A123456"}, filename="new.pdf")
+    [record] = filled.by_digest("d1")
+    assert (record["times_seen"], record["filename"]) == (2, "new.pdf")
+    assert record["first_seen"] < record["last_seen"]
+    # The old name tokens are gone with the old name
+    assert names(filled.search(name="obrien")) == []
+    assert names(filled.search(name="junior")) == ["d1"]
+    assert filled.stats()["records"] == 3
+
+
+def test_searches_use_the_indexes(filled):
+    for sql, params in (
+        ("SELECT * FROM records WHERE passport = ?", ("A123456",)),
+        ("SELECT * FROM records WHERE id IN (SELECT record_id FROM record_name_tokens "
+         "WHERE token >= ? AND token < ?)", ("SIL", "SIM")),
+    ):
+        plan = " ".join(row[3] for row in filled._db.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert "SCAN records" not in plan
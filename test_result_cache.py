@@ -0,0 +1,124 @@
+"""Result cache keys (extractor version, text backend) and the two LRU tiers."""
+import asyncio
+import hashlib
+
+import pytest
+
+import extractors
+import result_cache
+from result_cache import ResultCache, cache_key, digest_key, file_cache_key
+
+
+@pytest.fixture
+def text_backend(monkeypatch):
+    """Set TEXT_BACKEND for the keys computed afterwards."""
+    def use(setting):
+        monkeypatch.setenv("TEXT_BACKEND", setting)
+        monkeypatch.setattr(result_cache, "_backends_key", None)
+    return use
+
+
+def test_key_depends_on_content_and_document_type():
+    assert cache_key(b"a", "ITAS") == cache_key(b"a", "ITAS")
+    assert cache_key(b"a", "ITAS") != cache_key(b"b", "ITAS")
+    assert cache_key(b"a", "ITAS") != cache_key(b"a", "SKTT")
+    assert cache_key(b"a", "ITAS").startswith(hashlib.sha256(b"a").hexdigest() + ":ITAS:")
+
+
+def test_file_key_matches_content_key(tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"%PDF-1.4 content")
+    assert file_cache_key(str(path), "EVLN") == cache_key(b"%PDF-1.4 content", "EVLN")
+
+
+def test_extractor_version_bump_invalidates(monkeypatch):
+    before = digest_key("d", "ITAS")
+    auto_before = digest_key("d", extractors.AUTO_DETECT)
+    sktt_before = digest_key("d", "SKTT")
+    monkeypatch.setitem(extractors.EXTRACTOR_VERSIONS, "ITAS", extractors.EXTRACTOR_VERSIONS["ITAS"] + 1)
+    assert digest_key("d", "ITAS") != before
+    # Auto-detected results depend on every extractor
+    assert digest_key("d", extractors.AUTO_DETECT) != auto_before
+    assert digest_key("d", "SKTT") == sktt_before
+
+
+def test_classifier_version_bump_invalidates_auto_detect(monkeypatch):
+    before = digest_key("d", extractors.AUTO_DETECT)
+    monkeypatch.setattr(extractors, "CLASSIFIER_VERSION", extractors.CLASSIFIER_VERSION + 1)
+    assert digest_key("d", extractors.AUTO_DETECT) != before
+
+
+def test_text_backend_switch_invalidates(text_backend):
+    text_backend("pdfplumber")
+    pdfplumber_key = digest_key("d", "ITAS")
+    assert pdfplumber_key.endswith(":pdfplumber")
+    text_backend("auto")
+    assert digest_key("d", "ITAS") != pdfplumber_key
+
+
+def test_get_returns_a_fresh_copy():
+    cache = ResultCache()
+    cache.put("k", {"Name": "JOHN"})
+    cache.get("k")["Name"] = "changed"
+    assert cache.get("k") == {"Name": "JOHN"}
+
+
+def test_memory_tier_evicts_least_recently_used():
+    value = {"v": "x" * 40}
+    size = len(result_cache.json.dumps(value))
+    cache = ResultCache(max_bytes=size * 2)
+    cache.put("a", value)
+    cache.put("b", value)
+    cache.get("a")
+    cache.put("c", value)
+    assert cache.get("b") is None
+    assert cache.get("a") == value and cache.get("c") == value
+    assert cache.stats()["evictions"] == 1
+    # Larger than the whole tier: not kept at all
+    cache.put("huge", {"v": "x" * size * 3})
+    assert cache.get("huge") is None
+    assert cache.get("a") == value
+
+
+def test_disk_tier_survives_a_restart_and_keeps_its_quota(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    value = {"v": "x" * 40}
+    size = len(result_cache.json.dumps(value))
+    cache = ResultCache(max_bytes=0, path=path, disk_max_bytes=size * 3)
+    for index in range(5):
+        cache.put(f"k{index}", value)
+    # Replacing an entry counts its new size only once
+    cache.put("k4", {"v": "y" * 40})
+
+    def disk_total(cache):
+        return cache._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    assert cache.stats()["disk_bytes"] == disk_total(cache) <= size * 3
+    assert cache.get("k0") is None
+    assert cache.get("k4") == {"v": "y" * 40}
+
+    reopened = ResultCache(path=path, disk_max_bytes=size * 3)
+    assert reopened.stats()["disk_bytes"] == disk_total(reopened)
+    assert reopened.get("k3") == value
+    assert reopened.stats()["disk_hits"] == 1
+    # Served from memory after the disk hit
+    assert reopened.get("k3") == value
+    assert reopened.stats()["hits"] == 1
+
+
+def test_async_access_reaches_both_tiers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def main():
+        cache = ResultCache(path=path)
+        assert await cache.get_async("k") is None
+        await cache.put_async("k", {"Name": "JOHN"})
+        assert await cache.get_async("k") == {"Name": "JOHN"}
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+        reopened = ResultCache(path=path)
+        assert await reopened.get_async("k") == {"Name": "JOHN"}
+        assert reopened.stats()["disk_hits"] == 1
+
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""FairScheduler: priority lane, weighted round-robin between clients, cancellation."""
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, parse_weights
+
+
+async def grant_order(scheduler, requests):
+    """Queue ``requests`` (client, priority) behind a held slot, then release one slot at a time."""
+    order = []
+    await scheduler.acquire("holder")
+
+    async def wait(name, client, priority):
+        await scheduler.acquire(client, priority)
+        order.append(name)
+
+    tasks = []
+    for name, client, priority in requests:
+        tasks.append(asyncio.ensure_future(wait(name, client, priority)))
+        # Queue them in this exact order
+        await asyncio.sleep(0)
+    for _ in requests:
+        scheduler.release()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_round_robin_between_clients():
+    requests = [("a1", "a", False), ("a2", "a", False), ("a3", "a", False), ("b1", "b", False), ("c1", "c", False)]
+    order = asyncio.run(grant_order(FairScheduler(1), requests))
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_weights_give_more_slots_per_turn():
+    requests = [("a1", "a", False), ("a2", "a", False), ("a3", "a", False), ("b1", "b", False), ("b2", "b", False)]
+    order = asyncio.run(grant_order(FairScheduler(1, parse_weights("a=2")), requests))
+    assert order == ["a1", "a2", "b1", "a3", "b2"]
+
+
+def test_priority_lane_is_served_first():
+    requests = [("big1", "a", False), ("big2", "a", False), ("small", "b", True)]
+    order = asyncio.run(grant_order(FairScheduler(1), requests))
+    assert order == ["small", "big1", "big2"]
+
+
+def test_parse_weights():
+    assert parse_weights("alice=3, bob=0,,broken") == {"alice": 3, "bob": 1}
+    assert parse_weights(None) == {}
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        scheduler = FairScheduler(1)
+        await scheduler.acquire("holder")
+        waiter = asyncio.ensure_future(scheduler.acquire("a"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depths() == {"a": 1}
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.queue_depths() == {}
+        scheduler.release()
+        # The slot is free again, not lost to the cancelled waiter
+        await asyncio.wait_for(scheduler.acquire("b"), 1)
+
+    asyncio.run(main())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_passed_on():
+    async def main():
+        scheduler = FairScheduler(1)
+        await scheduler.acquire("holder")
+        first = asyncio.ensure_future(scheduler.acquire("a"))
+        second = asyncio.ensure_future(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        # Grant the slot to the first waiter and cancel it before it runs
+        scheduler.release()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 1)
+        assert scheduler.stats()["normal_waiting"] == 0
+
+    asyncio.run(main())
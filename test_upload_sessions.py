@@ -0,0 +1,114 @@
+"""Resumable uploads: offsets, resuming after a cut-off body, checksums and expiry."""
+import asyncio
+import hashlib
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from upload_sessions import ChecksumMismatchError, OffsetMismatchError, UploadSessionStore
+
+PDF = b"%PDF-1.4 " + b"x" * 91
+
+
+async def body(*chunks, fail=False):
+    for chunk in chunks:
+        yield chunk
+    if fail:
+        raise ConnectionError("client went away")
+
+
+@pytest.fixture
+def completed():
+    return []
+
+
+@pytest.fixture
+def store(tmp_path, completed):
+    return UploadSessionStore(str(tmp_path / "sessions"), lambda session, file: completed.append(file.index))
+
+
+def test_chunks_append_at_the_current_offset(store, completed):
+    session = store.create("ITAS", [("a.pdf", len(PDF), None)])
+
+    async def upload():
+        file = await store.write_chunk(session, 0, 0, body(PDF[:40]))
+        assert (file.offset, file.complete) == (40, False)
+        with pytest.raises(OffsetMismatchError) as error:
+            await store.write_chunk(session, 0, 10, body(PDF[10:]))
+        assert error.value.expected == 40
+        file = await store.write_chunk(session, 0, 40, body(PDF[40:60], PDF[60:]))
+        assert file.complete and file.digest == hashlib.sha256(PDF).hexdigest()
+        # Nothing more is taken once the file is complete
+        with pytest.raises(OffsetMismatchError):
+            await store.write_chunk(session, 0, len(PDF), body(b"x"))
+
+    asyncio.run(upload())
+    assert completed == [0]
+    assert open(session.files[0].path, "rb").read() == PDF
+
+
+def test_bytes_of_a_cut_off_body_are_kept(store):
+    session = store.create("ITAS", [("a.pdf", len(PDF), None)])
+
+    async def upload():
+        with pytest.raises(ConnectionError):
+            await store.write_chunk(session, 0, 0, body(PDF[:30], fail=True))
+        assert store.get(session.id).status()["bytes_received"] == 30
+        await store.write_chunk(session, 0, 30, body(PDF[30:]))
+
+    asyncio.run(upload())
+    assert session.files[0].complete
+
+
+def test_chunk_past_the_declared_size_is_refused(store):
+    session = store.create("ITAS", [("a.pdf", 10, None)])
+    with pytest.raises(ValueError):
+        asyncio.run(store.write_chunk(session, 0, 0, body(b"x" * 11)))
+    with pytest.raises(ValueError):
+        asyncio.run(store.write_chunk(session, 1, 0, body(b"x")))
+
+
+def test_checksum_mismatch_resets_the_file(store, completed):
+    session = store.create("ITAS", [("a.pdf", len(PDF), hashlib.sha256(b"other").hexdigest())])
+    with pytest.raises(ChecksumMismatchError):
+        asyncio.run(store.write_chunk(session, 0, 0, body(PDF)))
+    file = session.files[0]
+    assert (file.offset, file.complete, completed) == (0, False, [])
+    assert open(file.path, "rb").read() == b""
+
+
+def test_sessions_survive_a_restart(store):
+    session = store.create("ITAS", [("a.pdf", len(PDF), None), ("b.pdf", len(PDF), None)])
+
+    async def upload():
+        await store.write_chunk(session, 0, 0, body(PDF))
+        await store.write_chunk(session, 1, 0, body(PDF[:50]))
+
+    asyncio.run(upload())
+    completed = []
+    reloaded = UploadSessionStore(store.root_dir, lambda session, file: completed.append(file.index))
+    reloaded._load()
+    offsets = [(file["offset"], file["complete"]) for file in reloaded.get(session.id).status()["files"]]
+    assert offsets == [(len(PDF), True), (50, False)]
+    assert completed == [0]
+
+
+def test_sweep_drops_idle_sessions(store):
+    store.create("ITAS", [("a.pdf", len(PDF), None)])
+    store.ttl_seconds = 0
+    assert store.sweep() == 1
+    assert store.stats()["sessions"] == 0
+
+
+def test_put_at_the_wrong_offset_answers_409(store, monkeypatch):
+    monkeypatch.setattr(main, "upload_sessions", store)
+    client = TestClient(main.app)
+    created = client.post("/uploads", json={"files": [{"filename": "a.pdf", "size": len(PDF)}]}).json()
+    url = f"/uploads/{created['upload_id']}/files/0"
+
+    assert client.put(url, params={"offset": 0}, content=PDF[:40]).json()["offset"] == 40
+    response = client.put(url, params={"offset": 0}, content=PDF[:40])
+    assert response.status_code == 409
+    assert response.json()["offset"] == 40
+    assert client.get(f"/uploads/{created['upload_id']}").json()["bytes_received"] == 40
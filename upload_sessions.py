@@ -0,0 +1,311 @@
+"""Resumable, chunked uploads for large batches.
+
+A client creates an upload session listing its files (name, size and
+optionally sha256), PUTs every file's bytes in chunks at explicit offsets,
+then finalizes the session. Every byte that reached the server is kept:
+after a dropped connection the client asks the session for its offsets and
+carries on from there instead of sending the whole batch again. Each file
+is handed to ``on_file_complete`` as soon as its last byte arrives, so
+files are extracted while the rest of the batch is still uploading.
+
+A session is a directory holding the partial files and a session.json; the
+offsets are the partial files' sizes, so sessions survive a restart.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from metrics import UPLOAD_BYTES_TOTAL
+from result_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# Chunk bodies are written in pieces of up to this size
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+
+class UploadSessionNotFoundError(Exception):
+    """Raised for an unknown or expired upload session."""
+
+
+class OffsetMismatchError(Exception):
+    """A chunk was sent for another offset than where the file currently ends."""
+
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}")
+        self.expected = expected
+
+
+class ChecksumMismatchError(Exception):
+    """A completed file's sha256 differs from the one declared; the file was reset to offset 0."""
+
+
+class UploadedFile:
+    def __init__(self, index, filename, size, path, sha256=None, digest=None):
+        self.index = index
+        self.filename = filename
+        self.size = size
+        self.path = path
+        self.sha256 = sha256
+        # sha256 of the received file, set once it is complete and verified
+        self.digest = digest
+        self.offset = os.path.getsize(path) if os.path.exists(path) else 0
+        # Set by on_file_complete, e.g. the extraction task
+        self.extraction = None
+        self._lock = None
+
+    @property
+    def lock(self):
+        """Serializes the file's chunks; created on the event loop on first use.
+
+        Sessions are created in a thread, where Python 3.9 can't create an
+        asyncio.Lock (there is no event loop there).
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def complete(self):
+        return self.digest is not None
+
+    def to_dict(self):
+        return {"filename": self.filename, "size": self.size, "sha256": self.sha256, "digest": self.digest}
+
+
+class UploadSession:
+    def __init__(self, session_id, directory, document_type, files, created_at):
+        self.id = session_id
+        self.directory = directory
+        self.document_type = document_type
+        self.files = files
+        self.created_at = created_at
+        self.last_activity = time.time()
+        self.finalizing = False
+
+    @property
+    def state_path(self):
+        return os.path.join(self.directory, "session.json")
+
+    def save(self):
+        state = {
+            "id": self.id,
+            "document_type": self.document_type,
+            "created_at": self.created_at,
+            "files": [file.to_dict() for file in self.files],
+        }
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def status(self):
+        received = sum(file.offset for file in self.files)
+        total = sum(file.size for file in self.files)
+        return {
+            "upload_id": self.id,
+            "document_type": self.document_type,
+            "total_files": len(self.files),
+            "files_complete": sum(1 for file in self.files if file.complete),
+            "bytes_received": received,
+            "total_bytes": total,
+            "files": [
+                {
+                    "index": file.index,
+                    "filename": file.filename,
+                    "size": file.size,
+                    "offset": file.offset,
+                    "complete": file.complete,
+                }
+                for file in self.files
+            ],
+        }
+
+
+class UploadSessionStore:
+    """Upload sessions under ``root_dir``, dropped after ``ttl_seconds`` without activity.
+
+    ``on_file_complete(session, file)`` is called on the event loop for every
+    file whose last byte arrived (and, after a restart, for every file that
+    was already complete). A background task sweeps expired sessions every
+    ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, root_dir, on_file_complete, ttl_seconds=86400, max_file_bytes=None, sweep_interval=60):
+        self.root_dir = root_dir
+        self.on_file_complete = on_file_complete
+        self.ttl_seconds = ttl_seconds
+        self.max_file_bytes = max_file_bytes
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self.expired = 0
+
+    def start(self):
+        """Load the sessions left by a previous process and start sweeping."""
+        self._load()
+        self._sweeper = asyncio.ensure_future(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def _load(self):
+        if not os.path.isdir(self.root_dir):
+            return
+        for entry in os.listdir(self.root_dir):
+            directory = os.path.join(self.root_dir, entry)
+            try:
+                with open(os.path.join(directory, "session.json"), encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            files = [
+                UploadedFile(index, item["filename"], item["size"], self._file_path(directory, index),
+                             item["sha256"], item["digest"])
+                for index, item in enumerate(state["files"])
+            ]
+            session = UploadSession(state["id"], directory, state["document_type"], files, state["created_at"])
+            self._sessions[session.id] = session
+            for file in files:
+                if file.complete:
+                    self.on_file_complete(session, file)
+        logger.info("upload sessions loaded", extra={"sessions": len(self._sessions)})
+
+    @staticmethod
+    def _file_path(directory, index):
+        return os.path.join(directory, f"{index:05d}.pdf")
+
+    def create(self, document_type, files):
+        """New session for (filename, size, sha256 or None) files."""
+        for filename, size, _ in files:
+            if size < 0:
+                raise ValueError(f"Invalid size for {filename}")
+            if self.max_file_bytes and size > self.max_file_bytes:
+                raise ValueError(f"File {filename} exceeds the {self.max_file_bytes} byte upload limit")
+
+        session_id = uuid.uuid4().hex
+        directory = os.path.join(self.root_dir, session_id)
+        os.makedirs(directory)
+        uploaded = []
+        for index, (filename, size, sha256) in enumerate(files):
+            path = self._file_path(directory, index)
+            open(path, "wb").close()
+            uploaded.append(UploadedFile(index, filename, size, path, sha256.lower() if sha256 else None))
+        session = UploadSession(session_id, directory, document_type, uploaded, time.time())
+        session.save()
+        with self._lock:
+            self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.last_activity + self.ttl_seconds <= time.time():
+                raise UploadSessionNotFoundError(session_id)
+            session.last_activity = time.time()
+            return session
+
+    async def write_chunk(self, session, index, offset, chunks):
+        """Append the ``chunks`` async iterator to file ``index`` at ``offset``; returns the file.
+
+        Bytes that arrive are kept even when the body is cut off, so the
+        next chunk can start from wherever this one stopped.
+        """
+        if not 0 <= index < len(session.files):
+            raise ValueError(f"Unknown file index {index}")
+        file = session.files[index]
+        async with file.lock:
+            if offset != file.offset or file.complete:
+                raise OffsetMismatchError(file.offset)
+
+            with open(file.path, "r+b") as f:
+                f.truncate(offset)
+                f.seek(offset)
+                buffer = bytearray()
+                try:
+                    async for chunk in chunks:
+                        if file.offset + len(buffer) + len(chunk) > file.size:
+                            raise ValueError(f"Chunk runs past the declared size of {file.filename}")
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BUFFER_BYTES:
+                            await asyncio.to_thread(f.write, buffer)
+                            file.offset += len(buffer)
+                            UPLOAD_BYTES_TOTAL.inc(len(buffer))
+                            buffer = bytearray()
+                finally:
+                    if buffer:
+                        await asyncio.to_thread(f.write, buffer)
+                        file.offset += len(buffer)
+                        UPLOAD_BYTES_TOTAL.inc(len(buffer))
+            session.last_activity = time.time()
+
+            if file.offset == file.size:
+                digest = await asyncio.to_thread(file_sha256, file.path)
+                if file.sha256 and digest != file.sha256:
+                    await asyncio.to_thread(os.truncate, file.path, 0)
+                    file.offset = 0
+                    raise ChecksumMismatchError(f"sha256 of {file.filename} does not match, upload it again")
+                file.digest = digest
+                await asyncio.to_thread(session.save)
+                self.on_file_complete(session, file)
+        return file
+
+    def remove(self, session):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        shutil.rmtree(session.directory, ignore_errors=True)
+
+    def _expire(self):
+        """Forget the sessions without activity for the TTL and cancel their extractions (on the loop)."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                session for session in self._sessions.values()
+                if session.last_activity + self.ttl_seconds <= now and not session.finalizing
+            ]
+            for session in expired:
+                del self._sessions[session.id]
+            self.expired += len(expired)
+        for session in expired:
+            for file in session.files:
+                if file.extraction is not None:
+                    file.extraction.cancel()
+        return expired
+
+    @staticmethod
+    def _remove_dirs(sessions):
+        for session in sessions:
+            shutil.rmtree(session.directory, ignore_errors=True)
+
+    def sweep(self):
+        """Drop sessions without activity for the TTL; returns how many were removed."""
+        expired = self._expire()
+        self._remove_dirs(expired)
+        return len(expired)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self._remove_dirs, self._expire())
+            except Exception:
+                logger.exception("upload session sweep failed")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "ttl_seconds": self.ttl_seconds,
+                "expired": self.expired,
+                "root_dir": self.root_dir,
+            }
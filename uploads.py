@@ -0,0 +1,384 @@
+"""Spooled, size-limited ingestion of uploaded PDFs.
+
+Multipart bodies are parsed as they arrive (SpoolingRoute) and every file
+part is written straight into a per-request spool directory and hashed on
+the way, instead of Starlette first buffering the part in its own temporary
+file. No endpoint ever holds a whole PDF in memory and no PDF is written
+twice: the extraction workers open the spooled file by path, the result
+cache reuses the digest computed while spooling, and ZIPs are written from
+the spooled files. Request bodies larger than the per-request limit are
+rejected while they arrive (or straight from Content-Length), and a file
+over the per-file limit is rejected as soon as the bytes received for it
+cross the limit, before the rest of it is read.
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.background import BackgroundTasks
+from starlette.datastructures import FormData, Headers, UploadFile
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from metrics import STAGE_SECONDS, UPLOAD_BYTES_TOTAL
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(HTTPException):
+    """413 raised when an upload exceeds a size limit."""
+
+    def __init__(self, detail):
+        super().__init__(status_code=413, detail=detail)
+
+
+class SpooledPdf:
+    """One uploaded file spooled to disk."""
+
+    __slots__ = ("filename", "path", "size", "digest")
+
+    def __init__(self, filename, path, size, digest):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.digest = digest
+
+
+class SpooledUploadFile(UploadFile):
+    """UploadFile whose bytes were streamed into the spool; ``spooled`` is its SpooledPdf."""
+
+    def __init__(self, spooled, headers):
+        super().__init__(open(spooled.path, "rb"), size=spooled.size, filename=spooled.filename, headers=headers)
+        self.spooled = spooled
+
+
+class UploadBatch:
+    """Spooled files of one request; ``close`` removes them all."""
+
+    def __init__(self, spool, path):
+        self.spool = spool
+        self.path = path
+        self.total_bytes = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _next_path(self):
+        with self._lock:
+            path = os.path.join(self.path, f"{self._count:05d}.pdf")
+            self._count += 1
+        return path
+
+    async def add(self, upload):
+        """Spool an UploadFile and return its SpooledPdf.
+
+        A file already streamed into the spool by SpoolingRoute is moved
+        into this batch, not copied.
+        """
+        target = self._next_path()
+        spooled = getattr(upload, "spooled", None)
+        if spooled is not None:
+            await asyncio.to_thread(os.replace, spooled.path, target)
+            return SpooledPdf(spooled.filename, target, spooled.size, spooled.digest)
+
+        await upload.seek(0)
+        with STAGE_SECONDS.time(stage="upload_spool"):
+            size, digest = await asyncio.to_thread(self._copy, upload.file, target, upload.filename)
+        UPLOAD_BYTES_TOTAL.inc(size)
+        return SpooledPdf(upload.filename, target, size, digest)
+
+    async def add_all(self, uploads):
+        return [await self.add(upload) for upload in uploads]
+
+    def _count_bytes(self, count, file_size, filename):
+        """Account ``count`` more bytes of a file now ``file_size`` long; raises past a limit."""
+        max_file_bytes = self.spool.max_file_bytes
+        max_request_bytes = self.spool.max_request_bytes
+        with self._lock:
+            self.total_bytes += count
+            total_bytes = self.total_bytes
+        if max_file_bytes and file_size > max_file_bytes:
+            raise UploadTooLargeError(f"File {filename} exceeds the {max_file_bytes} byte upload limit")
+        if max_request_bytes and total_bytes > max_request_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {max_request_bytes} byte request limit")
+
+    def _copy(self, source, target, filename):
+        digest = hashlib.sha256()
+        size = 0
+        with open(target, "wb") as f:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                self._count_bytes(len(chunk), size, filename)
+                digest.update(chunk)
+                f.write(chunk)
+        return size, digest.hexdigest()
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.to_thread(self.close)
+
+
+class _SpooledPart:
+    __slots__ = ("name", "headers", "filename", "path", "file", "digest", "size", "data")
+
+    def __init__(self):
+        self.name = None
+        self.headers = []
+        self.filename = None
+        self.path = None
+        self.file = None
+        self.digest = None
+        self.size = 0
+        self.data = bytearray()
+
+
+def _decode(value):
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+class MultipartSpooler:
+    """Parse a multipart body from ``stream``, writing file parts straight into ``batch``.
+
+    Size limits are checked on every piece of a file as it is parsed, so an
+    oversized file is rejected (UploadTooLargeError) without reading the
+    rest of the body.
+    """
+
+    def __init__(self, batch, content_type, stream):
+        self.batch = batch
+        self.content_type = content_type
+        self.stream = stream
+        self.items = []
+        self._part = None
+        self._header_name = b""
+        self._header_value = b""
+        self._pending = []
+        self._finished = []
+        self._open = []
+
+    def on_part_begin(self):
+        self._part = _SpooledPart()
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._part.headers.append((self._header_name.lower(), self._header_value))
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        part = self._part
+        disposition = dict(part.headers).get(b"content-disposition", b"")
+        _, options = parse_options_header(disposition)
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail="Multipart part without a name")
+        part.name = _decode(options[b"name"])
+        if b"filename" in options:
+            part.filename = _decode(options[b"filename"])
+            part.path = self.batch._next_path()
+            part.file = open(part.path, "wb")
+            part.digest = hashlib.sha256()
+            self._open.append(part.file)
+
+    def on_part_data(self, data, start, end):
+        part = self._part
+        chunk = data[start:end]
+        if part.file is None:
+            part.data += chunk
+            return
+        part.size += len(chunk)
+        self.batch._count_bytes(len(chunk), part.size, part.filename)
+        self._pending.append((part, chunk))
+
+    def on_part_end(self):
+        part = self._part
+        if part.file is None:
+            self.items.append((part.name, _decode(bytes(part.data))))
+        else:
+            # Replaced by its SpooledUploadFile once the data is written
+            self.items.append((part.name, part))
+            self._finished.append(part)
+
+    def _write_pending(self, pending, finished):
+        for part, chunk in pending:
+            part.digest.update(chunk)
+            part.file.write(chunk)
+        for part in finished:
+            part.file.close()
+
+    async def parse(self):
+        _, params = parse_options_header(self.content_type)
+        if b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Missing boundary in multipart body")
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        })
+        try:
+            with STAGE_SECONDS.time(stage="upload_spool"):
+                async for chunk in self.stream:
+                    parser.write(chunk)
+                    if self._pending or self._finished:
+                        pending, self._pending = self._pending, []
+                        finished, self._finished = self._finished, []
+                        await asyncio.to_thread(self._write_pending, pending, finished)
+                parser.finalize()
+        finally:
+            for file in self._open:
+                file.close()
+
+        items = []
+        for name, value in self.items:
+            if isinstance(value, _SpooledPart):
+                UPLOAD_BYTES_TOTAL.inc(value.size)
+                spooled = SpooledPdf(value.filename, value.path, value.size, value.digest.hexdigest())
+                value = SpooledUploadFile(spooled, Headers(raw=value.headers))
+            items.append((name, value))
+        return FormData(items)
+
+
+class SpoolingRequest(Request):
+    """Request whose multipart form is parsed by MultipartSpooler into ``state.upload_batch``."""
+
+    async def form(self, **kwargs):
+        content_type = self.headers.get("content-type", "")
+        if not content_type.startswith("multipart/form-data"):
+            return await super().form(**kwargs)
+        if self._form is None:
+            self.state.upload_batch = upload_spool.batch()
+            self._form = await MultipartSpooler(
+                self.state.upload_batch, content_type.encode("latin-1"), self.stream()
+            ).parse()
+        return self._form
+
+
+class SpoolingRoute(APIRoute):
+    """Route that spools uploads while the body arrives; set as the app's ``router.route_class``.
+
+    Files an endpoint moved into its own UploadBatch live on with it, the
+    rest of the request's spool is removed once the response has been sent
+    (a streamed response may still be reading the uploads until then).
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def spooling_handler(request):
+            request = SpoolingRequest(request.scope, request.receive)
+            try:
+                response = await handler(request)
+            except BaseException:
+                batch = getattr(request.state, "upload_batch", None)
+                if batch is not None:
+                    await asyncio.to_thread(batch.close)
+                raise
+            batch = getattr(request.state, "upload_batch", None)
+            if batch is not None:
+                tasks = BackgroundTasks([response.background] if response.background is not None else [])
+                tasks.add_task(batch.close)
+                response.background = tasks
+            return response
+
+        return spooling_handler
+
+
+class UploadSpool:
+    """Root directory and limits for spooled uploads."""
+
+    def __init__(self, root_dir, max_file_bytes=None, max_request_bytes=None):
+        self.root_dir = root_dir
+        self.max_file_bytes = max_file_bytes
+        self.max_request_bytes = max_request_bytes
+
+    def batch(self):
+        os.makedirs(self.root_dir, exist_ok=True)
+        return UploadBatch(self, tempfile.mkdtemp(dir=self.root_dir))
+
+    def clear(self):
+        """Remove spool directories left behind by a previous process."""
+        shutil.rmtree(self.root_dir, ignore_errors=True)
+
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware rejecting request bodies over ``max_bytes`` with 413.
+
+    Declared Content-Length is checked before anything is read; bodies
+    without one are counted as they arrive, so an oversized upload stops
+    being received instead of being spooled in full first.
+    """
+
+    def __init__(self, app, max_bytes=None):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.max_bytes
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > max_bytes:
+                await self._reject(scope, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte request limit")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, scope, send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload exceeds the {self.max_bytes} byte request limit"},
+            headers={"Connection": "close"},
+        )
+        await response(scope, None, send)
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+upload_spool = UploadSpool(
+    root_dir=os.environ.get("UPLOAD_DIR") or os.path.join(tempfile.gettempdir(), "pdf_extractor_uploads"),
+    max_file_bytes=_env_int("UPLOAD_MAX_FILE_BYTES", 50 * 1024 * 1024),
+    max_request_bytes=_env_int("UPLOAD_MAX_REQUEST_BYTES", 2 * 1024 * 1024 * 1024),
+)
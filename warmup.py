@@ -0,0 +1,57 @@
+"""Cold-start warm-up of the extraction path.
+
+The PDF libraries are imported lazily and pdfminer sets itself up on the
+first document it parses, so without a warm-up the first real request pays
+for all of it. ``warm_up`` runs a tiny one-page SKTT, built here rather than
+shipped as a file, through detection and both text backends; the API runs
+it once in the main process (before the worker processes are forked, so
+they inherit the loaded libraries) and once on every worker.
+"""
+from extractors import detect_and_extract, extract_document
+
+WARMUP_LINES = [
+    "NIK/Number of Population Identity : 5171010101010001",
+    "Nama/Name : WARM UP",
+    "Kewarganegaraan/Nationality : INDONESIAN",
+    "Nomor KITAP/KITAS Number : 2C00AA0000",
+    "Berlaku Hingga s.d/Expired date : 01-01-2030",
+]
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def tiny_pdf(lines):
+    """Minimal one-page PDF with ``lines`` of Helvetica text."""
+    content = "\n".join(
+        ["BT /F1 10 Tf 14 TL 40 800 Td"] + [f"({_pdf_string(line)}) Tj T*" for line in lines] + ["ET"]
+    ).encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [4 0 R] /Count 1 >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 3 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+WARMUP_PDF = tiny_pdf(WARMUP_LINES)
+
+
+def warm_up():
+    """Import and initialize everything a first extraction needs; returns the detected type."""
+    detected = detect_and_extract(WARMUP_PDF)
+    extract_document(WARMUP_PDF, "SKTT", ["pdfplumber"])
+    return detected["document_type"]
@@ -0,0 +1,87 @@
+"""ZIP archives of renamed PDFs.
+
+PDF content is already compressed, so members are STORED rather than
+deflated, and nothing is staged in a temp directory first: each member is
+given as bytes or as the path of a file already on disk (e.g. a spooled
+upload), which is copied in chunks. Archives can be written to a single
+file on disk or streamed chunk by chunk to a response.
+"""
+import os
+import time
+import zipfile
+
+from metrics import STAGE_SECONDS
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object collecting what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _add_member(zipf, arcname, source):
+    if isinstance(source, str):
+        zipf.write(source, arcname)
+    else:
+        zipf.writestr(arcname, source)
+
+
+def write_zip(path, members, verify=False):
+    """Write (arcname, bytes or path) members to a STORED ZIP at path and return its size.
+
+    With ``verify`` the archive is re-opened and every member's CRC checked;
+    it is off by default since the archive was just written from memory.
+    """
+    with STAGE_SECONDS.time(stage="zip_build"):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zipf:
+            for arcname, source in members:
+                _add_member(zipf, arcname, source)
+
+        if verify:
+            with zipfile.ZipFile(path, 'r') as zipf:
+                bad_file = zipf.testzip()
+                if bad_file:
+                    raise Exception(f"ZIP file is corrupted: {bad_file}")
+
+        return os.path.getsize(path)
+
+
+def stream_zip(members):
+    """Yield a STORED ZIP of (arcname, bytes or path) members chunk by chunk.
+
+    Only the member being written is held in the buffer, so the archive can
+    be sent as a StreamingResponse without ever existing as a whole. The
+    zip_build stage only counts the time spent writing, not the time the
+    consumer takes between chunks.
+    """
+    sink = _ChunkSink()
+    elapsed = 0.0
+    zipf = zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED)
+    try:
+        for arcname, source in members:
+            started = time.perf_counter()
+            _add_member(zipf, arcname, source)
+            chunk = sink.drain()
+            elapsed += time.perf_counter() - started
+            yield chunk
+        # Central directory
+        started = time.perf_counter()
+        zipf.close()
+        elapsed += time.perf_counter() - started
+        yield sink.drain()
+    finally:
+        zipf.close()
+        STAGE_SECONDS.observe(elapsed, stage="zip_build")